@@ -1,4 +1,18 @@
-from .mdwiki import main
+import multiprocessing
+import sys
+import time
+
+# Measure how long importing Qt and everything else takes
+STARTED = time.perf_counter()
 
 if __name__ == '__main__':
-    main()
+    # The workers of MentionIndex.scan rerun this script in frozen builds
+    multiprocessing.freeze_support()
+
+    # Without arguments the GUI is started, the command line interface must not load Qt
+    if len(sys.argv) > 1:
+        from .cli import main
+        sys.exit(main())
+    else:
+        from .mdwiki import main
+        sys.exit(main(STARTED))
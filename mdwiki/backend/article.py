@@ -9,6 +9,7 @@ from slugify import slugify
 
 from .util import split_path
 from .constants import DEFAULT_FOLDER_PERMISSION, INDEX_FILE_NAME
+from .events import ChangeType
 
 ICON_FOLDER = 'folder-symbolic'
 ICON_ARTICLE = 'folder-documents-symbolic'
@@ -60,7 +61,7 @@ class ArticleHistoryEntry:
 
 
 class Article:
-    def __init__(self, wiki, parent, file_type, is_directory=False, name=None, file_name=None):
+    def __init__(self, wiki, parent, file_type, is_directory=False, name=None, file_name=None, text=None):
         self._file_name = file_name if file_name else slugify(name)
         self._file_type = file_type
         self.parent = parent
@@ -84,11 +85,18 @@ class Article:
             self.write()
             self.commit(message="Initial commit for '%s'" %
                         (self.wiki_url))
+        elif text is not None:
+            # Our file has been read for us already
+            self._text = text
+            self.refresh_name()
+            self.refresh_links()
         else:
             # TODO the ugliest of all hacks!
             # This triggers a read from the file which in turn sets self._name
             self.text
 
+        self.wiki.emit(ChangeType.CREATED, self)
+
     def __str__(self):
         return self.name
 
@@ -115,6 +123,8 @@ class Article:
         self._name = name
 
     def refresh_name(self):
+        old_name = getattr(self, '_name', None)
+
         if self._text.startswith('#'):
             line_end = self._text.find('\n')
             if line_end == -1:
@@ -124,6 +134,13 @@ class Article:
         else:
             self._name = self._file_name
 
+        if self._name != old_name:
+            # A new article isn't renamed, it will announce its creation
+            if old_name is None:
+                self.wiki.structure_changed()
+            else:
+                self.wiki.emit(ChangeType.RENAMED, self)
+
     @property
     def text(self):
         if self._text is None:
@@ -138,10 +155,18 @@ class Article:
         if text == self._text:
             return
 
-        self.modified = True
+        if not self.modified:
+            self.modified = True
+            self.wiki.emit(ChangeType.MODIFIED, self)
 
         # Force Unix style line endings
-        self._text = text.replace('\r\n', '\n').replace('\r', '\n')
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+
+        # A new article is written right away, there's nothing to lose
+        if self._text is not None:
+            self.wiki.journal.record(self.text_path, self._text, text)
+
+        self._text = text
         self.refresh_name()
         self.refresh_links()
 
@@ -152,6 +177,11 @@ class Article:
 
         return self._file_name + self.file_type
 
+    @property
+    def slug(self):
+        """ Our file name without the file type. """
+        return self._file_name
+
     @property
     def file_type(self):
         return self._file_type
@@ -201,6 +231,14 @@ class Article:
             # We don't want to add the name of the wiki to the link
             return ''
 
+    @property
+    def text_path(self):
+        """ This returns the relative, physical path to the file holding our text. """
+        if self.is_category():
+            return os.path.join(self.physical_path, self.index_file_name)
+
+        return self.physical_path
+
     @property
     def absolute_physical_path(self):
         """ This returns the absolute, physical path to either the file or the folder of this article. """
@@ -230,10 +268,10 @@ class Article:
 
             with open(target_path, 'wb') as stream:
                 renderer = renderers[self.file_type]
-                stream.write(renderer.render(self.text.encode('utf-8')))
+                stream.write(renderer.render(self.wiki.url_snapshot, self.text).encode('utf-8'))
 
         for child in self.children:
-            child.export(target_dir, renderers)
+            child.export(output_path, renderers)
 
     def refresh_links(self):
         links = re.findall(r'\[\[([^\[\]|]*)[^\[\]]*\]\]', self.text)
@@ -284,6 +322,14 @@ class Article:
 
         return None
 
+    def get_child_by_slug(self, slug):
+        """ Return the child stored under slug, i.e. its file name without the file type. """
+        for child in self.children:
+            if child.slug.lower() == slug.lower():
+                return child
+
+        return None
+
     def get_all_physical_paths(self):
         files = []
 
@@ -346,6 +392,7 @@ class Article:
 
         if parent != self.parent:
             # Remove ourself from the old parent
+            old_parent = self.parent
             self.parent.remove_child(self)
 
             # ... and add us to the new one
@@ -353,10 +400,43 @@ class Article:
             self.parent.add_child(self)
 
             self.add_changed_files(self.get_all_physical_paths())
+            self.wiki.emit(ChangeType.MOVED, self, old_parent)
+        else:
+            self.wiki.emit(ChangeType.RENAMED, self)
 
         self.commit(message="Moved '%s' to '%s'." %
                     (old_wiki_url, self.wiki_url))
 
+    def relocate(self, parent, file_name, file_type, is_directory):
+        """ Follow a move, rename or conversion which already happened on disk, e.g. by pulling.
+        Neither touches any files nor commits.
+        """
+        old_parent = self.parent
+        old_file_name = self._file_name
+
+        self._file_name = file_name
+        self._file_type = file_type
+        self.is_directory = is_directory or self.is_root()
+
+        if parent is not old_parent:
+            old_parent.children.remove(self)
+            self.parent = parent
+            parent.children.append(self)
+
+            self.wiki.emit(ChangeType.MOVED, self, old_parent)
+        elif file_name != old_file_name:
+            self.wiki.emit(ChangeType.RENAMED, self)
+
+    def detach(self):
+        """ Forget about this article and its descendants, whose files are already gone. """
+        for child in list(self.children):
+            child.detach()
+
+        if self.parent:
+            self.parent.children.remove(self)
+
+        self.wiki.emit(ChangeType.DELETED, self)
+
     def convert_to_folder(self):
         """This function turns an article file into a folder, keeping its content.
         e.g. from 'test.md' to 'test' (directory) and '/test/_index.md' (file)
@@ -464,15 +544,15 @@ class Article:
         else:
             return article
 
-    def create_article_from_file(self, path):
+    def create_article_from_file(self, path, text=None):
         name, file_type = os.path.splitext(path)
 
         if not file_type:
             file_type = '.md'
 
-        self.create_article_by_url(name, file_type)
+        self.create_article_by_url(name, file_type, text)
 
-    def create_article_by_url(self, url, file_type):
+    def create_article_by_url(self, url, file_type, text=None):
         """ Create an article and all categories in between. Works similar to resolve(). """
 
         # For convenience, the user can call this function with a string (e.g. '/test/category/article')
@@ -488,10 +568,11 @@ class Article:
                               self,
                               file_type,
                               is_directory=len(url) > 0,
-                              file_name=file_name)
+                              file_name=file_name,
+                              text=None if len(url) > 0 else text)
 
         if len(url) > 0:
-            return article.create_article_by_url(url, file_type)
+            return article.create_article_by_url(url, file_type, text)
         else:
             return article
 
@@ -501,7 +582,7 @@ class Article:
         self.add_changed_files(all_physical_paths)
 
         # Delete all children before ourselves, so our folder is empty
-        for child in self.children:
+        for child in list(self.children):
             child.delete(commit=False)
 
         physical_path = self.absolute_physical_path
@@ -515,6 +596,8 @@ class Article:
         else:
             os.remove(physical_path)
 
+        self.wiki.journal.checkpoint(self.text_path)
+
         if commit:
             # Commit the removal
             self.commit("Deleted '%s'" % (self.wiki_url))
@@ -523,6 +606,8 @@ class Article:
         if self.parent:
             self.parent.remove_child(self)
 
+        self.wiki.emit(ChangeType.DELETED, self)
+
     def dump(self, indent=0):
         """ For debugging: Print out ourself and our children. """
         logger.debug("%s%s%s (Category: %s, %s, %s)" % (
@@ -561,34 +646,41 @@ class Article:
         with GitFile(physical_path) as stream:
             return stream.read().decode('utf-8')
 
-    def write(self):
-        """ Write the contents of our physical file. """
-        # Move the file before writing to it if its name changed
-        if self._file_name != slugify(self._name):
-            self.move(name=self._name)
+    def reload(self):
+        """ Read our file again after it got changed by someone else, e.g. by pulling. """
+        self.wiki.journal.checkpoint(self.text_path)
+        self._text = self.read()
+        self.modified = False
+        self.refresh_name()
+        self.refresh_links()
 
-        physical_path = self.absolute_physical_path
+        self.wiki.emit(ChangeType.MODIFIED, self)
 
-        self.add_changed_file(self.physical_path)
-        if self.is_category():
-            physical_path = os.path.join(
-                physical_path, self.index_file_name)
-            self.add_changed_file(os.path.join(
-                self.physical_path, self.index_file_name))
+    def write(self, rename=True):
+        """ Write the contents of our physical file. Unless rename is False (e.g. when
+        autosaving), the file is moved first if our name changed.
+        """
+        edited_path = self.text_path
+
+        # Move the file before writing to it if its name changed, the root is never moved
+        if rename and not self.is_root() and self._file_name != slugify(self._name):
+            self.move(name=self._name)
 
-        with GitFile(physical_path, mode="wb") as stream:
-            stream.write(self.text.encode('utf-8'))
+        physical_path = self.text_path
 
-        # We wrote the changes, update the wiki's list of unstaged changes
-        self.wiki.fetch_unstaged_changes()
+        # Writing also keeps the wiki's list of unstaged changes up to date
+        if self.wiki.write_file(physical_path, self.text.encode('utf-8')):
+            self.add_changed_file(physical_path)
 
+        self.wiki.journal.checkpoint(edited_path)
         self.modified = False
+        self.wiki.emit(ChangeType.MODIFIED, self)
 
     def load_history(self):
         """ Load our commit history. """
         self.history = []
         try:
-            for entry in self.wiki.git_wiki.get_walker(
+            for entry in self.wiki.git_repository.get_walker(
                     paths=[self.physical_path.encode('utf-8')]):
                 self.history.append(ArticleHistoryEntry(self, entry.commit))
         # A KeyError can occur on freshly created repositories (without commits)
@@ -602,8 +694,9 @@ class Article:
 
         logger.info("Commiting '%s' (%s)" %
                     (message, ', '.join(self.changed_files)))
-        self.wiki.git_repository.stage(list(self.changed_files))
+        self.wiki.stage(list(self.changed_files))
         self.changed_files = set()
+        self.wiki.emit(ChangeType.STAGED, self)
 
         message = message.encode('utf-8')
 
@@ -622,4 +715,4 @@ class Article:
             for child in self.children:
                 child.commit(commit_children=True)
 
-        self.wiki.fetch_unstaged_changes()
+        self.wiki.emit(ChangeType.COMMITTED, self)
@@ -0,0 +1,100 @@
+import logging
+import os
+from collections import deque
+
+from dulwich.diff_tree import tree_changes, RenameDetector, CHANGE_ADD, CHANGE_DELETE
+from dulwich.index import build_file_from_blob, index_entry_from_stat
+
+from .constants import INDEX_FILE_NAME
+
+logger = logging.getLogger(__name__)
+
+
+def article_path(path):
+    """ Split the path of a file into the slugs of its article, its file type and
+    wether the article is a category. e.g. 'foo/_index.md' becomes (('foo',), '.md', True).
+    """
+    slugs = path.strip('/').split('/')
+    slug, file_type = os.path.splitext(slugs.pop())
+
+    if slug == INDEX_FILE_NAME:
+        return tuple(slugs), file_type, True
+
+    return tuple(slugs) + (slug,), file_type, False
+
+
+def is_ancestor(repository, ancestor, commit):
+    """ Return wether ancestor is commit itself or one of its parents, grandparents, ... """
+    queue = deque([commit])
+    seen = set(queue)
+
+    while queue:
+        sha = queue.popleft()
+        if sha == ancestor:
+            return True
+
+        for parent in repository[sha].parents:
+            if parent not in seen:
+                seen.add(parent)
+                queue.append(parent)
+
+    return False
+
+
+def diff_trees(repository, old_tree, new_tree):
+    """ Returns the files which differ between two trees as a list of
+    (old_path, new_path, new_sha, new_mode) tuples. old_path is None for added
+    files and new_path is None for deleted ones, renamed files have both.
+    """
+    detector = RenameDetector(repository.object_store)
+    changes = []
+
+    for change in tree_changes(repository.object_store, old_tree, new_tree,
+                               rename_detector=detector):
+        old_path = None if change.type == CHANGE_ADD else change.old.path.decode('utf-8')
+        new_path = None if change.type == CHANGE_DELETE else change.new.path.decode('utf-8')
+
+        changes.append((old_path, new_path, change.new.sha, change.new.mode))
+
+    return changes
+
+
+def update_working_tree(repository, path, changes):
+    """ Apply changes (see diff_trees) to the files in path and to the index.
+    Only the changed files are touched.
+    """
+    index = repository.open_index()
+    object_store = repository.object_store
+
+    for old_path, new_path, _, _ in changes:
+        if old_path is None or old_path == new_path:
+            continue
+
+        logger.debug("Removing '%s'" % (old_path))
+        full_path = os.path.join(path, old_path)
+        if os.path.exists(full_path):
+            os.remove(full_path)
+
+        try:
+            del index[old_path.encode('utf-8')]
+        except KeyError:
+            pass
+
+        # Git doesn't know about folders, remove them once they are empty
+        folder = os.path.dirname(full_path)
+        while os.path.normpath(folder) != os.path.normpath(path) and not os.listdir(folder):
+            os.rmdir(folder)
+            folder = os.path.dirname(folder)
+
+    for _, new_path, sha, mode in changes:
+        if new_path is None:
+            continue
+
+        logger.debug("Writing '%s'" % (new_path))
+        full_path = os.path.join(path, new_path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+
+        build_file_from_blob(object_store[sha], mode, full_path.encode('utf-8'))
+        index[new_path.encode('utf-8')] = index_entry_from_stat(os.lstat(full_path), sha, 0, mode)
+
+    index.write()
@@ -0,0 +1,22 @@
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def emoji_index():
+    """ The gemoji index, built only once per process. """
+    import pymdownx.emoji
+
+    return pymdownx.emoji.gemoji()
+
+
+def get_emoji_config():
+    """ Returns the configuration for pymdownx.emoji. Emojis are inserted as unicode
+    characters, so nothing is ever loaded from the network (or a missing image set).
+    """
+    import pymdownx.emoji
+
+    return {
+        "emoji_index": emoji_index,
+        "emoji_generator": pymdownx.emoji.to_alt,
+        "alt": "unicode",
+    }
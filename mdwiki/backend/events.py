@@ -0,0 +1,91 @@
+import logging
+import threading
+from contextlib import contextmanager
+from enum import IntEnum
+
+logger = logging.getLogger(__name__)
+
+
+class ChangeType(IntEnum):
+    CREATED = 1
+    RENAMED = 2
+    MOVED = 3
+    DELETED = 4
+    # The article's text changed or got saved
+    MODIFIED = 5
+    STAGED = 6
+    COMMITTED = 7
+
+
+# Changes which alter the URLs of articles
+STRUCTURE_CHANGES = frozenset([ChangeType.CREATED, ChangeType.RENAMED,
+                               ChangeType.MOVED, ChangeType.DELETED])
+
+
+class ChangeEvent:
+    """ Something happened to an article. old_parent is set for moved articles. """
+
+    def __init__(self, change_type, article, old_parent=None):
+        self.change_type = change_type
+        self.article = article
+        self.old_parent = old_parent
+
+    def __repr__(self):
+        return "<ChangeEvent %s %r>" % (self.change_type.name, self.article)
+
+
+class EventBus:
+    """ Hands change events to subscribers as lists. Events emitted inside of
+    batch() are collected and delivered together once the batch ends.
+    Subscribers are called on the thread which emitted the events.
+    """
+
+    def __init__(self):
+        self.subscribers = []
+        self.pending = []
+        self.batch_depth = 0
+        self.lock = threading.RLock()
+
+    def subscribe(self, callback):
+        with self.lock:
+            self.subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        with self.lock:
+            if callback in self.subscribers:
+                self.subscribers.remove(callback)
+
+    def emit(self, change_type, article, old_parent=None):
+        with self.lock:
+            self.pending.append(ChangeEvent(change_type, article, old_parent))
+
+            if not self.batch_depth:
+                self.flush()
+
+    @contextmanager
+    def batch(self):
+        with self.lock:
+            self.batch_depth += 1
+
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.batch_depth -= 1
+
+                if not self.batch_depth:
+                    self.flush()
+
+    def flush(self):
+        with self.lock:
+            events, self.pending = self.pending, []
+            subscribers = list(self.subscribers)
+
+        if not events:
+            return
+
+        for callback in subscribers:
+            try:
+                callback(events)
+            except Exception:
+                logger.exception('Could not deliver %d change events' % (len(events)))
@@ -0,0 +1,131 @@
+'''
+SourceMap Extension for Python-Markdown
+=======================================
+
+Adds a 'data-line' attribute to every top-level block element, containing
+the (zero based) line in the source text the block starts at.
+
+This allows the preview to follow the editor's cursor without having to
+render the document again whenever the cursor moves.
+'''
+
+import difflib
+
+from markdown.extensions import Extension
+from markdown.preprocessors import Preprocessor
+from markdown.util import etree, HTML_PLACEHOLDER_RE
+
+SOURCE_LINE_ATTRIBUTE = 'data-line'
+
+
+class SourceMapExtension(Extension):
+    def extendMarkdown(self, md, md_globals):
+        source_map = SourceMap()
+
+        # Remember the untouched source before any preprocessor runs ...
+        md.preprocessors.add('sourcemap_source',
+                             SourceLinesPreprocessor(md, source_map, record=True), '_begin')
+        # ... and compare it to what the block parser will get to see
+        md.preprocessors.add('sourcemap_mapping',
+                             SourceLinesPreprocessor(md, source_map, record=False), '_end')
+
+        parser = SourceMapBlockParser(md.parser, source_map)
+        md.parser.parseBlocks = parser.parseBlocks
+
+
+class SourceMap:
+    """ Maps lines of the preprocessed text back to lines of the source text. """
+
+    def __init__(self):
+        self.source_lines = []
+        self.line_map = []
+
+    def build(self, lines):
+        # Most of the time preprocessors don't change anything
+        if lines == self.source_lines:
+            self.line_map = list(range(len(lines)))
+            return
+
+        self.line_map = [0] * len(lines)
+        matcher = difflib.SequenceMatcher(None, self.source_lines, lines)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            for j in range(j1, j2):
+                if tag == 'equal':
+                    self.line_map[j] = i1 + (j - j1)
+                else:
+                    # Replaced lines (e.g. stashed code blocks) point to
+                    # the beginning of their original region
+                    self.line_map[j] = i1
+
+    def source_line(self, line):
+        if not self.line_map:
+            return line
+
+        return self.line_map[min(line, len(self.line_map) - 1)]
+
+
+class SourceLinesPreprocessor(Preprocessor):
+    def __init__(self, md, source_map, record):
+        super().__init__(md)
+        self.source_map = source_map
+        self.record = record
+
+    def run(self, lines):
+        if self.record:
+            self.source_map.source_lines = list(lines)
+        else:
+            self.source_map.build(lines)
+
+        return lines
+
+
+class SourceMapBlockParser:
+    """ Wraps BlockParser.parseBlocks to tag the top-level elements it creates. """
+
+    def __init__(self, parser, source_map):
+        self.parser = parser
+        self.source_map = source_map
+        self.parse_blocks = parser.parseBlocks
+
+    def parseBlocks(self, parent, blocks):
+        # Nested blocks (e.g. inside of lists) are parsed as usual
+        if parent is not getattr(self.parser, 'root', None):
+            return self.parse_blocks(parent, blocks)
+
+        # Count lines from the end of the document: block processors only
+        # ever touch the first block, so the tail is always a part of the
+        # original list and we can tell where the current block starts
+        # without joining everything again.
+        block_count = len(blocks)
+        tail_lines = [0] * (block_count + 1)
+        for i in range(1, block_count + 1):
+            tail_lines[i] = tail_lines[i - 1] + blocks[-i].count('\n') + (2 if i > 1 else 0)
+        total_lines = tail_lines[block_count]
+
+        while blocks:
+            remaining_lines = blocks[0].count('\n')
+            if len(blocks) > 1:
+                remaining_lines += 2 + tail_lines[min(len(blocks) - 1, block_count)]
+            line = self.source_map.source_line(total_lines - remaining_lines)
+
+            element_count = len(parent)
+            for processor in self.parser.blockprocessors.values():
+                if processor.test(parent, blocks[0]):
+                    if processor.run(parent, blocks) is not False:
+                        # run returns True or None
+                        break
+
+            for element in list(parent)[element_count:]:
+                self.tag_element(parent, element, line)
+
+    def tag_element(self, parent, element, line):
+        # Stashed HTML (e.g. fenced code) gets put back by looking for
+        # '<p>placeholder</p>', so leave those paragraphs alone and put an
+        # empty marker in front of them instead
+        if element.tag == 'p' and len(element) == 0 and element.text \
+                and HTML_PLACEHOLDER_RE.match(element.text.strip()):
+            marker = etree.Element('a')
+            marker.set(SOURCE_LINE_ATTRIBUTE, str(line))
+            parent.insert(list(parent).index(element), marker)
+        else:
+            element.set(SOURCE_LINE_ATTRIBUTE, str(line))
@@ -0,0 +1,150 @@
+import json
+import logging
+import os
+
+from dulwich.objects import Blob
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_FILE_NAME = "mdwiki-journal"
+
+
+def blob_id(data):
+    return Blob.from_string(data).id.decode('ascii')
+
+
+def common_prefix_length(first, second):
+    """ Length of the common beginning of two strings, found by comparing halves. """
+    low, high = 0, min(len(first), len(second))
+
+    while low < high:
+        middle = (low + high + 1) // 2
+        if first[low:middle] == second[low:middle]:
+            low = middle
+        else:
+            high = middle - 1
+
+    return low
+
+
+def text_difference(old, new):
+    """ Return (start, end, inserted), so that old[:start] + inserted + old[end:] == new. """
+    start = common_prefix_length(old, new)
+    # Don't let the common end overlap the common beginning
+    suffix = common_prefix_length(old[start:][::-1], new[start:][::-1])
+
+    return start, len(old) - suffix, new[start:len(new) - suffix]
+
+
+class EditJournal:
+    """ An append-only log of the edits to articles which haven't been saved yet.
+    Every edit appends one small JSON line, so typing never writes or hashes a whole
+    article. The first edit of a file since it was saved notes the blob SHA of the
+    file, so edits are only replayed onto the text they were made to.
+    Saving a file adds a checkpoint and the journal is emptied once nothing is pending.
+    """
+
+    def __init__(self, path, wiki_path):
+        self.path = path
+        self.wiki_path = wiki_path
+        # Files with edits since they were last saved
+        self.pending = set()
+        # Edits of an earlier session which haven't been recovered must not be cleared
+        self.has_old_edits = os.path.exists(path) and os.path.getsize(path) > 0
+        self._stream = None
+
+    def _append(self, record):
+        if self._stream is None:
+            self._stream = open(self.path, 'a', encoding='utf-8')
+
+        self._stream.write(json.dumps(record) + '\n')
+        # Hand it to the OS, so it survives us crashing
+        self._stream.flush()
+
+    def record(self, file_path, old_text, new_text):
+        """ Note that the text of file_path changed from old_text to new_text. """
+        if file_path not in self.pending:
+            self.pending.add(file_path)
+            self._append({'path': file_path, 'base': blob_id(old_text.encode('utf-8'))})
+
+        start, end, inserted = text_difference(old_text, new_text)
+        self._append({'path': file_path, 'start': start, 'end': end, 'text': inserted})
+
+    def checkpoint(self, file_path):
+        """ Forget the edits of file_path, it has been saved. """
+        if file_path not in self.pending:
+            return
+
+        self.pending.discard(file_path)
+
+        if self.pending or self.has_old_edits:
+            self._append({'path': file_path, 'saved': True})
+        else:
+            self.clear()
+
+    def clear(self):
+        self.pending = set()
+        self.has_old_edits = False
+
+        if self._stream is not None:
+            self._stream.seek(0)
+            self._stream.truncate()
+        elif os.path.exists(self.path):
+            os.remove(self.path)
+
+    def sync(self):
+        """ Make sure the journal is on disk, even if the system crashes. """
+        if self._stream is not None:
+            os.fsync(self._stream.fileno())
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+
+    def read(self):
+        """ Return {file path: text} for every file with edits left in the journal,
+        replayed onto the file's current content. Files which changed on disk after
+        the edits were made are left out.
+        """
+        if not os.path.exists(self.path):
+            return {}
+
+        texts = {}
+
+        with open(self.path, encoding='utf-8') as stream:
+            for line in stream:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # The last line got cut off while crashing
+                    logger.warning("Ignoring the damaged end of '%s'" % (self.path))
+                    break
+
+                path = record['path']
+
+                if 'base' in record:
+                    texts[path] = self._read_base(path, record['base'])
+
+                    if texts[path] is None:
+                        logger.warning("'%s' changed since it was edited, not recovering it" % (path))
+                        del texts[path]
+                elif 'saved' in record:
+                    texts.pop(path, None)
+                elif path in texts:
+                    text = texts[path]
+                    texts[path] = text[:record['start']] + record['text'] + text[record['end']:]
+
+        return texts
+
+    def _read_base(self, file_path, sha):
+        try:
+            with open(os.path.join(self.wiki_path, file_path), 'rb') as stream:
+                data = stream.read()
+        except FileNotFoundError:
+            data = b''
+
+        if blob_id(data) != sha:
+            return None
+
+        return data.decode('utf-8')
@@ -0,0 +1,66 @@
+from bisect import bisect_left
+
+from .linkmatcher import fold_case
+
+# Better matches come first: the beginning of an URL, of a title and
+# finally of any path segment (e.g. 'bar' for 'foo/bar/baz')
+MATCH_URL = 0
+MATCH_TITLE = 1
+MATCH_SEGMENT = 2
+
+# How many entries of every kind of match are looked at for ranking
+SCAN_LIMIT = 1000
+
+
+class LinkCompleter:
+    """ Completes partial wiki links, ignoring case. Keeps a sorted index of
+    every URL, title and path segment, so completing is a binary search.
+    """
+
+    def __init__(self, articles, version=0):
+        """ articles is an iterable of (url, title) tuples. """
+        self.version = version
+        self.keys = ([], [], [])
+
+        for url, title in articles:
+            folded = fold_case(url)
+            self.keys[MATCH_URL].append((folded, url))
+            self.keys[MATCH_TITLE].append((fold_case(title), url))
+
+            position = folded.find('/')
+            while position != -1:
+                self.keys[MATCH_SEGMENT].append((folded[position + 1:], url))
+                position = folded.find('/', position + 1)
+
+        for keys in self.keys:
+            keys.sort()
+
+    def __len__(self):
+        return len(self.keys[MATCH_URL])
+
+    def complete(self, prefix, limit=50):
+        """ Returns up to limit URLs matching prefix, best matches first. """
+        prefix = fold_case(prefix.strip())
+        completions = []
+        seen = set()
+
+        for keys in self.keys:
+            start = bisect_left(keys, (prefix,))
+            matches = []
+
+            for key, url in keys[start:start + SCAN_LIMIT]:
+                if not key.startswith(prefix):
+                    break
+
+                if url not in seen:
+                    matches.append((len(key), key, url))
+                    seen.add(url)
+
+            # Shorter (i.e. closer) matches first
+            matches.sort()
+            completions.extend(url for _, _, url in matches)
+
+            if len(completions) >= limit:
+                break
+
+        return completions[:limit]
@@ -0,0 +1,222 @@
+import re
+
+# Transitions of all states are kept in a single dict, keyed by
+# state * TRANSITION_BASE + code point
+TRANSITION_BASE = 0x110000
+
+FENCE_RE = re.compile(r'^\s*(```|~~~)')
+FRONT_MATTER_MARK = '---'
+# Inline parts of a line which must never be turned into links
+PROTECTED_RE = re.compile(r'(`+).*?\1'              # code spans
+                          r'|\[\[[^\[\]]*\]\]'      # wiki links
+                          r'|!?\[[^\[\]]*\]\([^()]*\)'  # links and images
+                          r'|<[^<>\s]+>'            # autolinks and html tags
+                          r'|\w+://\S+')            # bare urls
+
+
+def fold_case(text):
+    """ Lower case text without changing its length, so offsets stay valid. """
+    folded = text.lower()
+    if len(folded) == len(text):
+        return folded
+
+    return ''.join(char.lower() if len(char.lower()) == 1 else char for char in text)
+
+
+def is_word_character(char):
+    return char.isalnum() or char == '_'
+
+
+class AhoCorasick:
+    """ Finds all occurrences of many keywords in a text in a single pass. """
+
+    def __init__(self, keywords):
+        """ keywords is an iterable of (keyword, value) tuples. """
+        self.transitions = {}
+        self.fail = [0]
+        # (keyword length, value) for states at the end of a keyword
+        self.outputs = [None]
+        # The next state along the fail links which has an output
+        self.output_links = [0]
+        children = [[]]
+
+        for keyword, value in keywords:
+            state = 0
+            for char in keyword:
+                key = state * TRANSITION_BASE + ord(char)
+                next_state = self.transitions.get(key)
+
+                if next_state is None:
+                    next_state = len(self.fail)
+                    self.transitions[key] = next_state
+                    self.fail.append(0)
+                    self.outputs.append(None)
+                    self.output_links.append(0)
+                    children.append([])
+                    children[state].append((ord(char), next_state))
+
+                state = next_state
+
+            self.outputs[state] = (len(keyword), value)
+
+        # Breadth first, so fail links always point to already finished states
+        queue = [child for _, child in children[0]]
+        for state in queue:
+            for code, child in children[state]:
+                fail = self.fail[state]
+                while fail and fail * TRANSITION_BASE + code not in self.transitions:
+                    fail = self.fail[fail]
+
+                fail = self.transitions.get(fail * TRANSITION_BASE + code, 0)
+                self.fail[child] = fail
+                self.output_links[child] = fail if self.outputs[fail] else self.output_links[fail]
+                queue.append(child)
+
+    def __len__(self):
+        return sum(1 for output in self.outputs if output)
+
+    def iter_matches(self, text):
+        """ Yields (start, end, value) for every occurrence of every keyword. """
+        transitions = self.transitions
+        fail = self.fail
+        outputs = self.outputs
+        output_links = self.output_links
+
+        state = 0
+        for position, char in enumerate(text):
+            code = ord(char)
+
+            while True:
+                next_state = transitions.get(state * TRANSITION_BASE + code)
+                if next_state is not None:
+                    state = next_state
+                    break
+
+                if not state:
+                    break
+
+                state = fail[state]
+
+            match = state if outputs[state] else output_links[state]
+            while match:
+                length, value = outputs[match]
+                yield position + 1 - length, position + 1, value
+                match = output_links[match]
+
+
+class LinkMatcher:
+    """ Finds mentions of article names in texts, ignoring case. """
+
+    def __init__(self, articles, version=0):
+        """ articles is an iterable of (name, article) tuples. If a name is used
+        more than once, the first article wins.
+        """
+        self.version = version
+        self.articles = {}
+
+        for name, article in articles:
+            if name:
+                self.articles.setdefault(fold_case(name), article)
+
+        self.automaton = AhoCorasick(self.articles.items())
+
+    def get(self, name):
+        """ Returns the article called name, if there is one. """
+        return self.articles.get(fold_case(name))
+
+    def find_mentions(self, text):
+        """ Returns a sorted list of (start, end, article) for the longest,
+        non-overlapping mentions of article names in text. Headings, front
+        matter, code and existing links are skipped.
+        """
+        folded = fold_case(text)
+        protected = LinkMatcher.protected_spans(text)
+
+        candidates = [(start, end, article)
+                      for start, end, article in self.automaton.iter_matches(folded)
+                      if LinkMatcher.is_whole_word(text, start, end)]
+        # Leftmost first, longest first for mentions starting at the same position
+        candidates.sort(key=lambda candidate: (candidate[0], candidate[0] - candidate[1]))
+
+        mentions = []
+        last_end = 0
+        span_index = 0
+        for start, end, article in candidates:
+            if start < last_end:
+                continue
+
+            while span_index < len(protected) and protected[span_index][1] <= start:
+                span_index += 1
+
+            if span_index < len(protected) and protected[span_index][0] < end:
+                continue
+
+            mentions.append((start, end, article))
+            last_end = end
+
+        return mentions
+
+    def link_all(self, text, format_link):
+        """ Replaces all mentions in text with format_link(article). Mentions for
+        which format_link returns None are left alone.
+        """
+        parts = []
+        last_end = 0
+
+        for start, end, article in self.find_mentions(text):
+            link = format_link(article)
+            if link is None:
+                continue
+
+            parts.append(text[last_end:start])
+            parts.append(link)
+            last_end = end
+
+        parts.append(text[last_end:])
+
+        return ''.join(parts)
+
+    @staticmethod
+    def is_whole_word(text, start, end):
+        # Names starting or ending with punctuation (e.g. 'C++') only need
+        # a boundary on their other side
+        if start > 0 and is_word_character(text[start]) and is_word_character(text[start - 1]):
+            return False
+
+        if end < len(text) and is_word_character(text[end - 1]) and is_word_character(text[end]):
+            return False
+
+        return True
+
+    @staticmethod
+    def protected_spans(text):
+        """ Returns a sorted list of (start, end) spans which must not be linked. """
+        spans = []
+        offset = 0
+        fence = None
+        in_front_matter = text.startswith(FRONT_MATTER_MARK + '\n')
+
+        for line_number, line in enumerate(text.split('\n')):
+            line_end = offset + len(line)
+            fence_match = FENCE_RE.match(line)
+
+            if in_front_matter:
+                spans.append((offset, line_end))
+                if line_number > 0 and line.rstrip() == FRONT_MATTER_MARK:
+                    in_front_matter = False
+            elif fence:
+                spans.append((offset, line_end))
+                if fence_match and fence_match.group(1) == fence:
+                    fence = None
+            elif fence_match:
+                spans.append((offset, line_end))
+                fence = fence_match.group(1)
+            elif line.startswith('#'):
+                spans.append((offset, line_end))
+            else:
+                for match in PROTECTED_RE.finditer(line):
+                    spans.append((offset + match.start(), offset + match.end()))
+
+            offset = line_end + 1
+
+        return spans
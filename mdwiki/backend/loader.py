@@ -0,0 +1,91 @@
+import logging
+import os
+import threading
+import time
+
+from .wiki import Wiki
+
+logger = logging.getLogger(__name__)
+
+# Hand over the files of this many articles at once
+CHUNK_SIZE = 200
+
+
+class WikiLoader:
+    """ Opens a wiki on a background thread. The repository, its index and the
+    unstaged changes are read first and the (still empty) wiki is handed to
+    opened_callback(loader, wiki). Then the files of its articles are read and handed
+    to imported_callback(loader, files, texts) in chunks, where they can be turned
+    into articles with wiki.import_files(). Articles are never created on the loader's
+    thread, so the wiki can be shown while it is being filled.
+    finished_callback(loader, error) is called last, error is None if everything worked.
+    All callbacks are called on the loader's thread.
+    """
+
+    def __init__(self, path, opened_callback, imported_callback, finished_callback,
+                 chunk_size=CHUNK_SIZE):
+        self.path = path
+        self.opened_callback = opened_callback
+        self.imported_callback = imported_callback
+        self.finished_callback = finished_callback
+        self.chunk_size = chunk_size
+
+        self.started = time.perf_counter()
+        self._cancelled = threading.Event()
+
+        self._thread = threading.Thread(target=self._run,
+                                        name='WikiLoader',
+                                        daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def is_cancelled(self):
+        return self._cancelled.is_set()
+
+    def wait(self, timeout=None):
+        self._thread.join(timeout)
+
+    def read_text(self, path):
+        try:
+            with open(os.path.join(self.path, path), 'rb') as stream:
+                return stream.read().decode('utf-8')
+        except (OSError, UnicodeDecodeError):
+            # The article will complain about it itself
+            return None
+
+    def _run(self):
+        try:
+            self._load()
+        except Exception as error:
+            logger.exception("Could not open '%s'!" % (self.path))
+            self.finished_callback(self, error)
+        else:
+            self.finished_callback(self, None)
+
+    def _load(self):
+        wiki = Wiki.open(self.path, import_index=False)
+        if wiki is None:
+            raise ValueError("'%s' doesn't contain a wiki" % (self.path))
+
+        files = wiki.indexed_files()
+        logger.info("Read the repository of '%s' in %.3fs" % (self.path, time.perf_counter() - self.started))
+
+        self.opened_callback(self, wiki)
+
+        for start in range(0, len(files), self.chunk_size):
+            if self.is_cancelled():
+                return
+
+            chunk = files[start:start + self.chunk_size]
+            texts = {}
+
+            for path in chunk:
+                text = self.read_text(path)
+                if text is not None:
+                    texts[path] = text
+
+            self.imported_callback(self, chunk, texts)
+
+        logger.info("Read the articles of '%s' in %.3fs" % (self.path, time.perf_counter() - self.started))
@@ -0,0 +1,161 @@
+import logging
+import os
+import threading
+import time
+
+from dulwich.repo import Repo
+
+from .events import ChangeType
+
+logger = logging.getLogger(__name__)
+
+# Pack loose objects once there are this many of them (git's gc.auto is 6700)
+LOOSE_OBJECTS_LIMIT = 1000
+# Consolidate all packs into one once there are this many (git's gc.autoPackLimit is 50)
+PACKS_LIMIT = 20
+# Wait for the wiki to be left alone for this long before doing anything (in seconds)
+IDLE_DELAY = 30
+
+# Only these changes write objects to the repository
+OBJECT_CHANGES = frozenset([ChangeType.STAGED, ChangeType.COMMITTED])
+
+
+def count_objects(object_store):
+    """ Return the number of loose objects and the number of packs of an object store. """
+    loose = 0
+    for entry in os.scandir(object_store.path):
+        # Loose objects are stored in folders named after the first two digits of their SHA
+        if len(entry.name) == 2 and entry.is_dir():
+            loose += len(os.listdir(entry.path))
+
+    packs = sum(1 for name in os.listdir(os.path.join(object_store.path, 'pack'))
+                if name.endswith('.pack'))
+
+    return loose, packs
+
+
+class MaintenanceReport:
+    def __init__(self, operation, before, after, seconds):
+        self.operation = operation
+        self.loose_before, self.packs_before = before
+        self.loose_after, self.packs_after = after
+        self.seconds = seconds
+
+    def __str__(self):
+        return "%s: %d loose objects and %d packs before, %d and %d after (%.2fs)" % (
+            self.operation.capitalize(), self.loose_before, self.packs_before,
+            self.loose_after, self.packs_after, self.seconds)
+
+
+def maintain(object_store, force=False, loose_limit=LOOSE_OBJECTS_LIMIT, packs_limit=PACKS_LIMIT):
+    """ Pack the loose objects of object_store, or consolidate all of its packs
+    (and loose objects) into one if there are too many packs or force is set.
+    Returns a MaintenanceReport, or None if there was nothing to do.
+    """
+    before = count_objects(object_store)
+    loose, packs = before
+    start = time.perf_counter()
+
+    # Dulwich 0.18 can't repack yet
+    if (force or packs >= packs_limit) and hasattr(object_store, 'repack') and loose + packs > 1:
+        operation = 'repack'
+        object_store.repack()
+    elif loose >= loose_limit or (force and loose):
+        operation = 'pack'
+        object_store.pack_loose_objects()
+    else:
+        return None
+
+    report = MaintenanceReport(operation, before, count_objects(object_store),
+                               time.perf_counter() - start)
+    logger.info(str(report))
+
+    return report
+
+
+class MaintenanceScheduler:
+    """ Keeps the object store of a wiki small on a background thread.
+    Once objects have been written and the wiki has been left alone for idle_delay
+    seconds, maintain() is run on a separate instance of the repository, so the
+    GUI thread never waits for it. Reports are handed to callback(report), which
+    is called on the maintenance thread.
+    """
+
+    def __init__(self, wiki, callback=None, idle_delay=IDLE_DELAY,
+                 loose_limit=LOOSE_OBJECTS_LIMIT, packs_limit=PACKS_LIMIT):
+        self.wiki = wiki
+        self.callback = callback
+        self.idle_delay = idle_delay
+        self.loose_limit = loose_limit
+        self.packs_limit = packs_limit
+
+        self._condition = threading.Condition()
+        # When to run next, None if nothing has been written since the last run
+        self._deadline = None
+        self._force = False
+        self._running = True
+
+        self._thread = threading.Thread(target=self._run,
+                                        name='MaintenanceScheduler',
+                                        daemon=True)
+        self._thread.start()
+
+        self.wiki.events.subscribe(self.changes_received)
+
+    def changes_received(self, events):
+        if any(event.change_type in OBJECT_CHANGES for event in events):
+            self.schedule(self.idle_delay)
+
+    def schedule(self, delay, force=False):
+        """ Check the object store in delay seconds, unless the wiki changes again in between. """
+        with self._condition:
+            self._deadline = time.monotonic() + delay
+            self._force = self._force or force
+            self._condition.notify()
+
+    def run_now(self, force=False):
+        self.schedule(0, force)
+
+    def close(self):
+        self.wiki.events.unsubscribe(self.changes_received)
+
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._running:
+                    if self._deadline is None:
+                        self._condition.wait()
+                        continue
+
+                    remaining = self._deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+
+                    self._condition.wait(remaining)
+
+                if not self._running:
+                    return
+
+                force = self._force
+                self._deadline = None
+                self._force = False
+
+            try:
+                repository = Repo(self.wiki.physical_path)
+                try:
+                    report = maintain(repository.object_store, force,
+                                      self.loose_limit, self.packs_limit)
+                finally:
+                    repository.close()
+            except Exception:
+                logger.exception("Maintenance of '%s' failed!" % (self.wiki.physical_path))
+                continue
+
+            if report is not None and self.callback is not None:
+                self.callback(report)
@@ -1,21 +1,37 @@
 from abc import ABC, abstractmethod
 from functools import partial
+import html
 import logging
+import threading
 
-import markdown
-import pymdownx.emoji
+from .emoji import get_emoji_config
 
 logger = logging.getLogger(__name__)
 
 
 class MarkupRenderer(ABC):
+    HTML_SKELETON = (
+        '<!doctype HTML><html><head><meta charset="utf-8">'
+        '<style type="text/css">%s</style></head><body>%s</body></html>'
+    )
+
     def __init__(self, name, file_type):
         self.name = name
         self.file_type = file_type
         self.tree_iter = None
 
+    def render(self, urls, raw_text, style=""):
+        """ Render a complete, standalone HTML document.
+        urls is the set of existing article URLs (see Wiki.url_snapshot).
+        """
+        return self.HTML_SKELETON % (
+            style,
+            self.render_body(urls, raw_text)
+        )
+
     @abstractmethod
-    def render(self, raw_text, style=""):
+    def render_body(self, urls, raw_text):
+        """ Render only the HTML fragment that goes into <body>. """
         pass
 
     def get_file_type(self):
@@ -26,16 +42,11 @@ class PlainRenderer(MarkupRenderer):
     def __init__(self):
         super().__init__("Plaintext", ".txt")
 
-    def render(self, raw_text, style=""):
-        return raw_text
+    def render_body(self, urls, raw_text):
+        return '<pre>%s</pre>' % html.escape(raw_text)
 
 
 class MarkdownRenderer(MarkupRenderer):
-    HTML_SKELETON = (
-        '<!doctype HTML><html><head><meta charset="utf-8">'
-        '<style type="text/css">%s</style></head><body>%s</body></html>'
-    )
-
     MARKDOWN_EXTENSIONS = [
         'markdown.extensions.toc',
         'markdown.extensions.tables',
@@ -46,16 +57,27 @@ class MarkdownRenderer(MarkupRenderer):
         'pymdownx.tasklist',
         'pymdownx.superfences',
         'mdwiki.backend.extensions.mdwikilinks:WikiLinkExtension',
-        'mdwiki.backend.extensions.cursor:CursorExtension'
+        'mdwiki.backend.extensions.sourcemap:SourceMapExtension'
     ]
 
     def __init__(self):
         super().__init__("Markdown", ".md")
+        self._emoji_config = None
+
+    @property
+    def emoji_config(self):
+        # Importing pymdownx (and with it markdown) takes a while, wait for the first render
+        if self._emoji_config is None:
+            self._emoji_config = get_emoji_config()
+
+        return self._emoji_config
 
-    def url_exists(self, wiki, url):
-        return wiki.get_article_by_url(url) is not None
+    def url_exists(self, urls, url):
+        return url in urls
+
+    def render_body(self, urls, raw_text):
+        import markdown
 
-    def render(self, wiki, raw_text, style=''):
         # BUG pymdownx.github fails to clean its state after each call, causing convert()
         # to use more and more resources with each call, slowing things down to a crawl
         # see https://github.com/facelessuser/pymdown-extensions/issues/15
@@ -68,46 +90,61 @@ class MarkdownRenderer(MarkupRenderer):
                                    "markdown.extensions.toc": {
                                        "anchorlink": False
                                    },
-                                   "pymdownx.emoji": {
-                                       "emoji_index": pymdownx.emoji.gemoji,
-                                       "emoji_generator": pymdownx.emoji.to_png,
-                                       "alt": "short",
-                                       "options": {
-                                           "attributes": {
-                                               "align": "absmiddle",
-                                               "height": "20px",
-                                               "width": "20px"
-                                           },
-                                           "image_path": "https://assets-cdn.github.com/images/icons/emoji/unicode/",
-                                           "non_standard_image_path":
-                                           "https://assets-cdn.github.com/images/icons/emoji/"
-                                       }
-                                   },
+                                   "pymdownx.emoji": self.emoji_config,
                                    "pymdownx.betterem": {
                                        "smart_enable": "all"
                                    },
                                    "mdwiki.backend.extensions.mdwikilinks:WikiLinkExtension": {
-                                       "url_exists": partial(self.url_exists, wiki)
+                                       "url_exists": partial(self.url_exists, urls)
                                    }
                                })
-        text = md.convert(raw_text)
-
-        return MarkdownRenderer.HTML_SKELETON % (
-            style,
-            text
-        )
+        return md.convert(raw_text)
 
 
 class ReSTRenderer(MarkupRenderer):
-    HTML_SKELETON = (
-        '<!doctype HTML><html><head><meta charset="utf-8"></head><body>%s</body></html>'
-    )
+    SETTINGS_OVERRIDES = {
+        # Don't look for docutils.conf files on every render
+        '_disable_config': True,
+        'output_encoding': 'unicode',
+    }
 
     def __init__(self):
         super().__init__("Restructured Text", ".rst")
-
-    def render(self, raw_text, style=''):
-        from docutils.core import publish_parts
-        return ReSTRenderer.HTML_SKELETON % (
-            publish_parts(raw_text, writer_name='html')['html_body']
-        )
+        self._publisher = None
+        self._lock = threading.Lock()
+
+    def get_publisher(self):
+        """ Set up docutils only once.
+        publish_parts() builds the settings, reader, parser and writer from
+        scratch every time, which is most of what makes it slow.
+        """
+        if self._publisher is None:
+            from docutils.core import Publisher
+            from docutils.io import StringInput, StringOutput
+
+            publisher = Publisher(source_class=StringInput,
+                                  destination_class=StringOutput)
+            publisher.set_components('standalone', 'restructuredtext', 'html')
+            publisher.process_programmatic_settings(None,
+                                                    ReSTRenderer.SETTINGS_OVERRIDES,
+                                                    None)
+            self._publisher = publisher
+
+        return self._publisher
+
+    def render_body(self, urls, raw_text):
+        # The publisher holds the document while rendering, one at a time please
+        with self._lock:
+            publisher = self.get_publisher()
+            publisher.set_source(raw_text, None)
+            publisher.set_destination(None, None)
+            publisher.publish()
+
+            return publisher.writer.parts['html_body']
+
+
+def create_renderers():
+    """ Return {file type: renderer} with one of each renderer. """
+    renderers = [PlainRenderer(), MarkdownRenderer(), ReSTRenderer()]
+
+    return {renderer.get_file_type(): renderer for renderer in renderers}
@@ -0,0 +1,98 @@
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from .linkmatcher import LinkMatcher
+
+logger = logging.getLogger(__name__)
+
+# Starting worker processes only pays off for a lot of pages
+PARALLEL_THRESHOLD = 200
+CHUNK_SIZE = 16
+
+# The matcher of a worker process, built once by init_worker
+_worker_matcher = None
+
+
+def init_worker(names):
+    global _worker_matcher
+    _worker_matcher = LinkMatcher(names)
+
+
+def find_mentions(text):
+    return _worker_matcher.find_mentions(text)
+
+
+class MentionIndex:
+    """ Finds mentions of article names which aren't linked, across the whole wiki.
+    Results are cached by the blob SHA of every page, so only pages which changed
+    are scanned again (as long as no article got created, renamed or deleted).
+    """
+
+    def __init__(self, wiki, workers=None):
+        self.wiki = wiki
+        self.workers = workers
+        self.version = None
+        # Blob SHA -> [(start, end, url)]
+        self.mentions = {}
+
+    def find(self, target=None):
+        """ Returns {article: [(start, end, mentioned article)]} for every article
+        with unlinked mentions, only counting mentions of target if given.
+        Articles never mention themselves.
+        """
+        if self.version != self.wiki.structure_version:
+            self.version = self.wiki.structure_version
+            self.mentions = {}
+
+        articles = list(self.wiki.iter_articles())
+        # Unchanged articles take their SHA from the index, they aren't hashed again
+        shas = [self.wiki.text_sha(article) for article in articles]
+        texts = {}
+        for article, sha in zip(articles, shas):
+            texts.setdefault(sha, article.text)
+
+        missing = {sha: text for sha, text in texts.items() if sha not in self.mentions}
+        if missing:
+            logger.info('Scanning %d of %d pages for unlinked mentions' % (len(missing), len(texts)))
+            self.mentions.update(self.scan(missing))
+
+        # Forget pages which don't exist anymore
+        self.mentions = {sha: self.mentions[sha] for sha in texts}
+
+        articles_by_url = {article.wiki_url: article for article in articles}
+        result = {}
+        for article, sha in zip(articles, shas):
+            found = []
+            for start, end, url in self.mentions[sha]:
+                mentioned = articles_by_url.get(url)
+
+                if mentioned is article or (target is not None and mentioned is not target):
+                    continue
+
+                found.append((start, end, mentioned))
+
+            if found:
+                result[article] = found
+
+        return result
+
+    def scan(self, texts):
+        """ Returns {sha: [(start, end, url)]} for the given {sha: text}. """
+        if len(texts) < PARALLEL_THRESHOLD or self.workers == 1:
+            matcher = self.wiki.link_matcher
+            return {sha: [(start, end, article.wiki_url)
+                          for start, end, article in matcher.find_mentions(text)]
+                    for sha, text in texts.items()}
+
+        # Articles can't be sent to other processes, identify them by URL
+        names = [(name, article.wiki_url) for name, article in self.wiki.iter_named_articles()]
+
+        # Don't fork, the GUI runs threads of its own
+        with ProcessPoolExecutor(self.workers,
+                                 mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=init_worker,
+                                 initargs=(names,)) as executor:
+            results = executor.map(find_mentions, texts.values(), chunksize=CHUNK_SIZE)
+
+            return dict(zip(texts.keys(), results))
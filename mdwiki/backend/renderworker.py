@@ -0,0 +1,74 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class RenderWorker:
+    """ Runs render jobs on a background thread.
+    Only the latest request is kept: submitting a new job replaces the one
+    that is still waiting, and results of outdated jobs are thrown away.
+    """
+
+    def __init__(self, callback):
+        self.callback = callback
+
+        self._condition = threading.Condition()
+        self._request = None
+        self._generation = 0
+        self._running = True
+
+        self._thread = threading.Thread(target=self._run,
+                                        name='RenderWorker',
+                                        daemon=True)
+        self._thread.start()
+
+    def submit(self, func, *args, **kwargs):
+        """ Queue a job, replacing any job that hasn't been started yet.
+        Returns the generation of the job, which is passed on to the callback.
+        """
+        with self._condition:
+            self._generation += 1
+            self._request = (self._generation, func, args, kwargs)
+            self._condition.notify()
+
+            return self._generation
+
+    def cancel(self):
+        """ Drop the waiting job and discard the result of the running one. """
+        with self._condition:
+            self._generation += 1
+            self._request = None
+
+    def is_current(self, generation):
+        return generation == self._generation
+
+    def close(self):
+        with self._condition:
+            self._running = False
+            self._request = None
+            self._condition.notify()
+
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._running and self._request is None:
+                    self._condition.wait()
+
+                if not self._running:
+                    return
+
+                generation, func, args, kwargs = self._request
+                self._request = None
+
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                logger.exception("Render job failed!")
+                continue
+
+            # A newer job came in while we were busy, nobody wants this result
+            if self.is_current(generation):
+                self.callback(generation, result)
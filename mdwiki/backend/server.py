@@ -0,0 +1,208 @@
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote, urlsplit
+
+from .constants import FALLBACK_RENDERER
+from .markuprenderer import create_renderers
+
+logger = logging.getLogger(__name__)
+
+# Keep the rendered pages of this many articles
+CACHE_SIZE = 1000
+# Render this many pages at the same time
+RENDER_THREADS = 4
+# Give up on clients which don't send a complete request for this long (in seconds)
+REQUEST_TIMEOUT = 30
+# Don't accept request heads larger than this
+MAX_HEAD_SIZE = 64 * 1024
+
+STATUS_TEXTS = {
+    200: 'OK',
+    304: 'Not Modified',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    500: 'Internal Server Error',
+}
+
+
+class Page:
+    def __init__(self, status, body, etag=None):
+        self.status = status
+        self.body = body
+        self.etag = etag
+
+
+class WikiServer:
+    """ Serves the articles of a wiki as HTML over HTTP, read-only.
+    Pages are rendered on demand on a thread pool and kept in a cache. Their ETags
+    are made from the blob SHA of the article's text and the URLs of the wiki (which
+    decide how links are rendered), so browsers get a 304 for pages which didn't change.
+    Requests for a page which is being rendered wait for that render instead of starting
+    another one. The wiki is only ever used on the event loop's thread.
+    """
+
+    def __init__(self, wiki, renderers=None, cache_size=CACHE_SIZE, render_threads=RENDER_THREADS):
+        self.wiki = wiki
+        self.renderers = renderers or create_renderers()
+        self.cache_size = cache_size
+        self.executor = ThreadPoolExecutor(render_threads)
+
+        # ETag -> rendered page, least recently used first
+        self.cache = OrderedDict()
+        # ETag -> future of the page being rendered
+        self.renders = {}
+        self.renders_started = 0
+
+        # Digest of the URLs of the wiki and the structure version it was made for
+        self._urls_version = None
+        self._urls_digest = None
+
+    def urls_digest(self):
+        snapshot = self.wiki.url_snapshot
+
+        if self._urls_version != snapshot.version:
+            digest = hashlib.sha1('\n'.join(sorted(snapshot.urls)).encode('utf-8'))
+            self._urls_digest = digest.hexdigest()
+            self._urls_version = snapshot.version
+
+        return self._urls_digest
+
+    def etag(self, article):
+        key = '%s:%s:%s' % (self.wiki.text_sha(article), article.file_type, self.urls_digest())
+
+        return '"%s"' % (hashlib.sha1(key.encode('utf-8')).hexdigest())
+
+    async def page(self, path, if_none_match=''):
+        """ Return the Page for the URL path of a request. Pages whose ETag is in
+        if_none_match aren't rendered, a 304 is returned instead.
+        """
+        url = unquote(urlsplit(path).path).strip('/')
+        article = self.wiki.get_article_by_url(url) if url else self.wiki.root
+
+        if article is None:
+            return Page(404, b'<!doctype HTML><html><body><h1>Not found</h1></body></html>')
+
+        etag = self.etag(article)
+        if etag in if_none_match:
+            return Page(304, b'', etag)
+
+        body = self.cache.get(etag)
+        if body is not None:
+            self.cache.move_to_end(etag)
+            return Page(200, body, etag)
+
+        render = self.renders.get(etag)
+        if render is None:
+            renderer = self.renderers.get(article.file_type, self.renderers[FALLBACK_RENDERER])
+            render = asyncio.get_running_loop().run_in_executor(
+                self.executor, self.render, renderer, self.wiki.url_snapshot, article.text)
+            self.renders[etag] = render
+            self.renders_started += 1
+
+            render.add_done_callback(lambda _: self.renders.pop(etag, None))
+
+        try:
+            # Don't let one client giving up cancel the render for everybody else
+            body = await asyncio.shield(render)
+        except Exception:
+            logger.exception("Could not render '%s'!" % (url))
+            return Page(500, b'<!doctype HTML><html><body><h1>Could not render this page</h1></body></html>')
+
+        self.cache[etag] = body
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+        return Page(200, body, etag)
+
+    @staticmethod
+    def render(renderer, urls, text):
+        return renderer.render(urls, text).encode('utf-8')
+
+    async def handle(self, reader, writer):
+        """ Answer the requests of one connection, which is kept open if the client wants it. """
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), REQUEST_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    break
+                except asyncio.LimitOverrunError:
+                    await self.respond(writer, Page(400, b''), False)
+                    break
+
+                lines = head.decode('latin-1').split('\r\n')
+                try:
+                    method, path, version = lines[0].split(' ')
+                except ValueError:
+                    await self.respond(writer, Page(400, b''), False)
+                    break
+
+                headers = {}
+                for line in lines[1:]:
+                    name, _, value = line.partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                connection = headers.get('connection', '').lower()
+                keep_alive = connection == 'keep-alive' if version == 'HTTP/1.0' else connection != 'close'
+
+                if method not in ('GET', 'HEAD'):
+                    page = Page(405, b'')
+                    # We don't read request bodies, so we can't find the next request
+                    keep_alive = False
+                else:
+                    page = await self.page(path, headers.get('if-none-match', ''))
+
+                logger.debug('%s %s %d' % (method, path, page.status))
+                await self.respond(writer, page, keep_alive, method == 'HEAD')
+
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def respond(self, writer, page, keep_alive, head_only=False):
+        headers = ['HTTP/1.1 %d %s' % (page.status, STATUS_TEXTS[page.status]),
+                   'Content-Length: %d' % (len(page.body)),
+                   'Connection: %s' % ('keep-alive' if keep_alive else 'close')]
+
+        if page.status != 304:
+            headers.append('Content-Type: text/html; charset=utf-8')
+        if page.etag is not None:
+            # Ask browsers to check with us before showing what they have
+            headers.extend(['ETag: %s' % (page.etag), 'Cache-Control: no-cache'])
+        if page.status == 405:
+            headers.append('Allow: GET, HEAD')
+
+        writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode('latin-1'))
+        if not head_only:
+            writer.write(page.body)
+
+        await writer.drain()
+
+    async def start(self, host, port):
+        """ Start listening, returns the asyncio server. """
+        return await asyncio.start_server(self.handle, host, port, limit=MAX_HEAD_SIZE)
+
+    async def run(self, host, port, watch=True):
+        """ Serve until cancelled. If watch is set, changes to the files of the wiki are picked up. """
+        loop = asyncio.get_running_loop()
+        server = await self.start(host, port)
+
+        if watch:
+            # The watcher reports changes on its own thread, apply them on ours
+            self.wiki.start_watching(
+                lambda changes: loop.call_soon_threadsafe(self.wiki.apply_external_changes, changes))
+
+        for socket in server.sockets:
+            logger.info("Serving '%s' on http://%s:%d/" % ((self.wiki.name,) + socket.getsockname()[:2]))
+
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.wiki.stop_watching()
+            self.executor.shutdown(wait=False)
@@ -0,0 +1,90 @@
+import math
+import re
+
+WORD_RE = re.compile(r'\w+')
+LINK_RE = re.compile(r'\[\[[^\[\]]*\]\]|\[[^\[\]]*\]\([^()]*\)')
+
+WORDS_PER_MINUTE = 200
+
+FRONT_MATTER_MARK = '---'
+# Don't look for the end of the front matter forever
+FRONT_MATTER_MAX_LINES = 100
+
+# Indices into the per-line statistics
+WORDS = 0
+CHARACTERS = 1
+HEADINGS = 2
+LINKS = 3
+FRONT_MATTER_MARKS = 4
+
+
+class DocumentStatistics:
+    """ Keeps word, character, heading and link counts of a document per line.
+    After the initial count, edits only cost as much as the lines they touch.
+    """
+
+    def __init__(self, text=''):
+        self.reset(text)
+
+    def reset(self, text):
+        self.lines = [DocumentStatistics.count_line(line) for line in text.split('\n')]
+        self.totals = [sum(column) for column in zip(*self.lines)]
+
+    def update(self, first_line, removed_lines, new_lines):
+        """ Replace removed_lines lines, starting at first_line, with the texts in new_lines. """
+        end_line = first_line + removed_lines
+        new_statistics = [DocumentStatistics.count_line(line) for line in new_lines]
+
+        for statistics in self.lines[first_line:end_line]:
+            for column, value in enumerate(statistics):
+                self.totals[column] -= value
+
+        for statistics in new_statistics:
+            for column, value in enumerate(statistics):
+                self.totals[column] += value
+
+        self.lines[first_line:end_line] = new_statistics
+
+    @staticmethod
+    def count_line(line):
+        line = line.rstrip('\r\n')
+
+        return (len(WORD_RE.findall(line)),
+                len(line),
+                1 if line.startswith('#') else 0,
+                len(LINK_RE.findall(line)),
+                1 if line.rstrip() == FRONT_MATTER_MARK else 0)
+
+    def front_matter_lines(self):
+        """ Returns the number of lines taken up by front matter (e.g. '---\\ntitle: x\\n---'). """
+        if not self.lines[0][FRONT_MATTER_MARKS]:
+            return 0
+
+        for index in range(1, min(len(self.lines), FRONT_MATTER_MAX_LINES)):
+            if self.lines[index][FRONT_MATTER_MARKS]:
+                return index + 1
+
+        return 0
+
+    @property
+    def words(self):
+        front_matter = self.lines[:self.front_matter_lines()]
+        return self.totals[WORDS] - sum(line[WORDS] for line in front_matter)
+
+    @property
+    def characters(self):
+        # Line breaks count as characters, too
+        return self.totals[CHARACTERS] + len(self.lines) - 1
+
+    @property
+    def headings(self):
+        return self.totals[HEADINGS]
+
+    @property
+    def links(self):
+        return self.totals[LINKS]
+
+    @property
+    def reading_time(self):
+        """ Estimated reading time in minutes. """
+        return math.ceil(self.words / WORDS_PER_MINUTE)
@@ -0,0 +1,205 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+FETCH = 'fetch'
+PULL = 'pull'
+PUSH = 'push'
+
+
+class SyncCancelled(Exception):
+    """ Raised inside of a pull, push or fetch once it has been cancelled. """
+
+
+class SyncError(Exception):
+    """ Raised if a pull or push can't be done, e.g. because the wiki and its remote diverged. """
+
+
+class SyncJob:
+    """ A pull, push or fetch waiting for or running on the sync thread. """
+
+    def __init__(self, operation, background=False, after=None):
+        self.operation = operation
+        # Background fetches are started by the timer, not the user
+        self.background = background
+        # The job has to succeed before this one runs, e.g. the pull before the push of a sync
+        self.after = after
+        # Whatever the operation returned, e.g. the files changed by a pull
+        self.result = None
+        # What went wrong, once the job is done
+        self.error = None
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def is_cancelled(self):
+        return self._cancelled.is_set()
+
+    def __repr__(self):
+        return "<SyncJob %s>" % (self.operation)
+
+
+class SyncService:
+    """ Pulls from and pushes to the remote of a wiki on a background thread.
+    Progress messages of git are handed to progress_callback(job, message) and
+    finished_callback(job, error) is called once a job is done. error is None
+    on success, an instance of SyncCancelled if the job was cancelled or whatever
+    else went wrong. Both callbacks are called on the sync thread. The articles
+    aren't touched here, the files changed by a pull are left in job.result
+    for Wiki.apply_pulled_changes.
+    If fetch_interval is set, the remote is fetched every fetch_interval seconds
+    while no other job is running.
+    """
+
+    def __init__(self, wiki, progress_callback, finished_callback, fetch_interval=None):
+        self.wiki = wiki
+        self.progress_callback = progress_callback
+        self.finished_callback = finished_callback
+        self.fetch_interval = fetch_interval
+
+        self._condition = threading.Condition()
+        self._queue = []
+        self._current = None
+        self._running = True
+        self._last_fetch = time.monotonic()
+
+        self._thread = threading.Thread(target=self._run,
+                                        name='SyncService',
+                                        daemon=True)
+        self._thread.start()
+
+    def fetch(self):
+        return self.submit(FETCH)
+
+    def pull(self):
+        return self.submit(PULL)
+
+    def push(self):
+        return self.submit(PUSH)
+
+    def sync(self):
+        """ Pull, then push. The push is cancelled if the pull fails. Returns both jobs. """
+        pull = self.submit(PULL)
+
+        return pull, self.submit(PUSH, after=pull)
+
+    def submit(self, operation, background=False, after=None):
+        """ Queue a job, returns the queued job. Asking for an operation which is
+        already waiting returns the waiting job instead of queueing it twice.
+        """
+        with self._condition:
+            for job in self._queue:
+                if job.operation == operation:
+                    return job
+
+            job = SyncJob(operation, background, after)
+            self._queue.append(job)
+            self._condition.notify()
+
+            return job
+
+    def cancel(self):
+        """ Cancel the running job and drop all waiting ones. """
+        with self._condition:
+            jobs = self._queue
+            self._queue = []
+
+            if self._current:
+                self._current.cancel()
+
+        for job in jobs:
+            job.cancel()
+            self._finish(job, SyncCancelled())
+
+    @property
+    def busy(self):
+        with self._condition:
+            return self._current is not None or bool(self._queue)
+
+    def set_fetch_interval(self, fetch_interval):
+        with self._condition:
+            self.fetch_interval = fetch_interval
+            self._last_fetch = time.monotonic()
+            self._condition.notify()
+
+    def close(self):
+        self.cancel()
+
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+
+        self._thread.join()
+
+    def _next_job(self):
+        """ Waits for the next job, or for the next background fetch to be due. """
+        with self._condition:
+            while self._running and not self._queue:
+                if self.fetch_interval is None:
+                    self._condition.wait()
+                    continue
+
+                remaining = self._last_fetch + self.fetch_interval - time.monotonic()
+                if remaining <= 0:
+                    self._queue.append(SyncJob(FETCH, background=True))
+                    break
+
+                self._condition.wait(remaining)
+
+            if not self._running:
+                return None
+
+            self._current = self._queue.pop(0)
+
+            return self._current
+
+    def _run(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+
+            error = None
+            try:
+                self._execute(job)
+            except Exception as e:
+                if not isinstance(e, SyncCancelled):
+                    logger.exception("%s failed!" % (job.operation.capitalize()))
+                error = e
+
+            with self._condition:
+                self._current = None
+
+                if job.operation in (FETCH, PULL):
+                    self._last_fetch = time.monotonic()
+
+            self._finish(job, error)
+
+    def _execute(self, job):
+        def progress(message):
+            if isinstance(message, bytes):
+                message = message.decode('utf-8', 'replace')
+
+            self.progress_callback(job, message)
+
+        if job.is_cancelled():
+            raise SyncCancelled()
+
+        # Pushing after a failed pull would at best fail as well
+        if job.after is not None and job.after.error is not None:
+            raise SyncCancelled()
+
+        start = time.perf_counter()
+        job.result = getattr(self.wiki, job.operation)(progress, cancelled=job.is_cancelled)
+        logger.info("%s took %.2fs" % (job.operation.capitalize(), time.perf_counter() - start))
+
+    def _finish(self, job, error):
+        job.error = error
+
+        try:
+            self.finished_callback(job, error)
+        except Exception:
+            logger.exception("Could not report the end of %r" % (job))
@@ -0,0 +1,57 @@
+from bisect import bisect_right
+
+from .linkmatcher import fold_case
+
+# Separates the entries of the index, can't be typed into a filter
+SEPARATOR = '\0'
+
+
+class TitleIndex:
+    """ Finds articles whose title or URL contains a text, ignoring case.
+    All titles and URLs are kept in one string, so searching is done by
+    str.find instead of looking at every article in Python.
+    """
+
+    def __init__(self, articles, version=0):
+        """ articles is an iterable of (article, url, title) tuples. """
+        self.version = version
+        self.articles = []
+        keys = []
+
+        for article, url, title in articles:
+            self.articles.append(article)
+            keys.append(fold_case(url + '\n' + title))
+
+        # Where the entry of every article starts
+        self.offsets = []
+        offset = 0
+        for key in keys:
+            self.offsets.append(offset)
+            offset += len(key) + 1
+
+        self.text = SEPARATOR.join(keys)
+
+    def __len__(self):
+        return len(self.articles)
+
+    def search(self, query):
+        """ Returns the list of matching articles, in index order. """
+        query = fold_case(query.strip())
+        if not query or SEPARATOR in query:
+            return []
+
+        text = self.text
+        offsets = self.offsets
+        result = []
+
+        position = text.find(query)
+        while position != -1:
+            number = bisect_right(offsets, position) - 1
+            result.append(self.articles[number])
+
+            # Continue with the next article
+            if number + 1 >= len(offsets):
+                break
+            position = text.find(query, offsets[number + 1])
+
+        return result
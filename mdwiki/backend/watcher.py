@@ -0,0 +1,228 @@
+import logging
+import os
+import threading
+import time
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    # Without watchdog (inotify, FSEvents, ...) we look for changes ourselves
+    FileSystemEventHandler = object
+    Observer = None
+
+logger = logging.getLogger(__name__)
+
+# Wait for this long after the last change before reporting changes (in seconds)
+DEBOUNCE_DELAY = 0.5
+# ... but never longer than this while things keep changing, e.g. during a checkout
+MAX_DELAY = 5.0
+# How often to look for changes without watchdog (in seconds), each time the whole wiki is scanned
+POLL_INTERVAL = 10.0
+
+
+def scan_files(path, controldir):
+    """ Return {path relative to path: (mtime, size, inode)} of every file in path,
+    leaving out the git repository except for its index.
+    """
+    files = {}
+
+    for folder, folders, names in os.walk(path):
+        if os.path.normpath(folder) == os.path.normpath(path):
+            folders[:] = [name for name in folders
+                          if os.path.join(folder, name) != controldir]
+
+        for name in names:
+            full_path = os.path.join(folder, name)
+            try:
+                stat = os.lstat(full_path)
+            except FileNotFoundError:
+                continue
+
+            relative_path = os.path.relpath(full_path, path).replace(os.sep, '/')
+            files[relative_path] = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    index_path = os.path.join(controldir, 'index')
+    try:
+        stat = os.lstat(index_path)
+        files[os.path.relpath(index_path, path).replace(os.sep, '/')] = \
+            (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+    except FileNotFoundError:
+        pass
+
+    return files
+
+
+class WatchdogHandler(FileSystemEventHandler):
+    def __init__(self, watcher):
+        super().__init__()
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        dest_path = getattr(event, 'dest_path', None)
+
+        if event.event_type == 'moved':
+            self.watcher.add(event.src_path, dest_path)
+        elif event.event_type in ('created', 'deleted', 'modified'):
+            self.watcher.add(event.src_path)
+
+
+class WikiWatcher:
+    """ Tells a wiki about files changed by other programs (an editor, git, a file manager, ...).
+    Changes are collected until nothing happened for debounce seconds, so a storm of
+    events (e.g. by 'git checkout') is reported at once. They are handed to callback(changes)
+    on the watcher's thread as a list of (old_path, new_path) tuples relative to the wiki,
+    which only differ for moved files. The callback defaults to wiki.apply_external_changes.
+    Uses watchdog if it is installed, otherwise the wiki is polled every poll_interval seconds.
+    """
+
+    def __init__(self, wiki, callback=None, debounce=DEBOUNCE_DELAY, max_delay=MAX_DELAY,
+                 poll_interval=POLL_INTERVAL, polling=None):
+        self.wiki = wiki
+        self.path = os.path.normpath(wiki.physical_path)
+        self.controldir = os.path.normpath(wiki.git_repository.controldir())
+        self.callback = callback or wiki.apply_external_changes
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.polling = Observer is None if polling is None else polling
+
+        if polling is None and Observer is None:
+            logger.warning("watchdog isn't installed, looking for changes in '%s' every %gs"
+                           % (self.path, poll_interval))
+
+        self._condition = threading.Condition()
+        # Changed paths in the order they were seen, moved files map to their destination
+        self._changes = {}
+        # When to report the collected changes and the latest we may wait until
+        self._deadline = None
+        self._latest = None
+        self._running = True
+
+        self._snapshot = scan_files(self.path, self.controldir) if self.polling else None
+        self._observer = None
+
+        if not self.polling:
+            self._observer = Observer()
+            self._observer.schedule(WatchdogHandler(self), self.path, recursive=True)
+            self._observer.start()
+
+        self._thread = threading.Thread(target=self._run,
+                                        name='WikiWatcher',
+                                        daemon=True)
+        self._thread.start()
+
+    def relative_path(self, path):
+        """ Return path relative to the wiki, or None if it should be ignored. """
+        if isinstance(path, bytes):
+            path = os.fsdecode(path)
+
+        path = os.path.normpath(path)
+
+        # Git writes most of its files through locks, only its index interests us
+        if path == self.controldir or path.startswith(self.controldir + os.sep):
+            if path != os.path.join(self.controldir, 'index'):
+                return None
+        elif path.endswith('.lock'):
+            return None
+
+        relative_path = os.path.relpath(path, self.path)
+        if relative_path == os.curdir or relative_path.startswith(os.pardir):
+            return None
+
+        return relative_path.replace(os.sep, '/')
+
+    def add(self, path, dest_path=None):
+        """ Note that the file at path changed, or got moved to dest_path. Thread safe. """
+        old_path = self.relative_path(path)
+        new_path = self.relative_path(dest_path) if dest_path is not None else old_path
+
+        if old_path is None and new_path is None:
+            return
+
+        with self._condition:
+            if old_path is None or new_path is None:
+                # Moved from or into a lock file, just a change of the other one
+                old_path = new_path = old_path or new_path
+            elif old_path != new_path:
+                # A file moved twice only moved once
+                for origin, destination in self._changes.items():
+                    if destination == old_path and origin != destination:
+                        old_path = origin
+                        break
+
+            self._changes[old_path] = new_path
+
+            now = time.monotonic()
+            if self._latest is None:
+                self._latest = now + self.max_delay
+
+            self._deadline = min(now + self.debounce, self._latest)
+            self._condition.notify()
+
+    def close(self):
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+
+        self._thread.join()
+
+    def poll(self):
+        """ Compare the files of the wiki with the last scan and note the differences. """
+        snapshot = scan_files(self.path, self.controldir)
+
+        for path, stat in snapshot.items():
+            if self._snapshot.get(path) != stat:
+                self.add(os.path.join(self.path, path))
+
+        for path in self._snapshot.keys() - snapshot.keys():
+            self.add(os.path.join(self.path, path))
+
+        self._snapshot = snapshot
+
+    def _run(self):
+        next_poll = time.monotonic() + self.poll_interval
+
+        while True:
+            with self._condition:
+                while self._running:
+                    now = time.monotonic()
+
+                    if self._deadline is not None and self._deadline <= now:
+                        break
+                    if self.polling and next_poll <= now:
+                        break
+
+                    timeouts = [deadline - now for deadline in (self._deadline,
+                                next_poll if self.polling else None) if deadline is not None]
+                    self._condition.wait(min(timeouts) if timeouts else None)
+
+                if not self._running:
+                    return
+
+                changes = None
+                if self._deadline is not None and self._deadline <= time.monotonic():
+                    changes = list(self._changes.items())
+                    self._changes = {}
+                    self._deadline = None
+                    self._latest = None
+
+            if changes is None:
+                try:
+                    self.poll()
+                except Exception:
+                    logger.exception("Could not look for changes in '%s'!" % (self.path))
+
+                next_poll = time.monotonic() + self.poll_interval
+                continue
+
+            logger.debug("%d files changed on disk" % (len(changes)))
+
+            try:
+                self.callback(changes)
+            except Exception:
+                logger.exception("Could not apply changes to '%s'!" % (self.path))
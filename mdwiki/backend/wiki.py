@@ -1,26 +1,96 @@
 from .article import Article
 from .constants import INDEX_FILE_NAME, CONFIG_FILE_NAME, FALLBACK_RENDERER
-from .util import natural_sort_key
+from .events import ChangeType, EventBus, STRUCTURE_CHANGES
+from .linkcompleter import LinkCompleter
+from .journal import EditJournal, JOURNAL_FILE_NAME
+from .linkmatcher import LinkMatcher
+from .maintenance import MaintenanceScheduler, maintain
+from .mentions import MentionIndex
+from .checkout import article_path, diff_trees, is_ancestor, update_working_tree
+from .sync import SyncCancelled, SyncError
+from .titleindex import TitleIndex
+from .util import natural_sort_key, split_path
+from .watcher import WikiWatcher
 
 import os
 import configparser
 import logging
 
 from dulwich.repo import Repo as DulwichWiki
-from dulwich.index import get_unstaged_changes
+from dulwich.file import GitFile
+from dulwich.index import get_unstaged_changes, index_entry_from_stat
+from dulwich.objects import Blob
 from dulwich.objectspec import parse_reftuples
-from dulwich.client import get_transport_and_path_from_url
+from dulwich.client import get_transport_and_path
 from dulwich.errors import SendPackError, UpdateRefsError
 from dulwich.protocol import ZERO_SHA
 import dulwich.client
-from dulwich.contrib.paramiko_vendor import ParamikoSSHVendor
-dulwich.client.get_ssh_vendor = ParamikoSSHVendor
+
+
+def get_ssh_vendor():
+    # Importing paramiko takes longer than everything else, wait until we connect over SSH
+    from dulwich.contrib.paramiko_vendor import ParamikoSSHVendor
+
+    return ParamikoSSHVendor()
+
+
+dulwich.client.get_ssh_vendor = get_ssh_vendor
 
 logger = logging.getLogger(__name__)
 
+# The branch articles are committed to, pulled into and pushed from
+BRANCH_REF = b"refs/heads/master"
+
+
+def to_tree_path(path):
+    """ Git (and dulwich) use forward slashes in paths, even on Windows. """
+    return path.replace("\\", "/")
+
+
+def file_stat(path):
+    """ What tells us wether a file changed, None if it doesn't exist. """
+    try:
+        stat = os.lstat(path)
+    except FileNotFoundError:
+        return None
+
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+class UrlSnapshot:
+    """ An immutable set of the URLs of all articles in a wiki at a certain version.
+    Lookups are case insensitive, just like resolving URLs is.
+    """
+
+    def __init__(self, version, urls):
+        self.version = version
+        self.urls = frozenset(UrlSnapshot.normalize(url) for url in urls)
+
+    def __contains__(self, url):
+        return UrlSnapshot.normalize(url) in self.urls
+
+    def __len__(self):
+        return len(self.urls)
+
+    @staticmethod
+    def normalize(url):
+        return '/'.join(split_path(url)).lower()
+
 
 class Wiki:
-    def __init__(self, path, dulwich_repos=None):
+    def __init__(self, path, dulwich_repos=None, import_index=True):
+        # Tells subscribers (e.g. the GUI) about changes to articles
+        self.events = EventBus()
+        # Incremented whenever articles are created, renamed, moved or deleted
+        self.structure_version = 0
+        self._url_snapshot = None
+        self._link_matcher = None
+        self._link_completer = None
+        self._title_index = None
+        self.mention_index = MentionIndex(self)
+        self.maintenance = None
+        self.watcher = None
+
         self._name = ""
         self._default_file_type = ".md"
         self._author_name = ""
@@ -30,11 +100,22 @@ class Wiki:
         self._path = path
         self.config_path = os.path.join(path, CONFIG_FILE_NAME)
         self.git_repository = dulwich_repos or DulwichWiki(path)
-        self.unstaged_changes = []
+        self.unstaged_changes = set()
+        # The cached index of the repository and the stat of its file when it was read
+        self._index = None
+        self._index_stat = None
+        # Path in the index -> (blob SHA, stat) of files written by write_file()
+        self.written_blobs = {}
+        # Remembers unsaved edits in case we crash
+        self.journal = EditJournal(os.path.join(self.git_repository.controldir(), JOURNAL_FILE_NAME),
+                                   path)
 
         self.read_config()
+        # Reopening a wiki must not overwrite its index page
+        index_path = os.path.join(path, INDEX_FILE_NAME + self._default_file_type)
         self.root = Article(self, None, self._default_file_type,
-                            name=self._name, is_directory=True)
+                            name=self._name or "", is_directory=True,
+                            file_name="" if os.path.exists(index_path) else None)
 
         git_config = self.git_repository.get_config()
 
@@ -54,18 +135,21 @@ class Wiki:
         # Fetch unstaged changes before importing index so that articles
         # will have the correct icon already
         self.fetch_unstaged_changes()
-        self.import_current_index()
 
-        self.root.dump()
+        # Otherwise the caller imports the articles bit by bit, see WikiLoader
+        if import_index:
+            self.import_current_index()
+
+            self.root.dump()
 
     @classmethod
-    def open(cls, path):
+    def open(cls, path, import_index=True):
         """ Open a repository folder and return a new instance of Wiki. """
         # There has to be a .git directory for us to open this repository
         if not os.path.exists(os.path.join(path, ".git")):
             return None
 
-        return Wiki(path)
+        return Wiki(path, import_index=import_index)
 
     @classmethod
     def create(cls, name, path, remote_url, file_type, author_name, author_mail, template_text):
@@ -77,6 +161,8 @@ class Wiki:
 
         # Initialize index page with template
         wiki.root.text = template_text
+        wiki.root.write()
+        wiki.root.commit("Initialize index page.")
 
         return wiki
 
@@ -88,6 +174,44 @@ class Wiki:
     def name(self):
         return self._name
 
+    @property
+    def url_snapshot(self):
+        """ The URLs of all articles. Only rebuilt after the structure of the wiki changed. """
+        if self._url_snapshot is None or self._url_snapshot.version != self.structure_version:
+            self._url_snapshot = UrlSnapshot(self.structure_version,
+                                             self.get_all_urls())
+
+        return self._url_snapshot
+
+    @property
+    def link_matcher(self):
+        """ Finds mentions of article names. Only rebuilt after the structure of the wiki changed. """
+        if self._link_matcher is None or self._link_matcher.version != self.structure_version:
+            self._link_matcher = LinkMatcher(self.iter_named_articles(),
+                                             self.structure_version)
+
+        return self._link_matcher
+
+    @property
+    def link_completer(self):
+        """ Completes partial links. Only rebuilt after the structure of the wiki changed. """
+        if self._link_completer is None or self._link_completer.version != self.structure_version:
+            self._link_completer = LinkCompleter(((article.wiki_url, name)
+                                                  for name, article in self.iter_named_articles()),
+                                                 self.structure_version)
+
+        return self._link_completer
+
+    @property
+    def title_index(self):
+        """ Finds articles by parts of their titles or URLs. Only rebuilt after the structure of the wiki changed. """
+        if self._title_index is None or self._title_index.version != self.structure_version:
+            self._title_index = TitleIndex(((article, article.wiki_url, name)
+                                            for name, article in self.iter_named_articles()),
+                                           self.structure_version)
+
+        return self._title_index
+
     @name.setter
     def name(self, name):
         self._name = name
@@ -185,9 +309,14 @@ class Wiki:
 
     def import_current_index(self):
         """ Imports the current index of the git repository and creates Article instances for every file. """
+        self.import_files(self.indexed_files())
+
+    def indexed_files(self):
+        """ Return the files in the index which are imported as articles, in natural order. """
         indexed_files = sorted(
-            list(self.git_repository.open_index()), key=natural_sort_key)
+            list(self.open_index()), key=natural_sort_key)
 
+        files = []
         for file_name in indexed_files:
             file_name = file_name.decode("utf-8")
 
@@ -196,86 +325,617 @@ class Wiki:
             if basename.startswith(".") or basename.startswith(INDEX_FILE_NAME):
                 continue
 
-            logger.info('Imported from index: %s' % (file_name))
-            self.root.create_article_from_file(file_name)
+            files.append(file_name)
+
+        return files
+
+    def import_files(self, files, texts=None):
+        """ Create the articles of files (see indexed_files()). texts maps some of
+        them to their contents, which have been read already.
+        """
+        texts = texts or {}
+
+        with self.events.batch():
+            for file_name in files:
+                logger.info('Imported from index: %s' % (file_name))
+                self.root.create_article_from_file(file_name, texts.get(file_name))
 
     def fetch_unstaged_changes(self):
         """ Fetch the current list of unstaged changes from git. """
-        self.unstaged_changes = []
+        self.unstaged_changes = set()
         try:
-            for change in get_unstaged_changes(self.git_repository.open_index(), self.physical_path):
-                self.unstaged_changes.append(change.decode('utf-8'))
+            for change in get_unstaged_changes(self.open_index(), self.physical_path):
+                self.unstaged_changes.add(change.decode('utf-8'))
         except FileNotFoundError:
             pass
 
+    def open_index(self):
+        """ Return the index of the repository, it is only read again after someone else changed it. """
+        index_stat = file_stat(self.git_repository.index_path())
+
+        if self._index is None or index_stat != self._index_stat:
+            self._index = self.git_repository.open_index()
+            self._index_stat = index_stat
+
+        return self._index
+
+    def text_sha(self, article):
+        """ The blob SHA of the article's text, taken from the index if the file wasn't changed,
+        so articles don't have to be hashed to find out if they changed.
+        """
+        path = article.text_path
+
+        if not article.modified and not self.is_path_unstaged(path):
+            try:
+                return self.open_index()[to_tree_path(path).encode('utf-8')].sha.decode('ascii')
+            except KeyError:
+                pass
+
+        return Blob.from_string(article.text.encode('utf-8')).id.decode('ascii')
+
+    def write_index(self):
+        self._index.write()
+        self._index_stat = file_stat(self.git_repository.index_path())
+
+    def write_file(self, path, data):
+        """ Write data to the file at path (relative to the wiki), unless git already
+        has exactly this content there. The blob is stored right away, so staging the file
+        doesn't have to read and hash it again. Returns wether the file got written.
+        """
+        tree_path = to_tree_path(path)
+        blob = Blob.from_string(data)
+
+        try:
+            indexed_sha = self.open_index()[tree_path.encode('utf-8')].sha
+        except KeyError:
+            indexed_sha = None
+
+        # Nothing to do if the file is neither staged with other content nor changed on disk
+        if blob.id == indexed_sha and tree_path not in self.unstaged_changes:
+            logger.debug("'%s' didn't change, not writing it" % (tree_path))
+            return False
+
+        absolute_path = os.path.join(self.physical_path, path)
+        with GitFile(absolute_path, mode="wb") as stream:
+            stream.write(data)
+
+        self.git_repository.object_store.add_object(blob)
+        self.written_blobs[tree_path] = (blob.id, file_stat(absolute_path))
+
+        if blob.id == indexed_sha:
+            self.unstaged_changes.discard(tree_path)
+        else:
+            self.unstaged_changes.add(tree_path)
+
+        return True
+
+    def stage(self, paths):
+        """ Stage the files at paths (relative to the wiki). Files written by write_file()
+        are staged from their stored blobs, as long as nobody touched them since.
+        """
+        index = self.open_index()
+        others = []
+
+        for path in paths:
+            tree_path = to_tree_path(path)
+            sha, written_stat = self.written_blobs.pop(tree_path, (None, None))
+            absolute_path = os.path.join(self.physical_path, path)
+
+            if sha is None or written_stat != file_stat(absolute_path):
+                others.append(path)
+                continue
+
+            index[tree_path.encode('utf-8')] = index_entry_from_stat(os.lstat(absolute_path), sha, 0)
+            self.unstaged_changes.discard(tree_path)
+
+        if len(others) < len(paths):
+            self.write_index()
+
+        if others:
+            self.git_repository.stage(others)
+
+            for path in others:
+                self.unstaged_changes.discard(to_tree_path(path))
+
     def is_path_unstaged(self, article_path):
-        # XXX Dulwich returns Unix style paths (with forward slashes), even on Windows
-        # As a hotfix, we convert article_path to use forward slashes
-        tmp_path = article_path.replace("\\", "/")
-        return tmp_path in self.unstaged_changes
+        return to_tree_path(article_path) in self.unstaged_changes
 
     def has_unstaged_changes(self):
         return len(self.unstaged_changes) > 0
 
+    def structure_changed(self):
+        """ Called whenever an article is created, renamed, moved or deleted. """
+        self.structure_version += 1
+
+    def emit(self, change_type, article, old_parent=None):
+        """ Called by articles to announce changes to subscribers of self.events. """
+        if change_type in STRUCTURE_CHANGES:
+            self.structure_changed()
+
+        self.events.emit(change_type, article, old_parent)
+
     def create_article(self, name, file_type, parent):
         article = Article(self, parent, file_type, name=name)
 
         return article
 
     def close(self):
+        self.stop_watching()
+        self.stop_maintenance()
+        self.journal.close()
         self.git_repository.close()
 
-    def pull(self, progress_func, username=None, password=None):
-        """ This pulls updates from a remote repository.
+    def recover_edits(self):
+        """ Bring back the edits which weren't saved before we crashed, the articles are
+        marked as modified. Returns the recovered articles. Only the GUI should do this,
+        other users of the wiki would apply (and forget) the edits of its last session.
+        """
+        texts = self.journal.read()
+        # Start over, recovering records the edits again
+        self.journal.clear()
+
+        recovered = []
+        for path, text in texts.items():
+            article = self.find_article_by_path(path)
+
+            if article is None:
+                logger.warning("Can't recover edits of '%s', the article doesn't exist anymore" % (path))
+                continue
+
+            article.text = text
+            recovered.append(article)
+
+        if recovered:
+            logger.info("Recovered unsaved edits of %d articles" % (len(recovered)))
+
+        return recovered
+
+    def autosave(self):
+        """ Write every article with unsaved edits, without renaming any files.
+        Returns the saved articles.
+        """
+        saved = []
+
+        for path in list(self.journal.pending):
+            article = self.find_article_by_path(path)
+
+            if article is not None and article.modified:
+                article.write(rename=False)
+                saved.append(article)
+            else:
+                self.journal.checkpoint(path)
+
+        self.journal.sync()
+
+        return saved
+
+    def maintain(self, force=False):
+        """ Pack loose objects or consolidate packs if there are too many, see maintenance.maintain(). """
+        return maintain(self.git_repository.object_store, force)
+
+    def start_maintenance(self, callback=None, **kwargs):
+        """ Maintain the object store in the background whenever the wiki is idle. """
+        self.stop_maintenance()
+        self.maintenance = MaintenanceScheduler(self, callback, **kwargs)
+
+    def stop_maintenance(self):
+        if self.maintenance is not None:
+            self.maintenance.close()
+            self.maintenance = None
+
+    def fetch(self, progress_func, username=None, password=None, cancelled=None):
+        """ This fetches updates from a remote repository into the remote tracking refs.
+        Returns the fetched remote refs and their SHAs.
+        cancelled is polled while fetching, SyncCancelled is raised once it returns True.
         This code has been take from dulwich.porcelain.
         """
         if not self.remote_url:
             return
 
+        check_cancelled = self._cancellation_check(cancelled)
         selected_refs = []
 
-        def determine_wants(remote_refs):
-            selected_refs.extend(parse_reftuples(remote_refs,
-                                                 self.git_repository.refs, self.remote_fetch_refs))
+        def determine_wants(remote_refs, depth=None):
+            check_cancelled()
+            try:
+                selected_refs.extend(parse_reftuples(remote_refs,
+                                                     self.git_repository.refs, self.remote_fetch_refs))
+            except KeyError:
+                # Nobody pushed to the remote yet
+                logger.info("Nothing to fetch from '%s'" % (self.remote_url))
+                return []
+
             return [remote_refs[lh] for (lh, rh, force) in selected_refs]
 
-        logger.info("Pulling from '%s' ..." % (self.remote_url))
-        client, path = get_transport_and_path_from_url(self.remote_url)
+        def progress(message):
+            check_cancelled()
+            progress_func(message)
+
+        logger.info("Fetching from '%s' ..." % (self.remote_url))
+        client, path = get_transport_and_path(self.remote_url)
 
         if password:
             client.ssh_vendor.ssh_kwargs["password"] = password
 
         try:
-            remote_refs = client.fetch(path.encode('utf-8'), self.git_repository, progress=progress_func,
+            remote_refs = client.fetch(path, self.git_repository, progress=progress,
                                        determine_wants=determine_wants)
         except FileExistsError:
             logger.exception("Pack already exists. Possibly a bug in dulwich.")
-            return
+            return {}
 
+        # Objects which got fetched don't hurt, but don't move any refs once cancelled
+        check_cancelled()
+
+        remote_refs = getattr(remote_refs, 'refs', remote_refs)
+        fetched = {}
         for (lh, rh, force) in selected_refs:
-            self.git_repository.refs[rh] = remote_refs[lh]
+            self.git_repository.refs[rh] = fetched[lh] = remote_refs[lh]
+
+        return fetched
+
+    def pull(self, progress_func, username=None, password=None, cancelled=None):
+        """ This pulls updates from a remote repository.
+        Only fast-forwards are supported. Just the files which differ between the old and
+        the new commit are written. Returns the changed files (see diff_trees), the articles
+        aren't touched: pass them to apply_pulled_changes on the thread which owns the wiki.
+        """
+        if not self.remote_url:
+            return []
+
+        check_cancelled = self._cancellation_check(cancelled)
+        new_head = self.fetch(progress_func, username, password, cancelled).get(BRANCH_REF)
+
+        repository = self.git_repository
+        try:
+            old_head = repository.head()
+        except KeyError:
+            old_head = None
+
+        if new_head is None or new_head == old_head or \
+                (old_head is not None and is_ancestor(repository, new_head, old_head)):
+            progress_func(b"Already up to date.\n")
+            return []
+
+        if old_head is not None and not is_ancestor(repository, old_head, new_head):
+            raise SyncError("The wiki and its remote have diverged, can't fast-forward.")
+
+        old_tree = repository[old_head].tree if old_head is not None else None
+        changes = diff_trees(repository, old_tree, repository[new_head].tree)
+
+        # Don't overwrite anything which hasn't been committed yet
+        for old_path, new_path, _, _ in changes:
+            for path in filter(None, (old_path, new_path)):
+                article = self.find_article_by_path(path)
+
+                if self.is_path_unstaged(path) or (article is not None and article.modified):
+                    raise SyncError("'%s' has uncommitted changes, commit them before pulling." % (path))
+
+        # From here on the pull can't be cancelled anymore
+        check_cancelled()
+
+        logger.info("Fast-forwarding to %s, %d files changed" % (new_head.decode('ascii'), len(changes)))
+        if not repository.refs.set_if_equals(BRANCH_REF, old_head, new_head):
+            raise SyncError("The wiki changed while pulling, please try again.")
+
+        update_working_tree(repository, self.physical_path, changes)
+        progress_func(("Updated %d files.\n" % (len(changes))).encode('utf-8'))
 
-        self.git_repository.reset_index()
+        return changes
 
-    def push(self, progress_func, username=None, password=None):
+    def apply_pulled_changes(self, changes):
+        """ Update the articles of the files written by pull. Articles which got edited
+        while pulling keep their edits, their files are left to be written again.
+        """
+        applied = []
+
+        for change in changes:
+            old_path, new_path = change[:2]
+            paths = [path for path in (old_path, new_path) if path]
+            edited = [article for article in map(self.find_article_by_path, paths)
+                      if article is not None and article.modified]
+
+            for path in paths:
+                self.unstaged_changes.discard(path)
+
+            if edited:
+                logger.warning("'%s' was edited while pulling, keeping the unsaved edits" % (edited[0].wiki_url))
+            else:
+                applied.append(change)
+
+        self.apply_changes(applied)
+
+    def find_article_by_path(self, path):
+        """ Return the article stored in path (relative to the wiki, using forward slashes). """
+        return self._find_article(article_path(to_tree_path(path))[0])
+
+    def _find_article(self, slugs):
+        article = self.root
+
+        for slug in slugs:
+            article = article.get_child_by_slug(slug)
+
+            if article is None:
+                return None
+
+        return article
+
+    def apply_changes(self, changes):
+        """ Update the articles after the files in changes (see diff_trees) got
+        changed on disk, e.g. by pulling or another program. Articles of files which didn't change are left alone.
+        """
+        # Slugs of an article -> (file type, is a category)
+        removed = {}
+        added = {}
+        modified = set()
+        renamed = []
+
+        for old_path, new_path, _, _ in changes:
+            if CONFIG_FILE_NAME in (old_path, new_path):
+                self.read_config()
+                continue
+
+            # Just like when importing the index, ignore files like '.gitignore'
+            if any(os.path.basename(path).startswith('.') for path in (old_path, new_path) if path):
+                continue
+
+            old = article_path(old_path) if old_path else None
+            new = article_path(new_path) if new_path else None
+
+            if old_path == new_path:
+                modified.add(new[0])
+                continue
+
+            if old:
+                removed[old[0]] = old[1:]
+            if new:
+                added[new[0]] = new[1:]
+            if old and new and old[0] != new[0]:
+                renamed.append((old[0], new[0]))
+
+        with self.events.batch():
+            # An article turned into a category (or the other way round) or changed its file type
+            for slugs in set(removed) & set(added):
+                del removed[slugs]
+                file_type, is_directory = added.pop(slugs)
+                article = self._find_article(slugs)
+
+                if article is not None:
+                    article.relocate(article.parent, article.slug, file_type, is_directory)
+                    modified.add(slugs)
+
+            for old_slugs, new_slugs in renamed:
+                article = self._find_article(old_slugs)
+                if article is None or old_slugs not in removed or new_slugs not in added:
+                    continue
+
+                del removed[old_slugs]
+                file_type, is_directory = added.pop(new_slugs)
+
+                article.relocate(self._create_categories(new_slugs[:-1], file_type),
+                                 new_slugs[-1], file_type, is_directory)
+                modified.add(new_slugs)
+
+            # Descendants first, their categories stay if they still have other children
+            for slugs in sorted(removed, key=len, reverse=True):
+                article = self._find_article(slugs)
+
+                if article is None:
+                    continue
+                elif article.is_root() or article.has_children():
+                    modified.add(slugs)
+                else:
+                    article.detach()
+
+            # Categories before their children
+            for slugs in sorted(added, key=len):
+                file_type, is_directory = added[slugs]
+                article = self._find_article(slugs)
+
+                if article is None:
+                    Article(self, self._create_categories(slugs[:-1], file_type), file_type,
+                            is_directory=is_directory, file_name=slugs[-1])
+                else:
+                    # The category has already been created for one of its children
+                    article.relocate(article.parent, article.slug, file_type, is_directory)
+                    modified.add(slugs)
+
+            for slugs in modified:
+                article = self._find_article(slugs)
+
+                if article is not None:
+                    article.reload()
+
+    def _create_categories(self, slugs, file_type):
+        """ Return the category stored under slugs, creating missing categories
+        for files which are already on disk.
+        """
+        article = self.root
+
+        for slug in slugs:
+            child = article.get_child_by_slug(slug)
+
+            if child is None:
+                child = Article(self, article, file_type, is_directory=True, file_name=slug)
+            elif not child.is_category():
+                child.relocate(article, slug, child.file_type, True)
+
+            article = child
+
+        return article
+
+    def apply_external_changes(self, changes):
+        """ Update the articles after other programs changed files, changes are (old_path, new_path)
+        tuples as reported by WikiWatcher. Only these files are looked at, and what is on disk
+        decides what happened to them, so stale or repeated changes don't hurt.
+        Articles with unsaved edits keep them, even if their file changed.
+        """
+        index_path = to_tree_path(os.path.relpath(self.git_repository.index_path(), self.physical_path))
+        paths = set()
+        moves = {}
+
+        for old_path, new_path in changes:
+            old_path, new_path = to_tree_path(old_path), to_tree_path(new_path)
+
+            if index_path in (old_path, new_path):
+                # Files got staged or committed by someone else (or checked out)
+                paths.update(self.refresh_index())
+                continue
+
+            if old_path != new_path:
+                # A moved folder moves all of its files
+                for path in self._files_below(new_path):
+                    moves[old_path + path[len(new_path):]] = path
+
+            paths.update(self._files_below(old_path))
+            paths.update(self._files_below(new_path))
+
+        removed = set()
+        added = set()
+        modified = set()
+
+        for path in sorted(paths):
+            article = self.find_article_by_path(path)
+            known = article is not None and to_tree_path(article.text_path) == path
+
+            if not os.path.isfile(os.path.join(self.physical_path, path)):
+                if known:
+                    removed.add(path)
+            elif not known:
+                added.add(path)
+            elif article.modified:
+                logger.warning("'%s' changed on disk, keeping the unsaved edits of its article" % (path))
+            elif article.read() != article.text:
+                # Our own writes end up here as well, but don't change anything
+                modified.add(path)
+
+        renamed = [(old_path, new_path) for old_path, new_path in moves.items()
+                   if old_path in removed and new_path in added]
+        for old_path, new_path in renamed:
+            removed.discard(old_path)
+            added.discard(new_path)
+
+        with self.events.batch():
+            self.apply_changes([(old_path, new_path, None, None) for old_path, new_path in renamed] +
+                               [(path, None, None, None) for path in removed] +
+                               [(None, path, None, None) for path in added] +
+                               [(path, path, None, None) for path in modified])
+
+            # Show the new status of files which haven't been reloaded anyway
+            for path in self.refresh_unstaged(paths) - modified - added:
+                article = self.find_article_by_path(path)
+
+                if article is not None and to_tree_path(article.text_path) == path:
+                    self.emit(ChangeType.MODIFIED, article)
+
+    def _files_below(self, path):
+        """ Return the files on disk and the files of articles in path, or just path if it isn't a folder. """
+        absolute_path = os.path.join(self.physical_path, path)
+        files = []
+
+        for folder, _, names in os.walk(absolute_path):
+            files.extend(to_tree_path(os.path.relpath(os.path.join(folder, name), self.physical_path))
+                         for name in names)
+
+        article = self._find_article(tuple(path.split('/')))
+        if article is not None and article.is_category() and to_tree_path(article.physical_path) == path:
+            stack = [article]
+
+            while stack:
+                article = stack.pop()
+                files.append(to_tree_path(article.text_path))
+                stack.extend(article.children)
+
+        return files or [path]
+
+    def refresh_index(self):
+        """ Read the index again if someone else changed it. Returns the paths whose entries changed. """
+        old_index = self._index
+        index = self.open_index()
+
+        if index is old_index:
+            return set()
+
+        old = {path: old_index[path].sha for path in old_index} if old_index is not None else {}
+        new = {path: index[path].sha for path in index}
+
+        return set(path.decode('utf-8') for path in old.keys() | new.keys()
+                   if old.get(path) != new.get(path))
+
+    def refresh_unstaged(self, paths):
+        """ Check again wether the files at paths differ from the index.
+        Returns the paths whose status changed.
+        """
+        index = self.open_index()
+        changed = set()
+
+        for path in paths:
+            tree_path = to_tree_path(path)
+            absolute_path = os.path.join(self.physical_path, path)
+
+            try:
+                indexed_sha = index[tree_path.encode('utf-8')].sha
+            except KeyError:
+                # Git doesn't know the file yet
+                unstaged = False
+            else:
+                stat = file_stat(absolute_path)
+                sha, written_stat = self.written_blobs.get(tree_path, (None, None))
+
+                if stat is not None and (sha is None or written_stat != stat):
+                    try:
+                        with open(absolute_path, 'rb') as stream:
+                            sha = Blob.from_string(stream.read()).id
+                    except OSError:
+                        stat = None
+
+                unstaged = stat is None or sha != indexed_sha
+
+            if unstaged != (tree_path in self.unstaged_changes):
+                changed.add(tree_path)
+
+                if unstaged:
+                    self.unstaged_changes.add(tree_path)
+                else:
+                    self.unstaged_changes.discard(tree_path)
+
+        return changed
+
+    def start_watching(self, callback=None, **kwargs):
+        """ Follow changes made to the wiki's files by other programs, see WikiWatcher. """
+        self.stop_watching()
+        self.watcher = WikiWatcher(self, callback, **kwargs)
+
+    def stop_watching(self):
+        if self.watcher is not None:
+            self.watcher.close()
+            self.watcher = None
+
+    def push(self, progress_func, username=None, password=None, cancelled=None):
         """ This pushes updates to a remote repository.
+        Only fast-forwards are pushed, SyncError is raised if the remote has commits
+        which haven't been pulled yet.
+        cancelled is polled while pushing, SyncCancelled is raised once it returns True.
         This code has been take from dulwich.porcelain.
         """
         if not self.remote_url:
             return
 
+        check_cancelled = self._cancellation_check(cancelled)
+
         logger.info("Pushing to '%s' ..." % (self.remote_url))
 
         # Get the client and path
-        client, path = get_transport_and_path_from_url(self.remote_url)
+        client, path = get_transport_and_path(self.remote_url)
 
         if password:
             client.ssh_vendor.ssh_kwargs["password"] = password
 
         selected_refs = []
-        refspecs = b"+refs/heads/master"
+        refspecs = BRANCH_REF
 
         def update_refs(refs):
+            check_cancelled()
             selected_refs.extend(parse_reftuples(
                 self.git_repository.refs, refs, refspecs))
             new_refs = {}
@@ -285,15 +945,46 @@ class Wiki:
                     new_refs[rh] = ZERO_SHA
                 else:
                     new_refs[rh] = self.git_repository.refs[lh]
+
+                    # Not every transport refuses non-fast-forwards itself, e.g. file://
+                    if not force and refs.get(rh, ZERO_SHA) != ZERO_SHA and \
+                            not is_ancestor(self.git_repository, refs[rh], new_refs[rh]):
+                        raise SyncError("The remote has changes which haven't been pulled yet, "
+                                        "can't push.")
             return new_refs
 
+        object_store = self.git_repository.object_store
+
+        # Dulwich 0.19 replaced generate_pack_contents by generate_pack_data
+        if hasattr(object_store, 'generate_pack_data'):
+            def generate_pack(have, want, ofs_delta=False):
+                check_cancelled()
+                return object_store.generate_pack_data(have, want, ofs_delta=ofs_delta)
+        else:
+            def generate_pack(have, want):
+                check_cancelled()
+                return object_store.generate_pack_contents(have, want)
+
+        def progress(message):
+            check_cancelled()
+            progress_func(message)
+
         try:
-            client.send_pack(path.encode('utf-8'), update_refs,
-                             self.git_repository.object_store.generate_pack_contents, progress=progress_func)
+            client.send_pack(path, update_refs, generate_pack, progress=progress)
             progress_func(b"Push successful.\n")
         except (UpdateRefsError, SendPackError) as e:
             progress_func(b"Push failed -> " +
-                          e.message.encode('utf8') + b"\n")
+                          str(e).encode('utf8') + b"\n")
+            raise
+
+    @staticmethod
+    def _cancellation_check(cancelled):
+        """ Returns a function which raises SyncCancelled once cancelled() returns True. """
+        def check():
+            if cancelled is not None and cancelled():
+                raise SyncCancelled()
+
+        return check
 
     #####################################################################
     # Convenience functions, will be passed through to the root article #
@@ -310,6 +1001,40 @@ class Wiki:
     def find_article_by_name(self, name):
         return self.root.find_by_name(name)
 
+    def get_all_urls(self):
+        urls = []
+
+        def _fill_list(article, url):
+            urls.append(url)
+
+            for child in article.children:
+                _fill_list(child, url + '/' + child.name if url else child.name)
+
+        _fill_list(self.root, '')
+
+        return urls
+
+    def iter_articles(self):
+        """ Yields every article, including the root, depth first. """
+        stack = [self.root]
+
+        while stack:
+            article = stack.pop()
+            yield article
+            stack.extend(reversed(article.children))
+
+    def iter_named_articles(self):
+        """ Yields (name, article) for every article but the root, depth first. """
+        for article in self.iter_articles():
+            if not article.is_root():
+                yield article.name, article
+
+    def find_unlinked_mentions(self, target=None):
+        """ Returns {article: [(start, end, mentioned article)]} for all mentions of
+        article names (or only of target) which aren't links yet.
+        """
+        return self.mention_index.find(target)
+
     def get_name_dict(self):
         articles = {}
 
@@ -0,0 +1,20 @@
+""" Benchmarks of the backend, run on synthetic wikis (see synthetic.py).
+They are skipped by a normal test run, run them with:
+
+    python -m pytest mdwiki/benchmarks --benchmark-only
+
+MDWIKI_BENCHMARK_SIZE picks the size of the wiki (small, medium or large). To compare
+against the stored baseline and fail on regressions:
+
+    python -m pytest mdwiki/benchmarks --benchmark-only \
+        --benchmark-storage=file://mdwiki/benchmarks/baselines \
+        --benchmark-compare=0001 --benchmark-compare-fail=mean:25%
+
+The baseline was measured with the small wiki. Use --benchmark-save=baseline instead of the
+last two options to store a new one.
+
+How quickly the GUI reacts to typing, cursor moves and navigation is measured by gui.py,
+which reports latency percentiles against a frame budget:
+
+    python -m mdwiki.benchmarks.gui --size small --check
+"""
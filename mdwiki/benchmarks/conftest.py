@@ -0,0 +1,59 @@
+import os
+import shutil
+
+import pytest
+
+from ..backend.wiki import Wiki
+from .synthetic import SIZES, build_tree, generate_wiki
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def pytest_collection_modifyitems(config, items):
+    """ Benchmarks take a while, only run them when asked for. """
+    if config.getoption('benchmark_only', False):
+        return
+
+    skip = pytest.mark.skip(reason='benchmarks only run with --benchmark-only')
+    for item in items:
+        if str(item.fspath).startswith(BENCHMARK_DIR):
+            item.add_marker(skip)
+
+
+@pytest.fixture(scope='session')
+def spec():
+    size = os.environ.get('MDWIKI_BENCHMARK_SIZE', 'small')
+    if size not in SIZES:
+        raise pytest.UsageError("MDWIKI_BENCHMARK_SIZE must be one of %s" % (', '.join(sorted(SIZES))))
+
+    return SIZES[size]
+
+
+@pytest.fixture(scope='session')
+def nodes(spec):
+    """ The articles of the synthetic wiki, as generated. """
+    return build_tree(spec)[1]
+
+
+@pytest.fixture(scope='session')
+def wiki_path(spec, tmp_path_factory):
+    return generate_wiki(str(tmp_path_factory.mktemp('synthetic') / 'wiki'), spec)
+
+
+@pytest.fixture(scope='session')
+def wiki(wiki_path):
+    """ Shared by all benchmarks which don't change the wiki. """
+    wiki = Wiki.open(wiki_path)
+    yield wiki
+    wiki.close()
+
+
+@pytest.fixture
+def changed_wiki(wiki_path, tmp_path):
+    """ A copy of the synthetic wiki for benchmarks which change it. """
+    path = str(tmp_path / 'wiki')
+    shutil.copytree(wiki_path, path)
+
+    wiki = Wiki.open(path)
+    yield wiki
+    wiki.close()
@@ -0,0 +1,208 @@
+""" Measures how quickly the GUI reacts, on a synthetic wiki and without showing a window.
+MDWiki is driven by scripted keystrokes, cursor moves and navigation between articles,
+and the latency percentiles of each scripted event and of the GUI's hot paths are
+reported against a frame budget. Run it with:
+
+    python -m mdwiki.benchmarks.gui --size small
+
+Rendering happens on a background thread and isn't part of an event's latency.
+
+MDWiki needs QtWebEngine, and test_gui.py is skipped wherever it can't be loaded (e.g. on
+CI machines without its system libraries). There, neither GuiBenchmark nor --check run,
+so run this by hand on a machine with a working QtWebEngine.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+# Has to be set before Qt is loaded
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5.QtCore import Qt, QSettings  # noqa: E402
+from PyQt5.QtTest import QTest  # noqa: E402
+from PyQt5.QtWidgets import QApplication  # noqa: E402
+
+from ..mdwiki import MDWiki  # noqa: E402
+from ..mixins.wiki_tree import WikiFilterModel, WikiTreeModel  # noqa: E402
+from .latency import FRAME_BUDGET, LatencyRecorder  # noqa: E402
+from .synthetic import SIZES, build_tree, generate_wiki  # noqa: E402
+
+# Give up on loading the wiki after this many seconds
+LOAD_TIMEOUT = 120
+
+# The methods the scripted events end up in
+HOT_PATHS = [
+    (MDWiki, 'text_changed'),
+    (MDWiki, 'update_toolbar'),
+    (MDWiki, 'cursor_changed'),
+    (MDWiki, 'render_text'),
+    (MDWiki, 'render_finished'),
+    (MDWiki, 'load_article'),
+    (WikiTreeModel, 'applyChanges'),
+    (WikiTreeModel, 'findData'),
+    (WikiFilterModel, 'findData'),
+]
+
+CURSOR_KEYS = [Qt.Key_Up, Qt.Key_Down, Qt.Key_Left, Qt.Key_Right, Qt.Key_PageUp, Qt.Key_PageDown,
+               Qt.Key_Home, Qt.Key_End]
+
+
+class GuiBenchmark:
+    """ Runs the scripted events against a window showing the wiki at path. """
+
+    def __init__(self, app, path, urls, recorder, seed=0):
+        self.app = app
+        self.path = path
+        self.urls = urls
+        self.recorder = recorder
+        self.random = random.Random(seed)
+        self.window = None
+
+    def wait(self, condition, timeout):
+        started = time.perf_counter()
+
+        while not condition():
+            if time.perf_counter() - started > timeout:
+                raise RuntimeError("Timed out after %ds" % (timeout))
+
+            self.app.processEvents()
+            time.sleep(0.001)
+
+    def open(self):
+        self.window = MDWiki()
+        self.window.show()
+
+        started = time.perf_counter()
+        self.window.open_wiki(self.path)
+        self.wait(lambda: self.window.wiki_loader is None, LOAD_TIMEOUT)
+        self.recorder.record('open wiki', (time.perf_counter() - started) * 1000)
+
+        if self.window.current_wiki is None:
+            raise RuntimeError("Could not open '%s'" % (self.path))
+
+    def close(self):
+        if self.window is not None:
+            if self.window.current_wiki is not None:
+                self.window.close_wiki()
+
+            self.window.close()
+            self.window = None
+
+    def event(self, name, function, *args):
+        """ Run a scripted event and everything it queued up, e.g. zero timers. """
+        started = time.perf_counter()
+        function(*args)
+        self.app.processEvents()
+        self.recorder.record(name, (time.perf_counter() - started) * 1000)
+
+    def navigate(self):
+        self.event('navigate', self.window.link_clicked, self.random.choice(self.urls))
+
+    def type_text(self, characters):
+        editor = self.window.ui.markdownEditor
+        editor.setFocus()
+
+        for _ in range(characters):
+            roll = self.random.random()
+
+            if roll < 0.05:
+                self.event('keystroke', QTest.keyClick, editor, Qt.Key_Return)
+            elif roll < 0.2:
+                self.event('keystroke', QTest.keyClick, editor, Qt.Key_Space)
+            else:
+                self.event('keystroke', QTest.keyClick, editor, self.random.choice('abcdefghijklmnopqrstuvwxyz'))
+
+    def move_cursor(self, moves):
+        editor = self.window.ui.markdownEditor
+
+        for _ in range(moves):
+            self.event('cursor move', QTest.keyClick, editor, self.random.choice(CURSOR_KEYS))
+
+    def run(self, rounds, characters, moves):
+        """ Each round goes to an article, moves around in it and types some text. """
+        self.open()
+        self.window.ui.actionEdit.setChecked(True)
+
+        for _ in range(rounds):
+            self.navigate()
+            self.move_cursor(moves)
+            self.type_text(characters)
+
+            # Let the preview catch up, like a user pausing for a moment
+            rendered = len(self.recorder.samples.get('MDWiki.render_finished', []))
+            self.window.render_text()
+            self.wait(lambda: len(self.recorder.samples.get('MDWiki.render_finished', [])) > rendered,
+                      LOAD_TIMEOUT)
+
+
+def run_benchmark(spec, rounds=20, characters=50, moves=20, budget=FRAME_BUDGET):
+    """ Generate a wiki as described by spec and run the scripted events on it.
+    Returns the LatencyRecorder.
+    """
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    folder = tempfile.mkdtemp(prefix='mdwiki-benchmark-')
+
+    # Don't touch the user's settings (e.g. the recently opened wikis)
+    QSettings.setDefaultFormat(QSettings.IniFormat)
+    QSettings.setPath(QSettings.IniFormat, QSettings.UserScope, os.path.join(folder, 'settings'))
+
+    recorder = LatencyRecorder(budget)
+    benchmark = None
+
+    try:
+        path = generate_wiki(os.path.join(folder, 'wiki'), spec)
+        urls = [node.url for node in build_tree(spec)[1]]
+
+        for cls, method in HOT_PATHS:
+            recorder.instrument(cls, method, '%s.%s' % (cls.__name__, method))
+
+        benchmark = GuiBenchmark(app, path, urls, recorder, spec.seed)
+        benchmark.run(rounds, characters, moves)
+    finally:
+        if benchmark is not None:
+            benchmark.close()
+
+        recorder.restore()
+        shutil.rmtree(folder, ignore_errors=True)
+
+    return recorder
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure how quickly the GUI reacts to scripted events.')
+    parser.add_argument('--size', choices=sorted(SIZES), default='small', help='size of the synthetic wiki')
+    parser.add_argument('--rounds', type=int, default=20, help='number of articles to visit')
+    parser.add_argument('--characters', type=int, default=50, help='keystrokes per article')
+    parser.add_argument('--moves', type=int, default=20, help='cursor moves per article')
+    parser.add_argument('--budget', type=float, default=FRAME_BUDGET, help='frame budget in milliseconds')
+    parser.add_argument('--json', metavar='FILE', help='also write the percentiles to FILE')
+    parser.add_argument('--check', action='store_true',
+                        help='fail if the 95th percentile of a scripted event is over budget')
+    args = parser.parse_args()
+
+    recorder = run_benchmark(SIZES[args.size], args.rounds, args.characters, args.moves, args.budget)
+    print(recorder.report())
+
+    results = recorder.as_dict()
+    if args.json:
+        with open(args.json, 'w') as stream:
+            json.dump({'size': args.size, 'budget': args.budget, 'events': results}, stream, indent=2, sort_keys=True)
+
+    if args.check:
+        slow = [name for name in ('keystroke', 'cursor move', 'navigate')
+                if results.get(name, {}).get('p95', 0) > args.budget]
+
+        if slow:
+            print('Over budget: %s' % (', '.join(slow)))
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
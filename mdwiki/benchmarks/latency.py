@@ -0,0 +1,89 @@
+""" Collects how long events took and reports their percentiles. Doesn't need Qt. """
+import functools
+import math
+import time
+
+# One frame at 60 frames per second, in milliseconds
+FRAME_BUDGET = 1000 / 60
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def percentile(samples, percent):
+    """ The nearest-rank percentile of sorted samples. """
+    if not samples:
+        return None
+
+    rank = max(int(math.ceil(percent / 100 * len(samples))), 1)
+
+    return samples[rank - 1]
+
+
+class LatencyRecorder:
+    """ Records the latencies (in milliseconds) of named events. """
+
+    def __init__(self, budget=FRAME_BUDGET):
+        self.budget = budget
+        self.samples = {}
+        # (object, method, what it had before) of instrumented methods
+        self.instrumented = []
+
+    def record(self, name, milliseconds):
+        self.samples.setdefault(name, []).append(milliseconds)
+
+    def measure(self, name, function):
+        """ Wrap function so each of its calls is recorded as name. """
+        @functools.wraps(function)
+        def measured(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.record(name, (time.perf_counter() - started) * 1000)
+
+        return measured
+
+    def instrument(self, obj, method, name=None):
+        """ Replace obj.method (obj may also be a class) by a measured version. """
+        self.instrumented.append((obj, method, vars(obj).get(method)))
+        setattr(obj, method, self.measure(name or method, getattr(obj, method)))
+
+    def restore(self):
+        """ Undo all instrument calls. """
+        for obj, method, original in reversed(self.instrumented):
+            if original is None:
+                delattr(obj, method)
+            else:
+                setattr(obj, method, original)
+
+        self.instrumented = []
+
+    def summary(self, name):
+        samples = sorted(self.samples.get(name, []))
+        summary = {'count': len(samples),
+                   'max': samples[-1] if samples else None,
+                   'over_budget': sum(1 for sample in samples if sample > self.budget)}
+
+        for percent in PERCENTILES:
+            summary['p%d' % (percent)] = percentile(samples, percent)
+
+        return summary
+
+    def as_dict(self):
+        return {name: self.summary(name) for name in sorted(self.samples)}
+
+    def report(self):
+        """ A table of the percentiles of all events. """
+        columns = ['p%d' % (percent) for percent in PERCENTILES] + ['max']
+        width = max([len(name) for name in self.samples] + [5])
+        lines = ['%-*s %7s %s %11s' % (width, 'event', 'count', ' '.join('%8s' % (column) for column in columns),
+                                       'over budget')]
+
+        for name, summary in self.as_dict().items():
+            lines.append('%-*s %7d %s %11d' % (width, name, summary['count'],
+                                               ' '.join('%8.3f' % (summary[column]) for column in columns),
+                                               summary['over_budget']))
+
+        lines.append('(milliseconds, budget %.1f ms)' % (self.budget))
+
+        return '\n'.join(lines)
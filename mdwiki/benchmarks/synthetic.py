@@ -0,0 +1,202 @@
+""" Builds wikis of any size to measure (or test) the backend with.
+The same WikiSpec always results in the same articles, texts, links and history.
+"""
+import argparse
+import os
+import random
+
+from dulwich.repo import Repo
+from slugify import slugify
+
+from ..backend.constants import INDEX_FILE_NAME
+from ..backend.wiki import Wiki
+
+AUTHOR = b"Synthetic Author <synthetic@mdwiki>"
+# Commits of the history are one minute apart, starting here
+HISTORY_START = 1500000000
+
+WORDS = ("wiki article category link page text note idea draft topic section list table code "
+         "example project meeting summary design review plan release issue feature task").split()
+
+
+class WikiSpec:
+    """ What a synthetic wiki looks like.
+    articles: number of articles, including categories
+    depth: how deep articles are nested at most
+    fan_out: number of children of a category (until there are too many articles for that)
+    words: number of words of an article's text
+    link_density: wiki links per 100 words
+    commits: number of commits after the initial one, each changing files_per_commit articles
+    """
+
+    def __init__(self, articles=100, depth=3, fan_out=8, words=200, link_density=2.0,
+                 commits=10, files_per_commit=5, seed=0):
+        self.articles = articles
+        self.depth = depth
+        self.fan_out = fan_out
+        self.words = words
+        self.link_density = link_density
+        self.commits = commits
+        self.files_per_commit = files_per_commit
+        self.seed = seed
+
+    def __repr__(self):
+        return "WikiSpec(%s)" % (", ".join("%s=%r" % item for item in sorted(vars(self).items())))
+
+
+SIZES = {
+    'small': WikiSpec(articles=100, depth=3, fan_out=8, commits=10),
+    'medium': WikiSpec(articles=1000, depth=4, fan_out=10, commits=50),
+    'large': WikiSpec(articles=10000, depth=5, fan_out=12, commits=200, files_per_commit=20),
+}
+
+
+class Node:
+    def __init__(self, title, parent):
+        self.title = title
+        self.parent = parent
+        self.children = []
+        self.level = 0 if parent is None else parent.level + 1
+
+        if parent is not None:
+            parent.children.append(self)
+
+    @property
+    def url(self):
+        if self.parent is None:
+            return ''
+        elif self.parent.parent is None:
+            return self.title
+
+        return self.parent.url + '/' + self.title
+
+    @property
+    def path(self):
+        """ The folder (categories) or file of the article, without file type. """
+        if self.parent is None:
+            return ''
+
+        return os.path.join(self.parent.path, slugify(self.title))
+
+    def text_path(self, file_type):
+        if self.children:
+            return os.path.join(self.path, INDEX_FILE_NAME + file_type)
+
+        return self.path + file_type
+
+
+def build_tree(spec):
+    """ Return the root and all other nodes, breadth first. """
+    root = Node('', None)
+    nodes = []
+    # Nodes which may get children, breadth first
+    parents = [root]
+    cursor = 0
+
+    for number in range(spec.articles):
+        while cursor < len(parents) and len(parents[cursor].children) >= spec.fan_out:
+            cursor += 1
+
+        if cursor < len(parents):
+            parent = parents[cursor]
+        else:
+            # The tree is full, spread the rest over the deepest categories
+            parent = parents[number % len(parents)]
+
+        node = Node('%s %d' % (WORDS[number % len(WORDS)].capitalize(), number), parent)
+        nodes.append(node)
+
+        if node.level < spec.depth:
+            parents.append(node)
+
+    return root, nodes
+
+
+def generate_text(rng, node, nodes, spec):
+    words = []
+    links = spec.words * spec.link_density / 100
+
+    for index in range(spec.words):
+        if rng.random() < links / max(spec.words, 1):
+            words.append('[[%s]]' % (rng.choice(nodes).url))
+        else:
+            words.append(rng.choice(WORDS))
+
+        if index % 60 == 59:
+            words.append('\n\n## %s\n\n' % (rng.choice(WORDS).capitalize()))
+
+    return '# %s\n\n%s\n' % (node.title, ' '.join(words))
+
+
+def commit(repository, paths, message, number):
+    repository.stage(paths)
+    repository.do_commit(message.encode('utf-8'), committer=AUTHOR, author=AUTHOR,
+                         commit_timestamp=HISTORY_START + number * 60, commit_timezone=0,
+                         author_timestamp=HISTORY_START + number * 60, author_timezone=0)
+
+
+def generate_wiki(path, spec, name='Synthetic'):
+    """ Create a wiki in path (which must be empty) as described by spec. Returns the path. """
+    rng = random.Random(spec.seed)
+    file_type = '.md'
+
+    os.makedirs(path, exist_ok=True)
+
+    Wiki.create(name, path, '', file_type, 'Synthetic Author', 'synthetic@mdwiki',
+                '# %s\n\nThe index of a synthetic wiki.\n' % (name)).close()
+
+    root, nodes = build_tree(spec)
+    paths = []
+
+    for node in nodes:
+        text_path = node.text_path(file_type)
+        os.makedirs(os.path.join(path, os.path.dirname(text_path)), exist_ok=True)
+
+        with open(os.path.join(path, text_path), 'w', encoding='utf-8') as stream:
+            stream.write(generate_text(rng, node, nodes, spec))
+
+        paths.append(text_path)
+
+    repository = Repo(path)
+    try:
+        commit(repository, paths, "Add %d synthetic articles." % (len(paths)), 0)
+
+        for number in range(1, spec.commits + 1):
+            changed = rng.sample(nodes, min(spec.files_per_commit, len(nodes)))
+
+            for node in changed:
+                with open(os.path.join(path, node.text_path(file_type)), 'a', encoding='utf-8') as stream:
+                    stream.write('\nEdit %d: %s\n' % (number, ' '.join(rng.choice(WORDS) for _ in range(20))))
+
+            commit(repository, [node.text_path(file_type) for node in changed],
+                   "Synthetic edit %d." % (number), number)
+    finally:
+        repository.close()
+
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Create a synthetic wiki.')
+    parser.add_argument('path', help='empty folder to create the wiki in')
+    parser.add_argument('--size', choices=sorted(SIZES), default='small',
+                        help='start from one of the predefined sizes')
+
+    defaults = SIZES['small']
+    for name in ('articles', 'depth', 'fan_out', 'words', 'commits', 'files_per_commit', 'seed'):
+        parser.add_argument('--' + name.replace('_', '-'), type=int, help='default: %s' % (getattr(defaults, name)))
+    parser.add_argument('--link-density', type=float, help='default: %s' % (defaults.link_density))
+
+    args = parser.parse_args()
+    spec = WikiSpec(**vars(SIZES[args.size]))
+
+    for name, value in vars(args).items():
+        if name not in ('path', 'size') and value is not None:
+            setattr(spec, name, value)
+
+    generate_wiki(args.path, spec)
+    print("Created %r in '%s'" % (spec, args.path))
+
+
+if __name__ == '__main__':
+    main()
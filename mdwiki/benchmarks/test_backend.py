@@ -0,0 +1,109 @@
+import os
+import shutil
+
+import pytest
+
+from ..backend.constants import FALLBACK_RENDERER
+from ..backend.markuprenderer import MarkdownRenderer, create_renderers
+from ..backend.wiki import Wiki
+
+pytest.importorskip('pytest_benchmark')
+
+
+def largest_category(wiki):
+    return max((article for _, article in wiki.iter_named_articles() if article.children),
+               key=lambda article: len(article.get_all_physical_paths()))
+
+
+def test_open(benchmark, wiki_path):
+    benchmark(lambda: Wiki.open(wiki_path).close())
+
+
+def test_resolve(benchmark, wiki, nodes):
+    urls = [node.url for node in nodes]
+
+    def resolve():
+        for url in urls:
+            wiki.root.resolve(url)
+
+    benchmark(resolve)
+
+
+def test_find_article_by_name(benchmark, wiki, nodes):
+    # Spread over the tree, the last ones are found last
+    names = [node.title for node in nodes[::max(len(nodes) // 50, 1)]]
+
+    def find():
+        for name in names:
+            wiki.find_article_by_name(name)
+
+    benchmark(find)
+
+
+def test_refresh_links(benchmark, wiki):
+    articles = [article for _, article in wiki.iter_named_articles()]
+
+    def refresh():
+        for article in articles:
+            article.refresh_links()
+
+    benchmark(refresh)
+
+
+def test_render(benchmark, wiki):
+    renderer = MarkdownRenderer()
+    text = max((article.text for _, article in wiki.iter_named_articles()), key=len)
+    # Don't measure loading markdown and its extensions
+    renderer.render(wiki.url_snapshot, text)
+
+    benchmark(renderer.render, wiki.url_snapshot, text)
+
+
+def test_write_and_commit(benchmark, changed_wiki):
+    articles = [article for _, article in changed_wiki.iter_named_articles() if not article.children]
+    rounds = iter(range(1000000))
+
+    def change():
+        number = next(rounds)
+        article = articles[number % len(articles)]
+        article.text += '\nBenchmark edit %d\n' % (number)
+
+        return (article,), {}
+
+    def write_and_commit(article):
+        article.write()
+        article.commit()
+
+    benchmark.pedantic(write_and_commit, setup=change, rounds=20)
+
+
+def test_move_category(benchmark, changed_wiki):
+    category = largest_category(changed_wiki)
+    # Top level articles can't be below the category
+    parents = [changed_wiki.root, next(article for article in changed_wiki.root.children if article is not category)]
+
+    def move():
+        # Move back and forth between two parents, so each round moves the same files
+        category.move(parent=parents[1] if category.parent is parents[0] else parents[0])
+
+    benchmark.pedantic(move, rounds=10)
+
+
+def test_load_history(benchmark, wiki):
+    category = largest_category(wiki)
+
+    benchmark(category.load_history)
+    assert category.history
+
+
+def test_export(benchmark, wiki, tmp_path):
+    available = create_renderers()
+    renderers = {file_type: available.get(file_type, available[FALLBACK_RENDERER])
+                 for file_type in {article.file_type for article in wiki.iter_articles()}}
+    output = str(tmp_path / 'export')
+
+    def setup():
+        shutil.rmtree(output, ignore_errors=True)
+        os.makedirs(output)
+
+    benchmark.pedantic(wiki.root.export, args=(output, renderers), setup=setup, rounds=5)
@@ -0,0 +1,14 @@
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+# MDWiki can't be created without QtWebEngine
+pytest.importorskip('PyQt5.QtWebEngineWidgets', exc_type=ImportError)
+
+from .gui import run_benchmark  # noqa: E402
+
+
+def test_gui_latency(benchmark, spec):
+    recorder = benchmark.pedantic(run_benchmark, args=(spec,), rounds=1)
+
+    # Keep the percentiles of every event with the results
+    benchmark.extra_info['latency'] = recorder.as_dict()
@@ -0,0 +1,349 @@
+""" Command line interface for working with wikis without the GUI, e.g. on servers.
+Nothing in here may import Qt. Modules are imported by the commands which need
+them, so e.g. searching doesn't wait for the renderers to load.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+# Measure how long starting up takes
+STARTED = time.perf_counter()
+
+logger = logging.getLogger(__name__)
+
+
+class CommandError(Exception):
+    """ Reported to the user without a traceback. """
+    pass
+
+
+class Timings:
+    """ Collects how long each phase of a command took. """
+
+    def __init__(self, started):
+        self.started = started
+        self.last = started
+        self.phases = {}
+
+    def phase(self, name):
+        now = time.perf_counter()
+        self.phases[name] = self.phases.get(name, 0) + now - self.last
+        self.last = now
+
+    def as_dict(self, command):
+        return {
+            'command': command,
+            'phases': {name: round(seconds, 6) for name, seconds in self.phases.items()},
+            'total': round(self.last - self.started, 6),
+        }
+
+
+def open_wiki(path, timings):
+    from .backend.wiki import Wiki
+    timings.phase('import')
+
+    wiki = Wiki.open(path)
+    if wiki is None:
+        raise CommandError("'%s' doesn't contain a wiki" % (path))
+
+    timings.phase('open')
+
+    return wiki
+
+
+def get_article(wiki, url):
+    article = wiki.get_article_by_url(url) if url else wiki.root
+    if article is None:
+        raise CommandError("There is no article '%s'" % (url))
+
+    return article
+
+
+def get_renderer(file_type):
+    from .backend.constants import FALLBACK_RENDERER
+    from .backend.markuprenderer import create_renderers
+
+    renderers = create_renderers()
+
+    return renderers.get(file_type, renderers[FALLBACK_RENDERER])
+
+
+def write_progress(message):
+    sys.stderr.write(message.decode('utf-8', 'replace'))
+    sys.stderr.flush()
+
+
+def command_open(wiki, args):
+    """ Show what's in the wiki. """
+    articles = sum(1 for _ in wiki.iter_named_articles())
+
+    return {
+        'name': wiki.name,
+        'path': wiki.physical_path,
+        'remote_url': wiki.remote_url,
+        'articles': articles,
+        'unstaged_changes': sorted(wiki.unstaged_changes),
+    }
+
+
+def command_export(wiki, args):
+    """ Render every article to a static HTML site. """
+    from collections import defaultdict
+    from .backend.constants import FALLBACK_RENDERER
+    from .backend.markuprenderer import create_renderers
+
+    available = create_renderers()
+    # Articles without a renderer of their own are shown as plain text
+    renderers = defaultdict(lambda: available[FALLBACK_RENDERER], available)
+
+    os.makedirs(args.output, exist_ok=True)
+    wiki.root.export(args.output, renderers)
+
+    return {'output': args.output}
+
+
+def command_render(wiki, args):
+    """ Render an article to standard output. """
+    article = get_article(wiki, args.url)
+    renderer = get_renderer(article.file_type)
+
+    if args.body:
+        html = renderer.render_body(wiki.url_snapshot, article.text)
+    else:
+        html = renderer.render(wiki.url_snapshot, article.text)
+
+    sys.stdout.write(html)
+
+    return None
+
+
+def command_search(wiki, args):
+    """ Find articles by title and URL, or by their text. """
+    if args.text:
+        from .backend.linkmatcher import fold_case
+
+        query = fold_case(args.query)
+        articles = [article for article in wiki.iter_articles()
+                    if not article.is_root() and query in fold_case(article.text)]
+    else:
+        articles = wiki.title_index.search(args.query)
+
+    return [article.wiki_url for article in articles]
+
+
+def command_stats(wiki, args):
+    """ Count the words, links, ... of an article, or of all of them. """
+    from .backend.statistics import DocumentStatistics
+
+    article = get_article(wiki, args.url)
+    articles = [article] if args.url else [article for _, article in wiki.iter_named_articles()]
+
+    totals = {'articles': len(articles), 'words': 0, 'characters': 0,
+              'headings': 0, 'links': 0, 'reading_time': 0}
+
+    for article in articles:
+        statistics = DocumentStatistics(article.text)
+
+        for name in ('words', 'characters', 'headings', 'links', 'reading_time'):
+            totals[name] += getattr(statistics, name)
+
+    return totals
+
+
+def command_import(wiki, args):
+    """ Add text files to the wiki as new articles. """
+    parent = get_article(wiki, args.parent)
+    imported = []
+
+    for path in args.files:
+        with open(path, encoding='utf-8') as stream:
+            text = stream.read()
+
+        name, file_type = os.path.splitext(os.path.basename(path))
+        file_type = file_type or wiki.default_file_type
+
+        # Name the article after its heading, just like the GUI does
+        first_line = text.lstrip().split('\n', 1)[0]
+        if first_line.startswith('#'):
+            name = first_line.lstrip('#').strip() or name
+
+        if parent.get_child_by_name(name) is not None:
+            raise CommandError("'%s' already exists" % (name))
+
+        article = wiki.create_article(name, file_type, parent)
+        article.text = text
+        article.write()
+        article.commit("Import '%s'." % (article.wiki_url))
+        imported.append(article.wiki_url)
+
+    return imported
+
+
+def command_sync(wiki, args):
+    """ Pull changes from the remote, then push ours. """
+    if not wiki.remote_url:
+        raise CommandError("The wiki doesn't have a remote")
+
+    if not args.push_only:
+        wiki.apply_pulled_changes(wiki.pull(write_progress, args.username, args.password))
+    if not args.pull_only:
+        wiki.push(write_progress, args.username, args.password)
+
+    return {'head': wiki.git_repository.head().decode('ascii')}
+
+
+def command_history(wiki, args):
+    """ List the commits which changed an article. """
+    article = get_article(wiki, args.url)
+    article.load_history()
+
+    return [{'sha': entry.sha,
+             'author': entry.author,
+             'time': time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(entry.commit_time)),
+             'summary': entry.commit.message.decode('utf-8', 'replace').strip().split('\n', 1)[0]}
+            for entry in article.history]
+
+
+def command_commit(wiki, args):
+    """ Commit every change which hasn't been committed yet. """
+    paths = sorted(wiki.unstaged_changes)
+    if not paths:
+        return []
+
+    for path in paths:
+        wiki.root.add_changed_file(path)
+
+    wiki.root.commit(args.message or "Update %d files." % (len(paths)))
+
+    return paths
+
+
+def command_serve(wiki, args):
+    """ Serve the wiki as HTML over HTTP, read-only. """
+    import asyncio
+    from .backend.server import WikiServer
+
+    # Show where we are listening
+    logging.getLogger('mdwiki.backend.server').setLevel(logging.INFO)
+
+    try:
+        asyncio.run(WikiServer(wiki).run(args.host, args.port, watch=not args.no_watch))
+    except KeyboardInterrupt:
+        pass
+
+    return None
+
+
+def print_result(result, as_json):
+    if result is None:
+        return
+
+    if as_json:
+        json.dump(result, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write('\n')
+    elif isinstance(result, dict):
+        for key, value in sorted(result.items()):
+            print('%s: %s' % (key, value))
+    else:
+        for entry in result:
+            if isinstance(entry, dict):
+                print('\t'.join(str(value) for value in entry.values()))
+            else:
+                print(entry)
+
+
+def create_parser():
+    parser = argparse.ArgumentParser(prog='mdwiki',
+                                     description='Work with a wiki from the command line. '
+                                                 'Start without arguments to open the GUI.')
+    parser.add_argument('--json', action='store_true',
+                        help='print results as JSON')
+    parser.add_argument('--timings', action='store_true',
+                        help='print how long each phase took as JSON to standard error')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help='log what is going on')
+
+    commands = parser.add_subparsers(dest='command', metavar='command')
+    commands.required = True
+
+    def add_command(name, function, help):
+        command = commands.add_parser(name, help=help, description=function.__doc__.strip())
+        command.add_argument('wiki', help='path of the wiki')
+        command.set_defaults(function=function)
+
+        return command
+
+    add_command('open', command_open, 'show what is in a wiki')
+
+    command = add_command('export', command_export, 'export a wiki as HTML')
+    command.add_argument('output', help='folder to write the HTML files to')
+
+    command = add_command('render', command_render, 'render an article to standard output')
+    command.add_argument('url', nargs='?', default='', help='URL of the article, the index if left out')
+    command.add_argument('--body', action='store_true', help='only render the HTML body')
+
+    command = add_command('search', command_search, 'find articles')
+    command.add_argument('query')
+    command.add_argument('--text', action='store_true', help='search the text of articles')
+
+    command = add_command('stats', command_stats, 'count words, links, ...')
+    command.add_argument('url', nargs='?', default='', help='URL of the article, all of them if left out')
+
+    command = add_command('import', command_import, 'import text files as articles')
+    command.add_argument('files', nargs='+', metavar='file')
+    command.add_argument('--parent', default='', help='URL of the category to import into')
+
+    command = add_command('sync', command_sync, 'pull from and push to the remote')
+    command.add_argument('--username')
+    command.add_argument('--password')
+    only = command.add_mutually_exclusive_group()
+    only.add_argument('--pull-only', action='store_true')
+    only.add_argument('--push-only', action='store_true')
+
+    command = add_command('history', command_history, 'list the commits of an article')
+    command.add_argument('url', nargs='?', default='', help='URL of the article, the index if left out')
+
+    command = add_command('commit', command_commit, 'commit all changes')
+    command.add_argument('-m', '--message')
+
+    command = add_command('serve', command_serve, 'serve a wiki over HTTP')
+    command.add_argument('--host', default='127.0.0.1', help='address to listen on')
+    command.add_argument('--port', type=int, default=8000)
+    command.add_argument('--no-watch', action='store_true',
+                         help="don't pick up changes to the wiki's files")
+
+    return parser
+
+
+def main(argv=None):
+    args = create_parser().parse_args(argv)
+
+    logging.basicConfig(format='%(name)s: (%(levelname)s) %(message)s',
+                        level=logging.DEBUG if args.verbose else logging.WARNING)
+
+    timings = Timings(STARTED)
+    timings.phase('startup')
+
+    wiki = None
+    try:
+        wiki = open_wiki(args.wiki, timings)
+        result = args.function(wiki, args)
+        timings.phase('run')
+
+        print_result(result, args.json)
+    except CommandError as error:
+        sys.stderr.write('mdwiki: %s\n' % (error))
+        return 1
+    finally:
+        if wiki is not None:
+            wiki.close()
+
+        timings.phase('close')
+
+        if args.timings:
+            sys.stderr.write(json.dumps(timings.as_dict(args.command)) + '\n')
+
+    return 0
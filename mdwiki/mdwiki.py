@@ -1,34 +1,62 @@
 import os
 import sys
 import logging
+import time
 
-from PyQt5.QtCore import QCoreApplication, QIODevice, QTextStream, QFile
+from PyQt5.QtCore import QCoreApplication, QIODevice, QObject, QTextStream, QTimer, QFile, pyqtSignal
 from PyQt5.QtWidgets import (QMainWindow,
                              qApp,
                              QFileDialog,
                              QMessageBox,
                              QApplication,
-                             QStyleFactory)
+                             QStyleFactory,
+                             QWIDGETSIZE_MAX)
 from PyQt5.QtGui import QFontDatabase, QIcon
 
 from .gui.mdwiki_ui import Ui_MainWindow
 
 from .mixins.recent_files import RecentFilesMixin
 from .mixins.markdown_editor import MarkdownEditorMixin
-from .mixins.wiki_tree import WikiTreeMixin, WikiTreeModel
+from .mixins.wiki_tree import WikiTreeMixin
 from .mixins.fullscreen_editor import FullscreenEditorMixin
+from .mixins.sync import SyncMixin
 
-from .backend.wiki import Wiki
+from .backend.loader import WikiLoader
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTimer:
+    """ Logs how long each phase of starting up took. """
+
+    def __init__(self, started):
+        self.started = started
+        self.last = started
+
+    def phase(self, name):
+        now = time.perf_counter()
+        logger.info("Startup: %s took %.3fs (%.3fs since starting)" % (name, now - self.last, now - self.started))
+        self.last = now
+
+
+class LoaderNotifier(QObject):
+    # Emitted from the loader thread, Qt queues them into the GUI thread for us
+    opened = pyqtSignal(object, object)
+    imported = pyqtSignal(object, object, object)
+    finished = pyqtSignal(object, object)
 
 
 class MDWiki(QMainWindow,
              RecentFilesMixin,
              MarkdownEditorMixin,
              WikiTreeMixin,
-             FullscreenEditorMixin):
+             FullscreenEditorMixin,
+             SyncMixin):
     ORG_NAME = 'skyr'
     ORG_DOMAIN = 'skyr.at'
     APP_NAME = 'MDWiki'
+    # Show how long opening a wiki took for 5 seconds
+    OPENED_MESSAGE_TIMEOUT = 5000
 
     def __init__(self, *args, **kwargs):
         QCoreApplication.setOrganizationName(MDWiki.ORG_NAME)
@@ -47,12 +75,19 @@ class MDWiki(QMainWindow,
         self.setup_markdown_editor()
         self.setup_wiki_tree()
         self.setup_fullscreen_editor()
+        self.setup_sync()
 
         self.setup_connections()
 
         self.current_wiki = None
         self.current_article_vm = None
 
+        self.wiki_loader = None
+        self.loader_notifier = LoaderNotifier(self)
+        self.loader_notifier.opened.connect(self.wiki_opened)
+        self.loader_notifier.imported.connect(self.wiki_imported)
+        self.loader_notifier.finished.connect(self.wiki_loaded)
+
     def setup_connections(self):
         # Application Menu
         self.ui.actionNewWiki.triggered.connect(self.reload_style)
@@ -60,8 +95,8 @@ class MDWiki(QMainWindow,
         self.ui.actionOpen.triggered.connect(self.show_open_wiki_dialog)
 
     def setup_ui_hacks(self):
-        # Force equal division of QSplitter panes
-        self.ui.editorSplitter.setSizes([sys.maxsize, sys.maxsize])
+        # Force equal division of QSplitter panes (sizes are 32 bit, sys.maxsize overflows)
+        self.ui.editorSplitter.setSizes([QWIDGETSIZE_MAX, QWIDGETSIZE_MAX])
 
         self.setWindowIcon(QIcon(':/icons/app.png'))
         self.reload_style()
@@ -78,6 +113,12 @@ class MDWiki(QMainWindow,
         QFontDatabase.addApplicationFont(':/font/SourceCodePro-Bold.otf')
 
     def close_wiki(self):
+        self.cancel_wiki_loader()
+        self.render_worker.cancel()
+        self.autosave_timer.stop()
+        self.current_wiki.autosave()
+        self.stop_sync_service()
+        self.close_wiki_tree()
         self.current_wiki.close()
         self.current_wiki = None
 
@@ -106,14 +147,35 @@ class MDWiki(QMainWindow,
         return self.current_wiki
 
     def open_wiki(self, path):
+        """ Open the wiki at path on a background thread, its tree fills in while
+        its articles are imported.
+        """
         # If this wiki is already open, reopen it
         if self.current_wiki:
             self.close_wiki()
 
-        wiki = Wiki.open(path)
-        self.current_wiki = WikiTreeModel(['name', 'saved', 'unstaged'], wiki)
+        self.cancel_wiki_loader()
+        self.statusBar().showMessage("Opening '%s' ..." % (path))
+
+        self.wiki_loader = WikiLoader(path,
+                                      self.loader_notifier.opened.emit,
+                                      self.loader_notifier.imported.emit,
+                                      self.loader_notifier.finished.emit)
+
+    def cancel_wiki_loader(self):
+        if self.wiki_loader is not None:
+            self.wiki_loader.cancel()
+            self.wiki_loader = None
+
+    def wiki_opened(self, loader, wiki):
+        # Another wiki got opened in the meantime
+        if loader is not self.wiki_loader:
+            wiki.close()
+            return
+
+        self.current_wiki = wiki
 
-        self.ui.wikiTree.setModel(self.current_wiki)
+        self.show_wiki_tree(wiki)
 
         # Set column width of wiki tree
         self.ui.wikiTree.header().resizeSection(0, 250)
@@ -126,20 +188,67 @@ class MDWiki(QMainWindow,
 
         self.ui.wikiName.setText(name)
 
-        self.add_recent_wiki(path)
+    def wiki_imported(self, loader, files, texts):
+        if loader is self.wiki_loader:
+            self.current_wiki.import_files(files, texts)
 
+    def wiki_loaded(self, loader, error):
+        if loader is not self.wiki_loader:
+            return
+
+        self.wiki_loader = None
+
+        if error is not None:
+            self.statusBar().clearMessage()
+            QMessageBox.warning(self, 'Could not open wiki',
+                                'Could not open \'%s\': %s' % (loader.path, error))
+
+            if self.current_wiki:
+                self.close_wiki()
+            return
+
+        wiki = self.current_wiki
+        wiki.recover_edits()
+        self.start_sync_service(wiki)
+
+        # Write edits recovered from the journal
+        if wiki.journal.pending:
+            self.autosave_timer.start(self.AUTOSAVE_DELAY)
 
-def main():
+        self.add_recent_wiki(loader.path)
+
+        seconds = time.perf_counter() - loader.started
+        logger.info("Opened '%s' in %.3fs" % (loader.path, seconds))
+        self.statusBar().showMessage("Opened '%s' in %.2fs." % (wiki.name or loader.path, seconds),
+                                     self.OPENED_MESSAGE_TIMEOUT)
+
+
+def main(started=None):
+    """ Start the GUI. started is when the program started (see time.perf_counter), if it
+    is left out only the time since calling this is measured.
+    """
     logging.basicConfig(
         format='[%(asctime)s] - %(name)s: (%(levelname)s) %(message)s', level=logging.DEBUG)
     logging.info("Starting up QMDWiki!")
     logging.info(QStyleFactory.keys())
     logging.getLogger("MARKDOWN").setLevel(logging.WARNING)
 
+    timer = StartupTimer(time.perf_counter() if started is None else started)
+    timer.phase('importing modules')
+
     # Use Fusion style
     app = QApplication(sys.argv)
     app.setStyle(QStyleFactory.create('Fusion'))
+    timer.phase('creating the application')
 
     wiki = MDWiki()
+    timer.phase('creating the main window')
+
     wiki.show()
+    timer.phase('showing the main window')
+
+    # Reading the last wiki happens in the background, once the window is up
+    QTimer.singleShot(0, lambda: timer.phase('starting the event loop'))
+    QTimer.singleShot(0, wiki.open_last_wiki)
+
     sys.exit(app.exec_())
@@ -1,6 +1,4 @@
-import sys
-
-from PyQt5.QtWidgets import QMainWindow
+from PyQt5.QtWidgets import QMainWindow, QWIDGETSIZE_MAX
 
 from .markdown_editor import CustomWebPage
 from ..gui.fullscreen_ui import Ui_FullscreenWindow
@@ -8,6 +6,11 @@ from ..gui.fullscreen_ui import Ui_FullscreenWindow
 
 class FullscreenEditorMixin:
     def setup_fullscreen_editor(self):
+        # The window (and its web page) is only built once it is needed
+        self.fullscreenUi = None
+        self.fullscreenWindow = None
+
+    def create_fullscreen_editor(self):
         # Set up fullscreen window
         self.fullscreenUi = Ui_FullscreenWindow()
         self.fullscreenWindow = QMainWindow()
@@ -17,7 +20,7 @@ class FullscreenEditorMixin:
         self.hide_fullscreen_editor()
 
         # Splitter should give both widgets 50%
-        self.fullscreenUi.splitter.setSizes([sys.maxsize, sys.maxsize])
+        self.fullscreenUi.splitter.setSizes([QWIDGETSIZE_MAX, QWIDGETSIZE_MAX])
 
         # Set up markdown editor
         self.setup_scintilla(self.fullscreenUi.markdownEditor)
@@ -35,15 +38,23 @@ class FullscreenEditorMixin:
             self.hide_fullscreen_editor)
 
     def show_fullscreen_editor(self):
+        if self.fullscreenWindow is None:
+            self.create_fullscreen_editor()
+
         self.fullscreenUi.markdownEditor.setText(self.ui.markdownEditor.text())
         self.fullscreenUi.markdownEditor.textChanged.connect(
             self.update_editor_text)
         self.fullscreenUi.markdownEditor.cursorPositionChanged.connect(
             self.set_editor_cursor)
+        # Both previews share the web channel, so they are updated together
+        self.load_preview(self.fullscreenUi.markdownPreview)
         self.fullscreenWindow.showNormal()
         self.fullscreenWindow.showFullScreen()
 
     def hide_fullscreen_editor(self):
+        if self.fullscreenWindow is None:
+            return
+
         # In case textChanged is not connected, we simply do nothing
         try:
             self.fullscreenUi.markdownEditor.textChanged.disconnect(
@@ -59,11 +70,5 @@ class FullscreenEditorMixin:
         self.ui.markdownEditor.setText(self.fullscreenUi.markdownEditor.text())
 
     def set_editor_cursor(self, line, index):
-        # Get the byte index of the cursor
-        cursor_index = self.fullscreenUi.markdownEditor.positionFromLineIndex(
-            line, index)
-
-        self.render_text(self.fullscreenUi.markdownEditor,
-                         self.fullscreenUi.markdownPreview, cursor_index)
-
+        # The preview follows the main editor's cursor
         self.ui.markdownEditor.setCursorPosition(line, index)
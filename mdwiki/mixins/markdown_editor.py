@@ -1,18 +1,17 @@
 import logging
-import re
+from functools import partial
 
-from PyQt5.QtCore import (QFile,
-                          QIODevice,
-                          QTextStream,
-                          pyqtSignal,
+from PyQt5.QtCore import (pyqtSignal,
                           pyqtSlot,
+                          pyqtProperty,
                           QObject,
                           QEvent,
+                          QTimer,
                           Qt)
 
 from PyQt5.QtGui import QFontDatabase, QDesktopServices
 from PyQt5.QtWidgets import QMessageBox, QWidget
-from PyQt5.Qsci import QsciLexerMarkdown, QsciLexerHTML, QsciScintilla, QsciAPIs
+from PyQt5.Qsci import QsciLexerMarkdown, QsciLexerHTML, QsciScintilla
 from PyQt5.QtWebEngineWidgets import QWebEnginePage, QWebEngineSettings
 from PyQt5.QtWebChannel import QWebChannel
 from PyQt5.QtCore import QUrl
@@ -20,50 +19,99 @@ from PyQt5.QtCore import QUrl
 from ..backend.markuprenderer import (MarkdownRenderer,
                                       PlainRenderer,
                                       ReSTRenderer)
+from ..backend.renderworker import RenderWorker
+from ..backend.statistics import DocumentStatistics
 
 logger = logging.getLogger(__name__)
 
 
 class CustomWebPage(QWebEnginePage):
-    def acceptNavigationRequest(self, url, navType, isMainFrame):
-        if url.scheme() == 'qrc':
-            return True
-
-        QDesktopServices.openUrl(url)
+    PREVIEW_HTML = (
+        '<!doctype HTML><html><head><meta charset="utf-8">'
+        '<link rel="stylesheet" type="text/css" href="qrc:///styles/github.css">'
+        '<script src="qrc:///qtwebchannel/qwebchannel.js"></script>'
+        '</head><body><div id="__CONTENT__"></div><script>%s</script></body></html>'
+    )
+
+    PREVIEW_JS = """
+    (function(){
+        let cursorLine = -1;
 
-        return False
+        function scrollToLine(line) {
+            cursorLine = line;
+            if (line < 0) {
+                return;
+            }
 
+            // Find the last block starting at or before the given source line
+            const elements = document.querySelectorAll('[data-line]');
+            let low = 0;
+            let high = elements.length - 1;
+            let element = null;
+            while (low <= high) {
+                const middle = (low + high) >> 1;
+                if (parseInt(elements[middle].getAttribute('data-line')) <= line) {
+                    element = elements[middle];
+                    low = middle + 1;
+                } else {
+                    high = middle - 1;
+                }
+            }
 
-class WebChannelProxy(QObject):
-    link_clicked = pyqtSignal(str, name='linkClicked')
+            if (element !== null) {
+              const elementRect = element.getBoundingClientRect();
+              const absoluteElementTop = elementRect.top + window.pageYOffset;
+              const middle = absoluteElementTop - (window.innerHeight / 2);
+              setTimeout(function () {window.scrollTo(0, middle);}, 2);
+            }
+        }
 
-    @pyqtSlot(str)
-    def activateLink(self, url):
-        self.link_clicked.emit(url)
+        function patchContent(html) {
+            const content = document.getElementById('__CONTENT__');
+            const fresh = document.createElement('div');
+            fresh.innerHTML = html;
 
+            const oldNodes = Array.prototype.slice.call(content.childNodes);
+            const newNodes = Array.prototype.slice.call(fresh.childNodes);
 
-class QsciAPIWiki(QsciAPIs):
-    def updateAutoCompletionList(self, context, options):
-        return ['ballowallo', 'balloquallo', 'ballomallo']
+            // Skip all blocks at the beginning and the end which did not change
+            let start = 0;
+            while (start < oldNodes.length && start < newNodes.length
+                   && oldNodes[start].isEqualNode(newNodes[start])) {
+                start++;
+            }
 
-    def autoCompletionSelected(self, *args, **kwargs):
-        return super().autoCompletionSelected(*args, **kwargs)
+            let oldEnd = oldNodes.length;
+            let newEnd = newNodes.length;
+            while (oldEnd > start && newEnd > start
+                   && oldNodes[oldEnd - 1].isEqualNode(newNodes[newEnd - 1])) {
+                oldEnd--;
+                newEnd--;
+            }
 
+            // ... and only replace the blocks in between
+            const next = oldEnd < oldNodes.length ? oldNodes[oldEnd] : null;
+            for (let i = start; i < oldEnd; i++) {
+                content.removeChild(oldNodes[i]);
+            }
+            for (let i = start; i < newEnd; i++) {
+                content.insertBefore(newNodes[i], next);
+            }
+        }
 
-class MarkdownEditorMixin:
-    SCROLLING_JS = """const element = document.getElementById('__CURSOR__');
-        if (element !== null && element !== undefined) {
-          const elementRect = element.getBoundingClientRect();
-          const absoluteElementTop = elementRect.top + window.pageYOffset;
-          const middle = absoluteElementTop - (window.innerHeight / 2);
-          setTimeout(function () {window.scrollTo(0, middle);}, 2);
-        }"""
-
-    WEBCHANNEL_JS = """
-    (function(){
         new QWebChannel(qt.webChannelTransport,
             function(channel) {
                 var proxy = channel.objects.proxy;
+
+                patchContent(proxy.body);
+                scrollToLine(proxy.cursorLine);
+
+                proxy.bodyChanged.connect(function(body) {
+                    patchContent(body);
+                    scrollToLine(cursorLine);
+                });
+                proxy.cursorLineChanged.connect(scrollToLine);
+
                 document.body.addEventListener('click', function (e) {
                     if (!e.target || e.target.nodeName != "A") {
                         return;
@@ -81,6 +129,77 @@ class MarkdownEditorMixin:
         );
     })();"""
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.base_url = None
+
+    def acceptNavigationRequest(self, url, navType, isMainFrame):
+        if url.scheme() == 'qrc':
+            return True
+
+        QDesktopServices.openUrl(url)
+
+        return False
+
+    def load_preview(self, base_url):
+        """ Load the preview skeleton once, later updates are patched in through the web channel. """
+        if self.base_url == base_url:
+            return
+
+        self.base_url = base_url
+        self.setHtml(CustomWebPage.PREVIEW_HTML % (CustomWebPage.PREVIEW_JS), base_url)
+
+
+class WebChannelProxy(QObject):
+    link_clicked = pyqtSignal(str, name='linkClicked')
+    body_changed = pyqtSignal(str, name='bodyChanged')
+    cursor_line_changed = pyqtSignal(int, name='cursorLineChanged')
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._body = ''
+        self._cursor_line = -1
+
+    @pyqtSlot(str)
+    def activateLink(self, url):
+        self.link_clicked.emit(url)
+
+    @pyqtProperty(str, notify=body_changed)
+    def body(self):
+        return self._body
+
+    def set_body(self, body):
+        if body == self._body:
+            return
+
+        self._body = body
+        self.body_changed.emit(body)
+
+    @pyqtProperty(int, notify=cursor_line_changed)
+    def cursorLine(self):
+        return self._cursor_line
+
+    def set_cursor_line(self, line):
+        if line == self._cursor_line:
+            return
+
+        self._cursor_line = line
+        self.cursor_line_changed.emit(line)
+
+
+class RenderNotifier(QObject):
+    # Emitted from the render thread, Qt queues it into the GUI thread for us
+    rendered = pyqtSignal(int, str)
+
+
+class MarkdownEditorMixin:
+    # Wait for the user to pause typing or moving the cursor before rendering
+    RENDER_DELAY = 100
+    # Write unsaved edits to disk once the user stopped typing for a while
+    AUTOSAVE_DELAY = 2000
+    # Identifies our list of link completions (user lists need an id > 0)
+    LINK_COMPLETION_LIST = 1
+
     def setup_markdown_editor(self):
         self.renderers = {}
         self.fallback_renderer = PlainRenderer()
@@ -107,6 +226,24 @@ class MarkdownEditorMixin:
 
         self.channel_proxy.link_clicked.connect(self.link_clicked)
 
+        # Set up background rendering
+        self.render_notifier = RenderNotifier(self)
+        self.render_notifier.rendered.connect(self.render_finished)
+        self.render_worker = RenderWorker(self.render_notifier.rendered.emit)
+
+        self.render_timer = QTimer(self)
+        self.render_timer.setSingleShot(True)
+        self.render_timer.timeout.connect(self.render_text)
+
+        # Edits are journaled as they happen, writing the files can wait
+        self.autosave_timer = QTimer(self)
+        self.autosave_timer.setSingleShot(True)
+        self.autosave_timer.timeout.connect(self.autosave)
+
+        # Keep the statistics up to date with every change to the editor's text
+        self.statistics = DocumentStatistics()
+        self.ui.markdownEditor.SCN_MODIFIED.connect(self.editor_modified)
+
         # Set up HTML preview
         self.ui.htmlPreview.setLexer(QsciLexerHTML())
 
@@ -123,12 +260,6 @@ class MarkdownEditorMixin:
 
         self.ui.markdownEditor.installEventFilter(self)
 
-        # Load Github style
-        style_file = QFile(':/styles/github.css')
-        style_file.open(QIODevice.ReadOnly)
-        self.style = QTextStream(style_file).readAll()
-        style_file.close()
-
         self.current_article = None
         self.ui.markdownEditor.hide()
 
@@ -150,9 +281,6 @@ class MarkdownEditorMixin:
         self.lexer = QsciLexerMarkdown()
         self.lexer.setDefaultFont(fontdb.font(
             'Source Code Pro', 'Regular', 11))
-        # TODO autocompletion of links does not work
-        self.api = QsciAPIWiki(self.lexer)
-        self.api.prepare()
 
     def setup_scintilla(self, widget):
         # Set up Markdown editor
@@ -167,12 +295,11 @@ class MarkdownEditorMixin:
         widget.setTabIndents(True)
         widget.setEolMode(QsciScintilla.EolUnix)
 
-        widget.setAutoCompletionSource(QsciScintilla.AcsAPIs)
-        widget.setAutoCompletionThreshold(1)
+        # Links are completed from a list of our own, keep it in our order
         widget.setAutoCompletionCaseSensitivity(False)
-        widget.setAutoCompletionReplaceWord(False)
-        widget.setAutoCompletionWordSeparators([' '])
-        # widget.setAutoCompletionUseSingle(QsciScintilla.AcusNever)
+        widget.SendScintilla(QsciScintilla.SCI_AUTOCSETORDER, QsciScintilla.SC_ORDER_CUSTOM)
+        widget.textChanged.connect(partial(self.schedule_link_completion, widget))
+        widget.userListActivated.connect(partial(self.link_completion_selected, widget))
 
         widget.setLexer(self.lexer)
 
@@ -188,11 +315,6 @@ class MarkdownEditorMixin:
             if reply == QMessageBox.Yes:
                 article = self.current_wiki.create_article_by_url(
                     url, self.current_wiki.default_file_type)
-                parent_index = self.ui.wikiTree.model().findData(article.parent)
-                self.ui.wikiTree.model().insertArticle(
-                    self.ui.wikiTree.model().rowCount(parent_index),
-                    article,
-                    parent_index)
             else:
                 return
 
@@ -212,12 +334,10 @@ class MarkdownEditorMixin:
                 self.ui.actionCommit.setEnabled(True)
                 self.ui.uncommittedWarningLabel.show()
 
-            self.ui.wikiTree.model().updateItem(self.current_article_index)
-
     def edit_toggled(self, enabled):
         if enabled:
             self.ui.markdownEditor.show()
-            self.update_wordcount()
+            self.update_statistics()
             self.ui.actionAutoLink.setEnabled(True)
             self.ui.actionAutoLinkAll.setEnabled(True)
         else:
@@ -226,123 +346,156 @@ class MarkdownEditorMixin:
             self.ui.actionAutoLink.setEnabled(False)
             self.ui.actionAutoLinkAll.setEnabled(False)
 
+        line, _ = self.ui.markdownEditor.getCursorPosition()
+        self.scroll_preview(line)
+
     def add_renderer(self, renderer):
         self.renderers[renderer.get_file_type()] = renderer
 
     def text_changed(self):
         self.current_article.text = self.ui.markdownEditor.text()
         self.ui.actionUndo.setEnabled(True)
-        self.update_wordcount()
         self.update_toolbar()
+        self.schedule_render()
+        self.autosave_timer.start(self.AUTOSAVE_DELAY)
+
+    def autosave(self):
+        if self.current_wiki is None:
+            return
 
-        line, index = self.ui.markdownEditor.getCursorPosition()
-        cursor_index = self.ui.markdownEditor.positionFromLineIndex(
-            line, index)
+        self.current_wiki.autosave()
+        self.update_toolbar()
 
-        if self.ui.markdownEditor.text()[cursor_index - 1:cursor_index + 1] == '[[':
-            self.ui.markdownEditor.autoCompleteFromAPIs()
+    def schedule_link_completion(self, editor):
+        # Let Scintilla finish handling the keystroke first
+        QTimer.singleShot(0, partial(self.complete_link, editor))
 
-    def render_text(self, text_widget, preview_widget, cursor_index):
-        text = text_widget.text()
+    def get_partial_link(self, editor):
+        """ Returns the line, start index and text of the link being typed in editor, if any. """
+        line, index = editor.getCursorPosition()
+        text = editor.text(line)[:index]
+        start = text.rfind('[[')
 
-        # Only jump to cursor when the editor is shown
-        if self.ui.actionEdit.isChecked():
-            # Prevent CURSOR_MARK from breaking headings
-            if text[cursor_index:cursor_index + 1] == '#' or text[cursor_index - 1:cursor_index] == '#':
-                cursor_index = text.find(' ', cursor_index) + 1
+        if start == -1 or ']]' in text[start:]:
+            return None
+
+        return line, start + 2, text[start + 2:]
+
+    def complete_link(self, editor):
+        """ Offer the URLs of matching articles while a link is being typed. """
+        if not editor.hasFocus() or self.current_wiki is None:
+            return
+
+        partial_link = self.get_partial_link(editor)
+        if partial_link is None:
+            return
+
+        completions = self.current_wiki.link_completer.complete(partial_link[2])
+        if completions:
+            editor.showUserList(self.LINK_COMPLETION_LIST, completions)
+        elif editor.isListActive():
+            editor.cancelList()
+
+    def link_completion_selected(self, editor, list_id, url):
+        partial_link = self.get_partial_link(editor)
+        if list_id != self.LINK_COMPLETION_LIST or partial_link is None:
+            return
+
+        line, start, _ = partial_link
+        _, index = editor.getCursorPosition()
+        closed = editor.text(line)[index:index + 2] == ']]'
 
-            new_text = text[:cursor_index] + '%CURSOR%'
-            new_text += text[cursor_index:]
+        editor.setSelection(line, start, line, index)
+        editor.replaceSelectedText(url if closed else url + ']]')
 
-            text = new_text
+    def schedule_render(self, delay=RENDER_DELAY):
+        """ Render the preview once the user stopped typing for a moment.
+        Every call restarts the timer, so only the latest text gets rendered.
+        """
+        self.render_timer.start(delay)
+
+    def render_text(self):
+        if self.current_article is None:
+            return
 
         if self.current_article.file_type not in self.renderers:
             renderer = self.fallback_renderer
         else:
             renderer = self.renderers[self.current_article.file_type]
 
-        html = renderer.render(
-            self.current_article.wiki, text, style=self.style)
+        # The snapshot is immutable, so the render thread can use it safely
+        self.render_worker.submit(renderer.render_body,
+                                  self.current_article.wiki.url_snapshot,
+                                  self.ui.markdownEditor.text())
 
-        html = html + """
-            <script src="qrc:///qtwebchannel/qwebchannel.js"></script>
-            <script>(function() {%s\n%s})();</script>""" % (
-            MarkdownEditorMixin.SCROLLING_JS,
-            MarkdownEditorMixin.WEBCHANNEL_JS
-        )
+    def render_finished(self, generation, html):
+        # Ignore results that have been overtaken by a newer request
+        if not self.render_worker.is_current(generation):
+            return
 
-        # Render and update the preview
-        url = QUrl(self.current_article.wiki.physical_path + '/')
-        preview_widget.page().setHtml(html, url)
+        # The preview page is only loaded once, after that we just hand the
+        # new body to the page which patches it in place
+        self.load_preview(self.ui.markdownPreview)
+        self.channel_proxy.set_body(html)
         self.ui.htmlPreview.setText(html)
 
-    def auto_link_word(self):
-        if self.ui.markdownEditor.hasSelectedText():
-            word = self.ui.markdownEditor.selectedText()
-        else:
-            text = self.ui.markdownEditor.text()
-            line, index = self.ui.markdownEditor.getCursorPosition()
-            cursor_position = self.ui.markdownEditor.positionFromLineIndex(
-                line, index)
-            word_start = text.rfind(' ', 0, cursor_position)
-            word_end = text.find(' ', cursor_position)
-            word_end_line = text.find("\n", cursor_position)
+    def load_preview(self, preview_widget):
+        if self.current_article is None:
+            return
 
-            if word_end_line < word_end:
-                word_end = word_end_line
+        url = QUrl(self.current_article.wiki.physical_path + '/')
+        preview_widget.page().load_preview(url)
 
-            word = text[word_start + 1:word_end]
+    def scroll_preview(self, line):
+        """ Scroll the preview to the block at the given source line, without rendering. """
+        # Only jump to cursor when the editor is shown
+        if not self.ui.actionEdit.isChecked():
+            line = -1
 
-        article = self.current_wiki.find_article_by_name(word)
+        self.channel_proxy.set_cursor_line(line)
 
-        if article:
-            if self.ui.markdownEditor.hasSelectedText():
-                self.ui.markdownEditor.replaceSelectedText(
-                    "[[%s]]" % (article.wiki_url))
-            else:
-                line, index_start = self.ui.markdownEditor.lineIndexFromPosition(
-                    word_start + 1)
-                _, index_end = self.ui.markdownEditor.lineIndexFromPosition(
-                    word_end)
-                self.ui.markdownEditor.setSelection(
-                    line, index_start, line, index_end)
+    def auto_link_word(self):
+        editor = self.ui.markdownEditor
+        matcher = self.current_wiki.link_matcher
 
-                self.ui.markdownEditor.replaceSelectedText(
-                    "[[%s]]" % (article.wiki_url))
+        if editor.hasSelectedText():
+            word = editor.selectedText()
+            article = matcher.get(word.strip())
 
-                self.ui.markdownEditor.setCursorPosition(line, index)
+            if article:
+                editor.replaceSelectedText("[[%s]]" % (article.wiki_url))
+                return
         else:
-            logger.info("Could not find article '%s'" % (word))
+            # Link the mention of an article name under the cursor
+            line, index = editor.getCursorPosition()
+            text = editor.text(line).rstrip('\r\n')
+            word = text
+
+            for start, end, article in matcher.find_mentions(text):
+                if start <= index <= end:
+                    editor.setSelection(line, start, line, end)
+                    editor.replaceSelectedText("[[%s]]" % (article.wiki_url))
+                    editor.setCursorPosition(line, index)
+                    return
+
+        logger.info("Could not find article '%s'" % (word))
 
     def auto_link_all(self):
         # TODO Allow user to select root-article
         # e.g., only auto link to articles in a certain category
-        text = self.ui.markdownEditor.text().split('\n')
-        for name, article in self.current_wiki.get_name_dict().items():
-            for line_index, line in enumerate(text):
-
-                # Skip headlines
-                if line.startswith('#'):
-                    continue
+        def format_link(article):
+            # Don't link the article to itself
+            if article is self.current_article:
+                return None
 
-                offset = 0
-                for match in re.finditer(name + r'(?![^\[]*\])', line):
-                    link = "[[%s]]" % (article.wiki_url)
-                    line = line[:match.start()] + link + line[match.end():]
+            return "[[%s]]" % (article.wiki_url)
 
-                    offset += len(link) - len(name)
-
-                text[line_index] = line
-
-        self.ui.markdownEditor.setText('\n'.join(text))
+        text = self.ui.markdownEditor.text()
+        self.ui.markdownEditor.setText(
+            self.current_wiki.link_matcher.link_all(text, format_link))
 
     def cursor_changed(self, line, index):
-        # Get the byte index of the cursor
-        cursor_index = self.ui.markdownEditor.positionFromLineIndex(
-            line, index)
-
-        self.render_text(self.ui.markdownEditor,
-                         self.ui.markdownPreview, cursor_index)
+        self.scroll_preview(line)
 
     def load_article(self, article):
         # Disconnect any signals while changing article
@@ -371,16 +524,40 @@ class MarkdownEditorMixin:
         self.ui.actionUndo.setEnabled(False)
         self.ui.actionRedo.setEnabled(False)
 
-        # Manually trigger rerendering of preview
-        self.cursor_changed(0, 0)
+        # Manually trigger rerendering of preview, no need to wait for this one
+        self.scroll_preview(0)
+        self.schedule_render(delay=0)
 
-    def update_wordcount(self):
-        text = self.ui.markdownEditor.text()
-        text_start = 0
-        if text.startswith("---\n"):
-            text_start = text.find('\n---\n') + 4
-        count = len(re.findall(r'\w+', text[text_start:]))
-        self.statusBar().showMessage('Words: %d' % (count))
+    def editor_modified(self, position, modification_type, text, length,
+                        lines_added, *args):
+        """ Recount only the lines touched by an insertion or deletion. """
+        inserted = modification_type & QsciScintilla.SC_MOD_INSERTTEXT
+        if not inserted and not modification_type & QsciScintilla.SC_MOD_DELETETEXT:
+            return
+
+        editor = self.ui.markdownEditor
+        first_line = editor.SendScintilla(QsciScintilla.SCI_LINEFROMPOSITION, position)
+
+        if inserted:
+            # One line got split into 1 + lines_added lines
+            removed_lines, new_lines = 1, 1 + lines_added
+        else:
+            # 1 - lines_added lines (lines_added is negative) got joined into one
+            removed_lines, new_lines = 1 - lines_added, 1
+
+        self.statistics.update(first_line, removed_lines,
+                               [editor.text(line) for line in range(first_line, first_line + new_lines)])
+
+        # textChanged is emitted before this, so the status bar is updated here
+        if self.ui.actionEdit.isChecked():
+            self.update_statistics()
+
+    def update_statistics(self):
+        statistics = self.statistics
+        self.statusBar().showMessage(
+            'Words: %d | Characters: %d | Headings: %d | Links: %d | Reading time: %d min' % (
+                statistics.words, statistics.characters, statistics.headings,
+                statistics.links, statistics.reading_time))
 
     def save_article(self):
         self.current_article.write()
@@ -1,3 +1,5 @@
+import os
+
 from PyQt5.QtCore import QFileInfo, QSettings
 from PyQt5.QtGui import QIcon
 from PyQt5.QtWidgets import QAction
@@ -54,3 +56,10 @@ class RecentFilesMixin:
         action = self.sender()
         if action:
             self.open_wiki(action.data())
+
+    def open_last_wiki(self):
+        """ Open the most recently used wiki, if there is one and it still exists. """
+        files = QSettings().value('recentFileList', [])
+
+        if files and os.path.exists(os.path.join(files[0], '.git')):
+            self.open_wiki(files[0])
@@ -0,0 +1,150 @@
+import logging
+from functools import partial
+
+from PyQt5.QtCore import QObject, pyqtSignal
+from PyQt5.QtWidgets import QLabel, QMessageBox, QToolButton
+
+from ..backend.sync import PULL, SyncCancelled, SyncService
+
+logger = logging.getLogger(__name__)
+
+
+class SyncNotifier(QObject):
+    # Emitted from the sync thread, Qt queues them into the GUI thread for us
+    progress = pyqtSignal(object, str)
+    finished = pyqtSignal(object, object)
+    maintained = pyqtSignal(object)
+    # The wiki and the files changed by other programs
+    files_changed = pyqtSignal(object, object)
+
+
+class SyncMixin:
+    # Look for changes on the remote every 15 minutes (in seconds)
+    FETCH_INTERVAL = 15 * 60
+    # Show reports of the repository maintenance for 5 seconds
+    MAINTENANCE_MESSAGE_TIMEOUT = 5000
+
+    def setup_sync(self):
+        self.sync_service = None
+
+        self.sync_notifier = SyncNotifier(self)
+        self.sync_notifier.progress.connect(self.sync_progress)
+        self.sync_notifier.finished.connect(self.sync_finished)
+        self.sync_notifier.maintained.connect(self.maintenance_finished)
+        self.sync_notifier.files_changed.connect(self.files_changed)
+
+        self.sync_label = QLabel(self)
+        self.sync_cancel_button = QToolButton(self)
+        self.sync_cancel_button.setText('Cancel')
+        self.sync_cancel_button.clicked.connect(self.cancel_sync)
+        self.sync_cancel_button.setVisible(False)
+        self.statusBar().addPermanentWidget(self.sync_label)
+        self.statusBar().addPermanentWidget(self.sync_cancel_button)
+
+        self.ui.actionSync.setEnabled(False)
+        self.ui.actionSync.triggered.connect(self.start_sync)
+
+    def start_sync_service(self, wiki):
+        self.stop_sync_service()
+
+        self.sync_service = SyncService(wiki,
+                                        self.sync_notifier.progress.emit,
+                                        self.sync_notifier.finished.emit,
+                                        self.FETCH_INTERVAL if wiki.remote_url else None)
+        self.ui.actionSync.setEnabled(bool(wiki.remote_url))
+
+        # Keep the repository small while the user isn't doing anything
+        wiki.start_maintenance(self.sync_notifier.maintained.emit)
+        # Articles are updated on the GUI thread, like everything else
+        wiki.start_watching(partial(self.sync_notifier.files_changed.emit, wiki))
+
+    def stop_sync_service(self):
+        if self.sync_service is None:
+            return
+
+        self.sync_service.close()
+        self.sync_service = None
+
+        self.sync_label.clear()
+        self.sync_cancel_button.setVisible(False)
+        self.ui.actionSync.setEnabled(False)
+
+    def start_sync(self):
+        if self.sync_service is None:
+            return
+
+        # Pulling would overwrite the unsaved text of the current article
+        if self.current_article and self.current_article.modified:
+            self.commit_article()
+
+        self.sync_service.sync()
+        self.update_sync_state()
+
+    def cancel_sync(self):
+        if self.sync_service is not None:
+            self.sync_service.cancel()
+
+    def update_sync_state(self):
+        busy = self.sync_service is not None and self.sync_service.busy
+
+        self.ui.actionSync.setEnabled(not busy and self.sync_service is not None)
+        self.sync_cancel_button.setVisible(busy)
+
+    def sync_progress(self, job, message):
+        if job.background or self.sync_service is None:
+            return
+
+        message = message.strip()
+        if message:
+            self.sync_label.setText(message)
+
+    def sync_finished(self, job, error):
+        # The wiki got closed in the meantime
+        if self.sync_service is None:
+            return
+
+        if job.background:
+            if error is not None and not isinstance(error, SyncCancelled):
+                logger.warning("Could not fetch from '%s': %s" % (self.current_wiki.remote_url, error))
+        elif isinstance(error, SyncCancelled):
+            self.sync_label.setText('%s cancelled.' % (job.operation.capitalize()))
+        elif error is not None:
+            self.sync_label.setText('%s failed!' % (job.operation.capitalize()))
+            QMessageBox.warning(self, 'Sync failed',
+                                'Could not %s: %s' % (job.operation, error))
+        else:
+            self.sync_label.setText('%s finished.' % (job.operation.capitalize()))
+
+            if job.operation == PULL:
+                # The sync thread only wrote the files, articles are updated on the GUI thread
+                self.current_wiki.apply_pulled_changes(job.result)
+                self.refresh_current_article()
+
+        self.update_sync_state()
+
+    def refresh_current_article(self):
+        """ Show the pulled text of the current article, or the wiki's index if it got deleted. """
+        article = self.current_article
+        if article is None:
+            return
+
+        while not article.is_root():
+            if article not in article.parent.children:
+                self.load_article(self.current_wiki.root)
+                return
+
+            article = article.parent
+
+        if self.current_article.text != self.ui.markdownEditor.text():
+            self.load_article(self.current_article)
+
+    def maintenance_finished(self, report):
+        self.statusBar().showMessage(str(report), self.MAINTENANCE_MESSAGE_TIMEOUT)
+
+    def files_changed(self, wiki, changes):
+        # The wiki got closed in the meantime
+        if wiki is not self.current_wiki:
+            return
+
+        wiki.apply_external_changes(changes)
+        self.refresh_current_article()
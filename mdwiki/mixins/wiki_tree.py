@@ -1,10 +1,12 @@
 import logging
 from functools import partial
 
-from PyQt5.QtCore import QAbstractItemModel, QModelIndex, Qt
+from PyQt5.QtCore import (QAbstractItemModel, QModelIndex, QSortFilterProxyModel,
+                          QTimer, Qt, pyqtSignal)
 from PyQt5.QtGui import QIcon
-from PyQt5.QtWidgets import QDialog, QMenu, QMessageBox, QHeaderView
+from PyQt5.QtWidgets import QApplication, QDialog, QMenu, QMessageBox, QHeaderView
 
+from ..backend.events import ChangeType, STRUCTURE_CHANGES
 from ..gui.new_article_ui import Ui_NewArticleDialog
 
 logger = logging.getLogger(__name__)
@@ -23,10 +25,29 @@ class ArticleViewModel:
         self.parentItem = parent
 
         self.childItems = []
+        # Our position in parentItem.childItems, kept up to date by our parent
+        self.rowNumber = 0
+        # Whether the items of our article's children have been created yet
+        self.fetched = False
 
     def appendChild(self, item):
+        item.rowNumber = len(self.childItems)
         self.childItems.append(item)
 
+    def updateRows(self, position=0):
+        """ Refresh the cached rows of all children from position on. """
+        for row in range(position, len(self.childItems)):
+            self.childItems[row].rowNumber = row
+
+    def iterItems(self):
+        """ Yields this item and all of its descendants. """
+        stack = [self]
+
+        while stack:
+            item = stack.pop()
+            yield item
+            stack.extend(item.childItems)
+
     def child(self, row):
         if row >= len(self.childItems):
             return None
@@ -41,7 +62,7 @@ class ArticleViewModel:
 
     def childNumber(self):
         if self.parentItem is not None:
-            return self.parentItem.childItems.index(self)
+            return self.rowNumber
         return 0
 
     def data(self, column):
@@ -54,10 +75,7 @@ class ArticleViewModel:
         return self.parentItem
 
     def row(self):
-        if self.model.parent:
-            return self.model.parent.children.index(self)
-
-        return 0
+        return self.childNumber()
 
     def insertChild(self, position, model):
         if position < 0 or position > len(self.childItems):
@@ -65,6 +83,7 @@ class ArticleViewModel:
 
         item = ArticleViewModel(model, self)
         self.childItems.insert(position, item)
+        self.updateRows(position)
 
         return True
 
@@ -76,6 +95,8 @@ class ArticleViewModel:
             item = ArticleViewModel(None, self)
             self.childItems.insert(position, item)
 
+        self.updateRows(position)
+
         return True
 
     def removeChildren(self, position, count):
@@ -85,6 +106,8 @@ class ArticleViewModel:
         for row in range(count):
             self.childItems.pop(position)
 
+        self.updateRows(position)
+
         return True
 
     def setData(self, column, value):
@@ -102,7 +125,7 @@ class ArticleViewModel:
         if column == 0:
             if not self.model.parent:
                 return QIcon(':/icons/%s' % ICON_WIKI)
-            elif len(self.childItems) > 0:
+            elif self.model.has_children():
                 return QIcon(':/icons/%s' % ICON_CATEGORY)
             else:
                 return QIcon(':/icons/%s' % ICON_ARTICLE)
@@ -122,13 +145,29 @@ class ArticleViewModel:
 
 
 class WikiTreeModel(QAbstractItemModel):
+    # Changes which add, remove or move rows
+    TREE_CHANGES = frozenset([ChangeType.CREATED, ChangeType.MOVED, ChangeType.DELETED])
+    # Rebuild the model instead of applying this many changes one by one
+    RESET_THRESHOLD = 1000
+
+    # The wiki's events may come from any thread, this brings them to ours
+    changesReceived = pyqtSignal(object)
+
     def __init__(self, headers, wiki, parent=None):
         super(WikiTreeModel, self).__init__(parent)
 
         self.model = wiki
         self.rootItem = ArticleViewModel(None)
+        # Article -> ArticleViewModel, so finding an article doesn't search the tree
+        self.items = {}
         self.setupModelData(wiki)
 
+        self.pendingChanges = []
+        self.changesReceived.connect(self.queueChanges)
+        # Every access to a signal gives a new emit, keep this one to unsubscribe it again
+        self._on_changes = self.changesReceived.emit
+        wiki.events.subscribe(self._on_changes)
+
     def columnCount(self, parent=QModelIndex()):
         return self.rootItem.columnCount()
 
@@ -149,11 +188,12 @@ class WikiTreeModel(QAbstractItemModel):
             return None
 
     def close(self):
-        self.model.close()
+        """ Stop following the changes of the wiki, which is closed by its owner. """
+        self.model.events.unsubscribe(self._on_changes)
 
     def flags(self, index):
         if not index.isValid():
-            return 0
+            return Qt.NoItemFlags
 
         return Qt.ItemIsSelectable | super(WikiTreeModel, self).flags(index)
 
@@ -199,14 +239,6 @@ class WikiTreeModel(QAbstractItemModel):
 
         return success
 
-    def insertArticle(self, position, article, parent=QModelIndex()):
-        parentItem = self.getItem(parent)
-        self.beginInsertRows(parent, position, position)
-        success = parentItem.insertChild(position, article)
-        self.endInsertRows()
-
-        return success
-
     def parent(self, index):
         if not index.isValid():
             return QModelIndex()
@@ -235,22 +267,51 @@ class WikiTreeModel(QAbstractItemModel):
         parentItem = self.getItem(parent)
 
         self.beginRemoveRows(parent, position, position + rows - 1)
+        for item in parentItem.childItems[position:position + rows]:
+            self.forgetItems(item)
         success = parentItem.removeChildren(position, rows)
         self.endRemoveRows()
 
         return success
 
-    def moveArticle(self, old_parent_index, article_index, parent_index):
-        # This should actually use beginMoveRows/endMoveRows
-        # But since documentation is seriously lacking and there are no
-        # examples on how to correctly use those let's just be fools
-        article = self.getItem(article_index)
-        newParent = self.getItem(parent_index)
+    def hasChildren(self, parent=QModelIndex()):
+        if parent.column() > 0:
+            return False
+
+        item = self.getItem(parent)
+        if item.fetched or item.model is None:
+            return item.childCount() > 0
 
-        self.removeRows(article_index.row(), 1, old_parent_index)
-        self.insertArticle(newParent.childCount(), article.model, parent_index)
+        return item.model.has_children()
+
+    def canFetchMore(self, parent):
+        item = self.getItem(parent)
+
+        return not item.fetched and item.model is not None
+
+    def fetchMore(self, parent):
+        """ Create the items of an article's children, once it gets expanded. """
+        item = self.getItem(parent)
+        if item.fetched:
+            return
+
+        item.fetched = True
+        children = item.model.children if item.model else []
+        if not children:
+            return
+
+        self.beginInsertRows(parent, 0, len(children) - 1)
+        for article in children:
+            child = ArticleViewModel(article, item)
+            item.appendChild(child)
+            self.items[article] = child
+        self.endInsertRows()
 
     def rowCount(self, parent=QModelIndex()):
+        # Only the first column has children
+        if parent.column() > 0:
+            return 0
+
         parentItem = self.getItem(parent)
 
         return parentItem.childCount()
@@ -260,9 +321,13 @@ class WikiTreeModel(QAbstractItemModel):
             return False
 
         item = self.getItem(index)
+        old_article = item.model
         result = item.setData(index.column(), value)
 
         if result:
+            self.items.pop(old_article, None)
+            if value is not None:
+                self.items[value] = item
             self.dataChanged.emit(index, index)
 
         return result
@@ -284,24 +349,184 @@ class WikiTreeModel(QAbstractItemModel):
 
         self.dataChanged.emit(index_left, index_right)
 
+    def indexOf(self, item, column=0):
+        if item is self.rootItem:
+            return QModelIndex()
+
+        return self.createIndex(item.childNumber(), column, item)
+
+    def queueChanges(self, events):
+        # Apply everything that happened until the event loop runs again at once
+        if not self.pendingChanges:
+            QTimer.singleShot(0, self.applyChanges)
+
+        self.pendingChanges.extend(events)
+
+    def applyChanges(self):
+        events, self.pendingChanges = self.pendingChanges, []
+        tree_changes = [event for event in events if event.change_type in self.TREE_CHANGES]
+
+        if len(tree_changes) > self.RESET_THRESHOLD:
+            logger.info('Rebuilding the tree after %d changes' % (len(tree_changes)))
+            self.beginResetModel()
+            self.rootItem = ArticleViewModel(None)
+            self.items = {}
+            self.setupModelData(self.model)
+            self.endResetModel()
+            return
+
+        changed = set()
+        for event in tree_changes:
+            self.applyTreeChange(event)
+            # Parents may have become (or stopped being) categories
+            changed.add(event.article.parent)
+            changed.add(event.old_parent)
+
+        changed.update(event.article for event in events
+                       if event.change_type not in self.TREE_CHANGES)
+        self.emitDataChanged(self.items[article] for article in changed if article in self.items)
+
+    def applyTreeChange(self, event):
+        """ Add, move or remove the item of an article, so it matches the wiki again. """
+        article = event.article
+        item = self.items.get(article)
+        target = None
+
+        if event.change_type != ChangeType.DELETED and article.parent is not None:
+            target = self.items.get(article.parent)
+
+        if target is not None and not target.fetched:
+            # The article will be created along with its siblings
+            if item is not None:
+                self.removeRows(item.childNumber(), 1, self.indexOf(item.parentItem))
+
+            # ... unless its parent just became a category, which the view has to know
+            if len(article.parent.children) == 1:
+                self.fetchMore(self.indexOf(target))
+            return
+
+        if item is None:
+            if target is not None:
+                position = target.childCount()
+                self.beginInsertRows(self.indexOf(target), position, position)
+                target.insertChild(position, article)
+                self.items[article] = target.child(position)
+                self.endInsertRows()
+        elif target is None:
+            self.removeRows(item.childNumber(), 1, self.indexOf(item.parentItem))
+        elif item.parentItem is not target:
+            self.moveItem(item, target)
+
+    def moveItem(self, item, target):
+        """ Move an item (and all of its children) to the end of target. """
+        oldParent = item.parentItem
+        row = item.childNumber()
+        position = target.childCount()
+
+        if not self.beginMoveRows(self.indexOf(oldParent), row, row,
+                                  self.indexOf(target), position):
+            return False
+
+        oldParent.childItems.pop(row)
+        oldParent.updateRows(row)
+        item.parentItem = target
+        target.appendChild(item)
+        self.endMoveRows()
+
+        return True
+
+    def emitDataChanged(self, items):
+        """ Emit one dataChanged for the changed rows of every parent. """
+        rows = {}
+        for item in items:
+            first, last = rows.get(item.parentItem, (item.rowNumber, item.rowNumber))
+            rows[item.parentItem] = (min(first, item.rowNumber), max(last, item.rowNumber))
+
+        for parentItem, (first, last) in rows.items():
+            self.dataChanged.emit(
+                self.indexOf(parentItem.child(first)),
+                self.indexOf(parentItem.child(last), self.columnCount() - 1))
+
     def findData(self, data):
-        index = self.match(self.index(0, 0),
-                           Qt.EditRole,
-                           data,
-                           2,
-                           Qt.MatchRecursive)
+        item = self.items.get(data)
+
+        if item is None:
+            item = self.fetchArticle(data)
+
+            if item is None:
+                return None
 
-        return None if not index else index[0]
+        return self.createIndex(item.childNumber(), 0, item)
+
+    def fetchArticle(self, article):
+        """ Fetch the children of all of article's ancestors which haven't been expanded yet. """
+        missing = []
+        while article is not None and article not in self.items:
+            missing.append(article)
+            article = getattr(article, 'parent', None)
+
+        if article is None:
+            return None
+
+        for ancestor in reversed(missing):
+            item = self.items[article]
+            self.fetchMore(self.createIndex(item.childNumber(), 0, item))
+
+            if ancestor not in self.items:
+                return None
+
+            article = ancestor
+
+        return self.items[article]
+
+    def forgetItems(self, item):
+        for descendant in item.iterItems():
+            if self.items.get(descendant.model) is descendant:
+                del self.items[descendant.model]
 
     def setupModelData(self, wiki):
-        def add_article(article, parent):
-            article_vm = ArticleViewModel(article, parent)
-            parent.appendChild(article_vm)
+        # Everything below the root is created on demand (see fetchMore)
+        root = ArticleViewModel(wiki.root, self.rootItem)
+        self.rootItem.appendChild(root)
+        self.rootItem.fetched = True
+        self.items[wiki.root] = root
+
+
+class WikiFilterModel(QSortFilterProxyModel):
+    """ Shows only the articles matched by a filter, along with their ancestors.
+    The matches come from the wiki's title index, so filtering a row is a set lookup.
+    """
+
+    def __init__(self, source, parent=None):
+        super().__init__(parent)
+        self.setSourceModel(source)
+        # None shows everything
+        self.visible = None
+
+    def setMatches(self, matches):
+        if matches is None:
+            self.visible = None
+        else:
+            self.visible = set()
+            for article in matches:
+                while article is not None and article not in self.visible:
+                    self.visible.add(article)
+                    article = article.parent
+
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, row, parent):
+        if self.visible is None:
+            return True
+
+        item = self.sourceModel().getItem(parent).child(row)
 
-            for child in article.children:
-                add_article(child, article_vm)
+        return item is not None and item.model in self.visible
 
-        add_article(wiki.root, self.rootItem)
+    def findData(self, data):
+        index = self.sourceModel().findData(data)
+
+        return None if index is None else self.mapFromSource(index)
 
 
 class NewArticleDialog(QDialog, Ui_NewArticleDialog):
@@ -336,6 +561,9 @@ class NewArticleDialog(QDialog, Ui_NewArticleDialog):
 
             self.parent.setCurrentIndex(parent_index)
 
+        # This expands all ancestors of the selected article
+        self.parent.scrollTo(self.parent.currentIndex())
+
         if index == -1:
             return
 
@@ -344,7 +572,7 @@ class NewArticleDialog(QDialog, Ui_NewArticleDialog):
     def setup_ui_hacks(self):
         self.parent.hideColumn(1)
         self.parent.hideColumn(2)
-        self.parent.expandAll()
+        self.parent.expand(self.parent.model().index(0, 0))
 
     def execute(self):
         return self.exec_()
@@ -371,7 +599,15 @@ class NewArticleDialog(QDialog, Ui_NewArticleDialog):
 
 
 class WikiTreeMixin:
+    # Wait for the user to pause typing before filtering
+    FILTER_DELAY = 100
+    # Expand the tree to show this many matches of a filter
+    EXPAND_LIMIT = 100
+
     def setup_wiki_tree(self):
+        self.tree_model = None
+        self.tree_filter = None
+
         self.ui.wikiTree.clicked.connect(self.item_clicked)
         self.ui.actionNewArticle.triggered.connect(
             # TODO this is ugly
@@ -384,6 +620,57 @@ class WikiTreeMixin:
         self.ui.wikiTree.customContextMenuRequested.connect(
             self.show_context_menu)
 
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.timeout.connect(self.apply_filter)
+        self.ui.filterEdit.textChanged.connect(self.schedule_filter)
+
+    def show_wiki_tree(self, wiki):
+        self.close_wiki_tree()
+
+        self.tree_model = WikiTreeModel(['name', 'saved', 'unstaged'], wiki)
+        self.tree_model.changesReceived.connect(self.refresh_filter)
+        self.tree_filter = WikiFilterModel(self.tree_model, self)
+        self.ui.wikiTree.setModel(self.tree_filter)
+
+        self.ui.filterEdit.clear()
+
+    def close_wiki_tree(self):
+        if self.tree_model is not None:
+            self.tree_model.close()
+
+    def schedule_filter(self):
+        self.filter_timer.start(self.FILTER_DELAY)
+
+    def refresh_filter(self, events):
+        # Created, renamed, moved or deleted articles might (not) match anymore
+        if self.ui.filterEdit.text().strip() and \
+                any(event.change_type in STRUCTURE_CHANGES for event in events):
+            self.schedule_filter()
+
+    def apply_filter(self):
+        if self.tree_model is None:
+            return
+
+        query = self.ui.filterEdit.text()
+        if not query.strip():
+            self.tree_filter.setMatches(None)
+            return
+
+        matches = self.tree_model.model.title_index.search(query)
+        self.tree_filter.setMatches(matches)
+
+        # Reveal the first matches, the others show up when expanding their categories
+        for article in matches[:self.EXPAND_LIMIT]:
+            index = self.tree_filter.findData(article)
+            if index is None:
+                continue
+
+            parent = index.parent()
+            while parent.isValid():
+                self.ui.wikiTree.expand(parent)
+                parent = parent.parent()
+
     def setup_wiki_tree_ui_hacks(self):
         # TODO This is weird. The next line causes the wiki to silently
         # crash when it is in setup_wiki_tree(). Putting it here
@@ -407,10 +694,11 @@ class WikiTreeMixin:
         self.setup_wiki_tree_ui_hacks()
 
     def select_article(self, article):
-        index = self.ui.wikiTree.model().findData(article)
+        index = self.tree_filter.findData(article)
 
-        if index:
+        if index is not None and index.isValid():
             self.ui.wikiTree.setCurrentIndex(index)
+            self.ui.wikiTree.scrollTo(index)
         else:
             logger.warn('Could not select article %s: Not found!' % (article))
 
@@ -425,45 +713,61 @@ class WikiTreeMixin:
                                      message, QMessageBox.Yes, QMessageBox.No)
 
         if reply == QMessageBox.Yes:
-            model = self.ui.wikiTree.model()
-            article_index = model.findData(article)
-            model.removeRows(article_index.row(), 1, article_index.parent())
             article.delete()
             self.load_article(self.current_wiki.root)
 
     def show_new_article_dialog(self, article=None):
-        model = self.ui.wikiTree.model()
-        dialog = NewArticleDialog(self, model, self.renderers,
-                                  article, self.ui.wikiTree.currentIndex())
+        dialog = NewArticleDialog(self, self.tree_model, self.renderers, article,
+                                  self.tree_filter.mapToSource(self.ui.wikiTree.currentIndex()))
 
         if dialog.execute() != QDialog.Accepted:
             return
 
-        (name, file_type, parent_index, parent) = dialog.get_data()
+        (name, file_type, _, parent) = dialog.get_data()
 
+        # The tree follows the wiki's change events on its own
         # Edit article
         if article:
             article.file_type = file_type
-
-            old_parent = article.parent
             article.move(name, parent)
 
-            # Move article in tree
-            if old_parent != parent:
-                article_index = model.findData(article)
-                model.moveArticle(article_index.parent(),
-                                  article_index, parent_index)
-
             self.load_article(article)
 
         # New article
         else:
-            new_article = parent.wiki.create_article(name,
-                                                     file_type, parent)
-            self.ui.wikiTree.model().insertArticle(
-                self.ui.wikiTree.model().rowCount(parent_index),
-                new_article,
-                parent_index)
+            parent.wiki.create_article(name, file_type, parent)
+
+    def show_unlinked_mentions(self, article):
+        """ List the pages mentioning article without linking to it.
+        For the wiki itself, list the unlinked mentions of all articles.
+        """
+        target = None if article.is_root() else article
+
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            mentions = article.wiki.find_unlinked_mentions(target)
+        finally:
+            QApplication.restoreOverrideCursor()
+
+        if not mentions:
+            QMessageBox.information(self, 'Unlinked Mentions',
+                                    "No unlinked mentions of '%s' found." % (article.name))
+            return
+
+        details = []
+        for page, found in sorted(mentions.items(), key=lambda item: item[0].wiki_url):
+            for start, end, mentioned in found:
+                details.append("%s, line %d: '%s' (%s)" % (
+                    page.wiki_url or page.name,
+                    page.text.count('\n', 0, start) + 1,
+                    page.text[start:end],
+                    mentioned.wiki_url))
+
+        message_box = QMessageBox(QMessageBox.Information, 'Unlinked Mentions',
+                                  "Found %d unlinked mentions on %d pages." % (len(details), len(mentions)),
+                                  QMessageBox.Ok, self)
+        message_box.setDetailedText('\n'.join(details))
+        message_box.exec_()
 
     def show_context_menu(self, pos):
         index = self.ui.wikiTree.indexAt(pos)
@@ -477,12 +781,15 @@ class WikiTreeMixin:
         menu.addAction(self.ui.actionEditArticle)
         menu.addSeparator()
         menu.addAction(self.ui.actionDeleteArticle)
+        menu.addSeparator()
+        menu.addAction(self.ui.actionUnlinkedMentions)
 
         # TODO Add action to insert link to this article in the current editor
 
         try:
             self.ui.actionEditArticle.triggered.disconnect()
             self.ui.actionDeleteArticle.triggered.disconnect()
+            self.ui.actionUnlinkedMentions.triggered.disconnect()
         except TypeError:
             pass
 
@@ -492,4 +799,7 @@ class WikiTreeMixin:
         self.ui.actionDeleteArticle.triggered.connect(
             partial(self.show_delete_article_dialog, article))
 
+        self.ui.actionUnlinkedMentions.triggered.connect(
+            partial(self.show_unlinked_mentions, article))
+
         menu.exec_(self.ui.wikiTree.viewport().mapToGlobal(pos))
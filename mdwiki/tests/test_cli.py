@@ -0,0 +1,82 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from .. import cli
+from ..backend.wiki import Wiki
+
+
+@pytest.fixture
+def wiki(tmpdir):
+    wiki = Wiki.create('Test', str(tmpdir.mkdir('wiki')), '', '.md', 'Test Author', 'test@author.com', '')
+    category = wiki.create_article('Category', '.md', wiki.root)
+    article = wiki.create_article('Article', '.md', category)
+    article.text = '# Article\nSome words and a [[Category]] link.\n'
+    article.write()
+    article.commit()
+    wiki.close()
+
+    return wiki.physical_path
+
+
+def run(capsys, *args):
+    assert cli.main(list(args)) == 0
+    return capsys.readouterr().out
+
+
+def test_open_and_search(wiki, capsys):
+    assert json.loads(run(capsys, '--json', 'open', wiki))['articles'] == 2
+    assert run(capsys, 'search', wiki, 'art') == 'Category/Article\n'
+    assert run(capsys, 'search', wiki, '--text', 'some words') == 'Category/Article\n'
+
+
+def test_render_and_stats(wiki, capsys):
+    assert 'id="article">Article</h1>' in run(capsys, 'render', wiki, 'Category/Article', '--body')
+
+    stats = json.loads(run(capsys, '--json', 'stats', wiki, 'Category/Article'))
+    assert stats['links'] == 1
+    assert stats['words'] == 7
+
+
+def test_import_and_history(wiki, tmpdir, capsys):
+    path = str(tmpdir.join('notes.md'))
+    with open(path, 'w') as stream:
+        stream.write('# Notes\nImported\n')
+
+    assert run(capsys, 'import', wiki, path, '--parent', 'Category') == 'Category/Notes\n'
+    assert Wiki.open(wiki).get_article_by_url('Category/Notes').text == '# Notes\nImported\n'
+    assert "Import 'Category/Notes'." in run(capsys, 'history', wiki, 'Category/Notes')
+
+
+def test_commit(wiki, capsys):
+    with open(os.path.join(wiki, 'category', 'article.md'), 'a') as stream:
+        stream.write('More\n')
+
+    assert run(capsys, 'commit', wiki, '-m', 'Edited elsewhere') == 'category/article.md\n'
+    assert not Wiki.open(wiki).has_unstaged_changes()
+
+
+def test_export(wiki, tmpdir, capsys):
+    output = str(tmpdir.join('html'))
+    run(capsys, 'export', wiki, output)
+
+    assert os.path.isfile(os.path.join(output, 'category', 'article.html'))
+
+
+def test_missing_wiki_and_timings(tmpdir, capsys):
+    assert cli.main(['--timings', 'open', str(tmpdir)]) == 1
+
+    error = capsys.readouterr().err.splitlines()
+    assert 'contain a wiki' in error[0]
+    assert set(json.loads(error[1])['phases']) == {'startup', 'import', 'close'}
+
+
+def test_does_not_import_qt(wiki):
+    code = ("import sys; from mdwiki import cli; cli.main(['search', %r, 'x']); "
+            "assert not [name for name in sys.modules if name.startswith('PyQt5')]" % (wiki))
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    subprocess.check_call([sys.executable, '-c', code], cwd=root)
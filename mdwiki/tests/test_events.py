@@ -0,0 +1,35 @@
+from ..backend.events import ChangeType, EventBus
+
+
+def test_events_are_delivered_in_batches():
+    bus = EventBus()
+    deliveries = []
+    bus.subscribe(deliveries.append)
+
+    bus.emit(ChangeType.MODIFIED, 'one')
+    with bus.batch():
+        with bus.batch():
+            bus.emit(ChangeType.CREATED, 'two')
+        bus.emit(ChangeType.DELETED, 'three')
+        assert len(deliveries) == 1
+
+    assert [[(event.change_type, event.article) for event in events] for events in deliveries] == [
+        [(ChangeType.MODIFIED, 'one')],
+        [(ChangeType.CREATED, 'two'), (ChangeType.DELETED, 'three')],
+    ]
+
+
+def test_failing_subscribers_dont_stop_delivery():
+    bus = EventBus()
+    deliveries = []
+
+    def fail(events):
+        raise RuntimeError()
+
+    bus.subscribe(fail)
+    bus.subscribe(deliveries.append)
+    bus.emit(ChangeType.STAGED, 'article')
+    bus.unsubscribe(deliveries.append)
+    bus.emit(ChangeType.STAGED, 'article')
+
+    assert len(deliveries) == 1
@@ -2,7 +2,9 @@ import logging
 import os
 
 import pytest
+from dulwich.objects import Blob
 
+from ..backend.events import ChangeType
 from ..backend.wiki import Wiki
 
 logging.basicConfig(level=logging.DEBUG)
@@ -155,3 +157,163 @@ def test_move_category(wiki):
                                     article_two.physical_path.replace(
                                         '\\', '/')
                                     ])
+
+
+def test_url_snapshot(wiki):
+    snapshot = wiki.url_snapshot
+    article_one = wiki.create_article('ArticleOne', '.md', wiki.root)
+    wiki.create_article('ArticleTwo', '.md', article_one)
+
+    assert snapshot is not wiki.url_snapshot
+    assert 'ArticleOne/ArticleTwo' in wiki.url_snapshot
+    assert '/articleone/articletwo/' in wiki.url_snapshot
+
+    # Editing text without touching the title keeps the snapshot
+    snapshot = wiki.url_snapshot
+    article_one.text = '# ArticleOne\n\nSome text'
+    assert snapshot is wiki.url_snapshot
+
+    # Renaming the article does not
+    article_one.text = '# Renamed\n\nSome text'
+    assert 'Renamed/ArticleTwo' in wiki.url_snapshot
+    assert 'ArticleOne' not in wiki.url_snapshot
+
+
+def test_unlinked_mentions(wiki, monkeypatch):
+    apple = wiki.create_article('Apple', '.md', wiki.root)
+    pear = wiki.create_article('Pear', '.md', wiki.root)
+    apple.text = '# Apple\n\nGoes well with Pear. And Apple.'
+    pear.text = '# Pear\n\nBetter than [[Apple]], but not than apple pie.'
+
+    pear_mention = (apple.text.index('Pear'), apple.text.index('Pear') + 4, pear)
+    apple_mention = (pear.text.index('apple'), pear.text.index('apple') + 5, apple)
+
+    assert wiki.find_unlinked_mentions() == {apple: [pear_mention], pear: [apple_mention]}
+    assert wiki.find_unlinked_mentions(target=apple) == {pear: [apple_mention]}
+
+    # Unchanged pages aren't scanned again
+    scanned = []
+    scan = wiki.mention_index.scan
+    monkeypatch.setattr(wiki.mention_index, 'scan', lambda texts: scanned.extend(texts) or scan(texts))
+
+    pear.text = '# Pear\n\nNothing to see.'
+    assert wiki.find_unlinked_mentions() == {apple: [pear_mention]}
+    assert len(scanned) == 1
+
+    # Saved pages take their SHA from the index, only pages with unsaved edits are hashed
+    for article in (apple, pear):
+        article.write()
+        article.commit()
+    pear.text = '# Pear\n\nStill nothing.'
+
+    hashed = []
+    from_string = Blob.from_string
+    monkeypatch.setattr(Blob, 'from_string', lambda data: hashed.append(data) or from_string(data))
+    assert wiki.find_unlinked_mentions() == {apple: [pear_mention]}
+    assert hashed == [pear.text.encode('utf-8')]
+
+
+def test_unlinked_mentions_in_parallel(wiki, monkeypatch):
+    monkeypatch.setattr('mdwiki.backend.mentions.PARALLEL_THRESHOLD', 0)
+    wiki.mention_index.workers = 2
+
+    apple = wiki.create_article('Apple', '.md', wiki.root)
+    pear = wiki.create_article('Pear', '.md', apple)
+    pear.text = '# Pear\n\nApples? Apple!'
+
+    start = pear.text.index('Apple!')
+    assert wiki.find_unlinked_mentions() == {pear: [(start, start + 5, apple)]}
+
+
+def test_link_completer_follows_structure(wiki):
+    article_one = wiki.create_article('ArticleOne', '.md', wiki.root)
+    wiki.create_article('ArticleTwo', '.md', article_one)
+
+    assert wiki.link_completer.complete('articletwo') == ['ArticleOne/ArticleTwo']
+
+    article_one.text = '# Renamed\n\nSome text'
+    assert wiki.link_completer.complete('articletwo') == ['Renamed/ArticleTwo']
+    assert wiki.link_completer.complete('articleone') == []
+
+
+def test_change_events(wiki):
+    events = []
+    wiki.events.subscribe(lambda batch: events.extend((event.change_type, event.article) for event in batch))
+
+    article_one = wiki.create_article('ArticleOne', '.md', wiki.root)
+    assert (ChangeType.CREATED, article_one) in events
+    assert (ChangeType.COMMITTED, article_one) in events
+
+    del events[:]
+    version = wiki.structure_version
+    article_one.text = '# Renamed\n'
+    assert events == [(ChangeType.MODIFIED, article_one), (ChangeType.RENAMED, article_one)]
+    assert wiki.structure_version > version
+
+    article_two = wiki.create_article('ArticleTwo', '.md', wiki.root)
+    del events[:]
+    article_two.move(parent=article_one)
+    assert (ChangeType.MOVED, article_two) in events
+
+    del events[:]
+    article_one.delete()
+    assert [event for event in events if event[0] == ChangeType.DELETED] == [
+        (ChangeType.DELETED, article_two), (ChangeType.DELETED, article_one)]
+
+
+def test_write_through_staging(wiki):
+    article = wiki.create_article('ArticleOne', '.md', wiki.root)
+    index_path = article.file_name.encode('utf-8')
+    modified = os.stat(article.absolute_physical_path).st_mtime_ns
+
+    # Writing what git already has doesn't touch the file
+    article.write()
+    assert os.stat(article.absolute_physical_path).st_mtime_ns == modified
+    assert not article.has_unstaged_changes()
+
+    article.text = '# ArticleOne\n\nNew text'
+    article.write()
+    assert article.has_unstaged_changes()
+
+    article.commit()
+    blob = wiki.git_repository[wiki.git_repository.open_index()[index_path].sha]
+    assert blob.data == b'# ArticleOne\n\nNew text'
+    assert not wiki.has_unstaged_changes()
+
+    # Files changed by someone else after writing are read again when staging
+    article.text = '# ArticleOne\n\nMine'
+    article.write()
+    with open(article.absolute_physical_path, 'w') as stream:
+        stream.write('# ArticleOne\n\nTheirs!')
+    article.commit()
+    blob = wiki.git_repository[wiki.git_repository.open_index()[index_path].sha]
+    assert blob.data == b'# ArticleOne\n\nTheirs!'
+
+
+def test_recovers_unsaved_edits(wiki):
+    article = wiki.create_article('ArticleOne', '.md', wiki.root)
+    article.text = '# ArticleOne\n\nUnsaved'
+    article.text = '# ArticleOne\n\nUnsaved edits'
+
+    # Crash without saving
+    wiki.journal.close()
+
+    # Other users of the wiki (e.g. the command line) leave the edits alone, even when saving
+    other = Wiki.open(wiki.physical_path)
+    assert other.get_article_by_url('ArticleOne').modified is False
+    other_article = other.create_article('ArticleTwo', '.md', other.root)
+    other_article.text = '# ArticleTwo\n\nSaved'
+    other_article.write()
+    other.close()
+
+    reopened = Wiki.open(wiki.physical_path)
+    assert reopened.recover_edits() == [reopened.get_article_by_url('ArticleOne')]
+
+    recovered = reopened.get_article_by_url('ArticleOne')
+    assert recovered.text == '# ArticleOne\n\nUnsaved edits'
+    assert recovered.modified
+
+    assert reopened.autosave() == [recovered]
+    assert recovered.read() == '# ArticleOne\n\nUnsaved edits'
+    assert not reopened.journal.pending
+    assert Wiki.open(wiki.physical_path).get_article_by_url('ArticleOne').modified is False
@@ -0,0 +1,54 @@
+import random
+
+from ..backend.journal import EditJournal, text_difference
+
+
+def test_text_difference():
+    assert text_difference('hello world', 'hello brave world') == (6, 6, 'brave ')
+    assert text_difference('aaa', 'aa') == (2, 3, '')
+    assert text_difference('', 'new') == (0, 0, 'new')
+
+
+def test_replays_edits(tmpdir):
+    tmpdir.join('article.md').write_binary(b'# Article\n')
+    journal = EditJournal(str(tmpdir.join('journal')), str(tmpdir))
+
+    rng = random.Random(7)
+    text = '# Article\n'
+    for _ in range(200):
+        start = rng.randint(0, len(text))
+        end = rng.randint(start, min(len(text), start + 3))
+        new_text = text[:start] + rng.choice(['', 'x', 'yz\n', 'ü']) + text[end:]
+        journal.record('article.md', text, new_text)
+        text = new_text
+    journal.close()
+
+    assert EditJournal(str(tmpdir.join('journal')), str(tmpdir)).read() == {'article.md': text}
+
+
+def test_skips_saved_and_changed_files(tmpdir):
+    for name in ('saved.md', 'changed.md', 'kept.md'):
+        tmpdir.join(name).write_binary(b'old')
+    journal = EditJournal(str(tmpdir.join('journal')), str(tmpdir))
+
+    for name in ('saved.md', 'changed.md', 'kept.md'):
+        journal.record(name, 'old', 'new')
+    journal.checkpoint('saved.md')
+    tmpdir.join('changed.md').write_binary(b'other')
+    journal.close()
+
+    # A line cut off by a crash is ignored
+    with open(journal.path, 'a') as stream:
+        stream.write('{"path": "kept.md", "sta')
+
+    assert journal.read() == {'kept.md': 'new'}
+
+
+def test_empty_once_everything_is_saved(tmpdir):
+    journal = EditJournal(str(tmpdir.join('journal')), str(tmpdir))
+
+    journal.record('article.md', '', 'text')
+    journal.checkpoint('article.md')
+
+    assert tmpdir.join('journal').size() == 0
+    assert journal.read() == {}
@@ -0,0 +1,39 @@
+from ..benchmarks.latency import LatencyRecorder, percentile
+
+
+class Editor:
+    def type(self, text):
+        return text.upper()
+
+
+def test_percentile():
+    samples = list(range(1, 101))
+
+    assert percentile(samples, 50) == 50
+    assert percentile(samples, 99) == 99
+    assert percentile(samples, 100) == 100
+    assert percentile([7], 1) == 7
+    assert percentile([], 50) is None
+
+
+def test_instrument():
+    recorder = LatencyRecorder(budget=10)
+    editor = Editor()
+    original = Editor.type
+
+    recorder.instrument(Editor, 'type', 'Editor.type')
+    assert editor.type('a') == 'A'
+    assert editor.type('b') == 'B'
+
+    recorder.restore()
+    editor.type('c')
+    assert Editor.type is original
+
+    recorder.record('keystroke', 5)
+    recorder.record('keystroke', 20)
+
+    summary = recorder.as_dict()
+    assert summary['Editor.type']['count'] == 2
+    assert summary['keystroke'] == {'count': 2, 'max': 20, 'over_budget': 1,
+                                    'p50': 5, 'p90': 20, 'p95': 20, 'p99': 20}
+    assert 'keystroke' in recorder.report()
@@ -0,0 +1,32 @@
+from ..backend.linkcompleter import LinkCompleter
+
+
+def completer():
+    return LinkCompleter([
+        ('Programming', 'Programming'),
+        ('Programming/Python', 'Python'),
+        ('Programming/Python/Packaging', 'Packaging'),
+        ('Snakes/Python', 'Python'),
+        ('Pythagoras', 'Pythagoras'),
+        ('Notes/Monty Python', 'Monty Python'),
+    ])
+
+
+def test_prefixes_of_urls_come_first():
+    assert completer().complete('prog') == ['Programming', 'Programming/Python', 'Programming/Python/Packaging']
+
+
+def test_titles_and_path_segments():
+    assert completer().complete('PYTH') == [
+        'Pythagoras',
+        'Programming/Python',
+        'Snakes/Python',
+        'Programming/Python/Packaging',
+    ]
+    assert completer().complete('python/pack') == ['Programming/Python/Packaging']
+    assert completer().complete('monty') == ['Notes/Monty Python']
+
+
+def test_limit():
+    assert completer().complete('p', limit=2) == ['Pythagoras', 'Programming']
+    assert completer().complete('nothing') == []
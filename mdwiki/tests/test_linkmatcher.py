@@ -0,0 +1,58 @@
+from ..backend.linkmatcher import AhoCorasick, LinkMatcher
+
+
+def link(name):
+    return '[[%s]]' % name
+
+
+def test_finds_overlapping_keywords():
+    automaton = AhoCorasick([('he', 1), ('she', 2), ('his', 3), ('hers', 4)])
+
+    assert sorted(automaton.iter_matches('ushers')) == [(1, 4, 2), (2, 4, 1), (2, 6, 4)]
+
+
+def test_longest_mention_wins():
+    matcher = LinkMatcher([('New York', 'New York'), ('York', 'York'), ('New', 'New')])
+
+    assert matcher.link_all('From New York to York', link) == 'From [[New York]] to [[York]]'
+
+
+def test_whole_words_only():
+    matcher = LinkMatcher([('art', 'art'), ('C++', 'C++')])
+
+    assert matcher.link_all('Start art, C++ and Art.', link) == 'Start [[art]], [[C++]] and [[art]].'
+
+
+def test_names_are_not_patterns():
+    matcher = LinkMatcher([('a.b (c)', 'x'), ('[x]', 'y')])
+
+    assert matcher.link_all('a.b (c) axb (c)', link) == '[[x]] axb (c)'
+
+
+def test_skips_protected_text():
+    matcher = LinkMatcher([('Python', 'Python')])
+    text = '\n'.join([
+        '---',
+        'title: Python',
+        '---',
+        '# Python',
+        '```',
+        'Python',
+        '```',
+        'Use `Python` or [[Python]] or [Python](http://python.org/Python), Python!',
+    ])
+
+    assert matcher.link_all(text, link).split('\n')[-1] == \
+        'Use `Python` or [[Python]] or [Python](http://python.org/Python), [[Python]]!'
+
+
+def test_format_link_can_skip_mentions():
+    matcher = LinkMatcher([('Foo', 'foo'), ('Bar', 'bar')])
+
+    assert matcher.link_all('Foo Bar', lambda article: None if article == 'foo' else link(article)) == 'Foo [[bar]]'
+
+
+def test_first_article_with_a_name_wins():
+    matcher = LinkMatcher([('Name', 'first'), ('name', 'second')])
+
+    assert matcher.get('NAME') == 'first'
@@ -0,0 +1,52 @@
+import threading
+
+from ..backend.loader import WikiLoader
+from ..backend.wiki import Wiki
+
+
+class Recorder:
+    def __init__(self):
+        self.wiki = None
+        self.chunks = []
+        self.error = None
+        self.done = threading.Event()
+
+    def opened(self, loader, wiki):
+        self.wiki = wiki
+
+    def imported(self, loader, files, texts):
+        self.chunks.append((files, texts))
+
+    def finished(self, loader, error):
+        self.error = error
+        self.done.set()
+
+
+def test_load_in_chunks(tmpdir):
+    wiki = Wiki.create('Test', str(tmpdir), '', '.md', 'Test Author', 'test@author.com', '')
+    category = wiki.create_article('Category', '.md', wiki.root)
+    wiki.create_article('First', '.md', category)
+    wiki.create_article('Second', '.md', wiki.root)
+
+    recorder = Recorder()
+    WikiLoader(wiki.physical_path, recorder.opened, recorder.imported, recorder.finished, chunk_size=1)
+    assert recorder.done.wait(5)
+
+    assert recorder.error is None
+    assert len(recorder.chunks) == 2
+    assert recorder.wiki.root.children == []
+
+    for files, texts in recorder.chunks:
+        recorder.wiki.import_files(files, texts)
+
+    assert sorted(recorder.wiki.get_all_urls()) == sorted(wiki.get_all_urls())
+    assert recorder.wiki.get_article_by_url('Category/First').text == '# First'
+
+
+def test_load_missing_wiki(tmpdir):
+    recorder = Recorder()
+    WikiLoader(str(tmpdir), recorder.opened, recorder.imported, recorder.finished)
+    assert recorder.done.wait(5)
+
+    assert recorder.wiki is None
+    assert isinstance(recorder.error, ValueError)
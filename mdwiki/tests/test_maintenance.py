@@ -0,0 +1,59 @@
+import threading
+
+import pytest
+
+from ..backend.maintenance import count_objects, maintain
+from ..backend.wiki import Wiki
+
+
+@pytest.fixture
+def wiki(tmpdir):
+    return Wiki.create('TempWiki', str(tmpdir), '', '.md', 'Test Author', 'test@author.com', '')
+
+
+def test_packs_loose_objects(wiki):
+    for i in range(5):
+        wiki.create_article('Article %d' % i, '.md', wiki.root)
+
+    object_store = wiki.git_repository.object_store
+    loose, packs = count_objects(object_store)
+    assert maintain(object_store, loose_limit=loose + 1) is None
+
+    report = maintain(object_store, loose_limit=loose)
+
+    assert (report.operation, report.loose_before, report.packs_before) == ('pack', loose, packs)
+    assert count_objects(object_store) == (0, packs + 1)
+    assert wiki.get_article_by_url('Article 3').read() == '# Article 3'
+
+
+def test_repack_consolidates_packs(wiki):
+    object_store = wiki.git_repository.object_store
+
+    for i in range(3):
+        wiki.create_article('Article %d' % i, '.md', wiki.root)
+        maintain(object_store, loose_limit=1)
+    assert count_objects(object_store) == (0, 3)
+
+    report = maintain(object_store, packs_limit=3)
+
+    assert report.operation == 'repack'
+    assert count_objects(object_store) == (0, 1)
+    assert len(list(wiki.git_repository.get_walker())) > 3
+
+
+def test_scheduler_runs_when_idle(wiki):
+    reports = []
+    done = threading.Event()
+
+    def callback(report):
+        reports.append(report)
+        done.set()
+
+    wiki.start_maintenance(callback, idle_delay=0.01, loose_limit=1)
+    wiki.create_article('Article', '.md', wiki.root)
+
+    assert done.wait(5)
+    wiki.close()
+
+    assert reports[0].operation == 'pack'
+    assert reports[0].loose_after == 0
@@ -0,0 +1,81 @@
+import re
+
+import pytest
+
+from ..backend.markuprenderer import MarkdownRenderer, PlainRenderer, ReSTRenderer
+from ..backend.wiki import UrlSnapshot
+
+
+@pytest.fixture
+def markdown():
+    return MarkdownRenderer()
+
+
+def source_lines(html):
+    return [int(line) for line in re.findall(r'data-line="(\d+)"', html)]
+
+
+def test_source_lines(markdown):
+    text = '\n'.join([
+        '# Heading',          # 0
+        '',
+        'A paragraph',        # 2
+        'spanning two lines',
+        '',
+        '* one',              # 5
+        '* two',
+        '',
+        '```',                # 8
+        'code',
+        '```',
+        '',
+        'The end',            # 12
+    ])
+
+    assert source_lines(markdown.render_body(set(), text)) == [0, 2, 5, 8, 12]
+
+
+def test_source_lines_skip_front_matter(markdown):
+    text = 'title: Test\nauthor: Someone\n\n# Heading\n\nText'
+
+    assert source_lines(markdown.render_body(set(), text)) == [3, 5]
+
+
+def test_stashed_html_is_restored(markdown):
+    html = markdown.render_body(set(), 'Text\n\n<div>raw</div>\n')
+
+    # The marker goes in front of the raw block, which must not end up in a paragraph
+    assert '<a data-line="2"></a><div>raw</div>' in html
+    assert '<p><div>' not in html
+
+
+def test_missing_links(markdown):
+    html = markdown.render_body(UrlSnapshot(0, ['Existing']), '[[existing]] [[missing]]')
+
+    assert '<a href="/existing/" title="existing">existing</a>' in html
+    assert '<a class="missing" href="/missing/" title="missing">missing</a>' in html
+
+
+def test_emoji_unicode(markdown):
+    html = markdown.render_body(set(), 'Hello :smile: :octocat:')
+
+    assert html == '<p data-line="0">Hello \U0001f604 :octocat:</p>'
+
+
+def test_plain_renderer_escapes():
+    assert PlainRenderer().render_body(None, '<b>') == '<pre>&lt;b&gt;</pre>'
+
+
+def test_rest_renderer_is_reusable():
+    core = pytest.importorskip('docutils.core')
+    renderer = ReSTRenderer()
+
+    first = 'Title\n=====\n\nSome *text*.\n'
+    second = '* one\n* two\n'
+
+    assert renderer.render_body(set(), first) == core.publish_parts(first, writer_name='html')['html_body']
+    assert renderer.render_body(set(), second) == core.publish_parts(second, writer_name='html')['html_body']
+    assert renderer.render_body(set(), first) == core.publish_parts(first, writer_name='html')['html_body']
+
+    # The style ends up in the document, just like with Markdown
+    assert '<style type="text/css">body {}</style>' in renderer.render(set(), first, style='body {}')
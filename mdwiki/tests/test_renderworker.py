@@ -0,0 +1,55 @@
+import threading
+
+from ..backend.renderworker import RenderWorker
+
+
+def test_latest_request_wins():
+    results = []
+    done = threading.Event()
+    blocker = threading.Event()
+
+    def callback(generation, result):
+        results.append(result)
+
+        if result == 'last':
+            done.set()
+
+    def render(text):
+        blocker.wait()
+        return text
+
+    worker = RenderWorker(callback)
+
+    # The first job blocks the worker, so every following one piles up
+    worker.submit(render, 'first')
+    for i in range(10):
+        worker.submit(render, 'job %d' % i)
+    worker.submit(render, 'last')
+
+    blocker.set()
+    assert done.wait(5)
+    worker.close()
+
+    # 'first' was overtaken while running, the jobs in between were never started
+    assert results == ['last']
+
+
+def test_cancel_discards_result():
+    results = []
+    started = threading.Event()
+    blocker = threading.Event()
+
+    def render():
+        started.set()
+        blocker.wait()
+        return 'stale'
+
+    worker = RenderWorker(lambda generation, result: results.append(result))
+    worker.submit(render)
+    assert started.wait(5)
+
+    worker.cancel()
+    blocker.set()
+    worker.close()
+
+    assert results == []
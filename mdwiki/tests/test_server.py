@@ -0,0 +1,98 @@
+import asyncio
+import http.client
+import threading
+
+import pytest
+
+from ..backend.markuprenderer import PlainRenderer
+from ..backend.server import WikiServer
+from ..backend.wiki import Wiki
+
+
+@pytest.fixture
+def wiki(tmpdir):
+    wiki = Wiki.create('Test', str(tmpdir), '', '.md', 'Test Author', 'test@author.com', '')
+    category = wiki.create_article('Category', '.md', wiki.root)
+    wiki.create_article('Some Article', '.md', category)
+
+    return wiki
+
+
+def request(port, requests):
+    """ Send (method, path, headers) requests over one connection, returns (status, headers, body). """
+    connection = http.client.HTTPConnection('127.0.0.1', port)
+    responses = []
+
+    for method, path, headers in requests:
+        connection.request(method, path, headers=headers)
+        response = connection.getresponse()
+        responses.append((response.status, dict(response.getheaders()), response.read()))
+
+    connection.close()
+
+    return responses
+
+
+def serve(server, requests):
+    async def run():
+        listener = await server.start('127.0.0.1', 0)
+        port = listener.sockets[0].getsockname()[1]
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(None, request, port, requests)
+        finally:
+            listener.close()
+
+    return asyncio.run(run())
+
+
+def test_etags(wiki):
+    server = WikiServer(wiki)
+    first, missing, head = serve(server, [('GET', '/Category/Some%20Article/', {}),
+                                          ('GET', '/Nothing', {}),
+                                          ('HEAD', '/', {})])
+
+    assert first[0] == 200
+    assert b'<h1 id="some-article">Some Article</h1>' in first[2].replace(b' data-line="0"', b'')
+    assert missing[0] == 404
+    assert head[0] == 200 and head[2] == b''
+
+    etag = first[1]['ETag']
+    again, = serve(server, [('GET', '/Category/Some%20Article', {'If-None-Match': etag})])
+    assert again[0] == 304
+
+    # Changing the text or the wiki's URLs (links might point somewhere now) changes the page
+    article = wiki.get_article_by_url('Category/Some Article')
+    article.text = '# Some Article\nChanged\n'
+    changed, = serve(server, [('GET', '/Category/Some%20Article', {'If-None-Match': etag})])
+    assert changed[0] == 200 and b'Changed' in changed[2]
+
+    etag = changed[1]['ETag']
+    wiki.create_article('Other', '.md', wiki.root)
+    assert server.etag(article) != etag
+
+
+def test_concurrent_requests_share_render(wiki):
+    started = threading.Event()
+    blocker = threading.Event()
+
+    class SlowRenderer(PlainRenderer):
+        def render(self, urls, raw_text, style=""):
+            started.set()
+            blocker.wait()
+            return super().render(urls, raw_text, style)
+
+    server = WikiServer(wiki, renderers={'.txt': SlowRenderer()})
+
+    async def run():
+        pages = [asyncio.ensure_future(server.page('/Category')) for _ in range(5)]
+        await asyncio.get_running_loop().run_in_executor(None, started.wait)
+        blocker.set()
+
+        return await asyncio.gather(*pages)
+
+    pages = asyncio.run(run())
+
+    assert server.renders_started == 1
+    assert len(set(page.body for page in pages)) == 1
+    assert server.renders == {}
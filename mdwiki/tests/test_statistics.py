@@ -0,0 +1,53 @@
+import random
+
+from ..backend.statistics import DocumentStatistics
+
+
+def apply_edit(statistics, text, position, removed, inserted):
+    """ Edit text like Scintilla does (delete, then insert) and pass the deltas on. """
+    if removed:
+        first_line = text.count('\n', 0, position)
+        lines_added = -text.count('\n', position, position + removed)
+        text = text[:position] + text[position + removed:]
+        statistics.update(first_line, 1 - lines_added, [text.split('\n')[first_line]])
+
+    if inserted:
+        first_line = text.count('\n', 0, position)
+        lines_added = inserted.count('\n')
+        text = text[:position] + inserted + text[position:]
+        statistics.update(first_line, 1, text.split('\n')[first_line:first_line + 1 + lines_added])
+
+    return text
+
+
+def summary(statistics):
+    return (statistics.words, statistics.characters, statistics.headings,
+            statistics.links, statistics.reading_time)
+
+
+def test_counts():
+    text = '---\ntitle: Test\n---\n# Heading\n\nSee [[other]] and [this](http://x).'
+    statistics = DocumentStatistics(text)
+
+    # Front matter doesn't count as words
+    assert statistics.words == 7
+    assert statistics.characters == len(text)
+    assert statistics.headings == 1
+    assert statistics.links == 2
+    assert statistics.reading_time == 1
+
+
+def test_incremental_updates_match_full_count():
+    rng = random.Random(42)
+    snippets = ['word ', '\n', '# ', '[[link]] ', '---\n', 'two words\nand more', '\n\n']
+
+    text = '---\nkey: value\n---\n# Title\n\nSome text with [[a link]].\n'
+    statistics = DocumentStatistics(text)
+
+    for _ in range(500):
+        position = rng.randint(0, len(text))
+        removed = rng.randint(0, min(10, len(text) - position)) if rng.random() < 0.4 else 0
+        inserted = rng.choice(snippets) if rng.random() < 0.7 else ''
+
+        text = apply_edit(statistics, text, position, removed, inserted)
+        assert summary(statistics) == summary(DocumentStatistics(text))
@@ -0,0 +1,264 @@
+import os
+import threading
+
+import pytest
+from dulwich import porcelain
+from dulwich.repo import Repo
+from dulwich.porcelain import NoneStream
+
+from ..backend.sync import FETCH, PULL, PUSH, SyncCancelled, SyncError, SyncService
+from ..backend.wiki import Wiki
+
+REMOTE_REF = b'refs/remotes/origin/master'
+
+
+@pytest.fixture
+def remote_url(tmpdir):
+    path = str(tmpdir.join('remote.git'))
+    Repo.init_bare(path, mkdir=True)
+
+    return 'file://' + path
+
+
+def create_wiki(tmpdir, name, remote_url):
+    path = str(tmpdir.mkdir(name))
+
+    return Wiki.create(name, path, remote_url, '.md', 'Test Author', 'test@author.com', '')
+
+
+def clone_wiki(tmpdir, name, remote_url):
+    path = str(tmpdir.join(name))
+    porcelain.clone(remote_url, path, errstream=NoneStream()).close()
+
+    return Wiki.open(path)
+
+
+class Recorder:
+    def __init__(self):
+        self.messages = []
+        self.finished = []
+        self.jobs = []
+        self.done = threading.Event()
+
+    def progress(self, job, message):
+        self.messages.append(message)
+
+    def finish(self, job, error):
+        self.finished.append((job.operation, error))
+        self.jobs.append(job)
+        self.done.set()
+
+    def wait(self, count):
+        while len(self.finished) < count:
+            assert self.done.wait(5)
+            self.done.clear()
+
+
+def test_push_and_pull(tmpdir, remote_url):
+    first = create_wiki(tmpdir, 'first', remote_url)
+    first.push(lambda message: None)
+    second = clone_wiki(tmpdir, 'second', remote_url)
+    first.create_article('Article', '.md', first.root)
+
+    recorder = Recorder()
+    service = SyncService(first, recorder.progress, recorder.finish)
+    service.push()
+    recorder.wait(1)
+    service.close()
+
+    other = SyncService(second, recorder.progress, recorder.finish)
+    other.pull()
+    recorder.wait(2)
+    other.close()
+
+    assert recorder.finished == [(PUSH, None), (PULL, None)]
+    assert 'Push successful.\n' in recorder.messages
+    assert second.git_repository.head() == first.git_repository.head()
+    # The sync thread only writes the files, the articles are updated by whoever owns the wiki
+    assert second.get_article_by_url('Article') is None
+    second.apply_pulled_changes(recorder.jobs[1].result)
+    assert second.get_article_by_url('Article') is not None
+
+
+def test_pull_applies_only_changes(tmpdir, remote_url):
+    first = create_wiki(tmpdir, 'first', remote_url)
+    keep = first.create_article('Keep', '.md', first.root)
+    change = first.create_article('Change', '.md', first.root)
+    rename = first.create_article('Rename', '.md', first.root)
+    delete = first.create_article('Delete', '.md', keep)
+    category = first.create_article('Category', '.md', first.root)
+    first.push(lambda message: None)
+
+    second = clone_wiki(tmpdir, 'second', remote_url)
+    second_keep = second.get_article_by_url('Keep')
+    second_rename = second.get_article_by_url('Rename')
+
+    change.text = '# Change\nNew text\n'
+    change.write()
+    change.commit()
+    rename.move('Renamed', category)
+    delete.delete()
+    first.create_article('Added', '.md', rename)
+    first.push(lambda message: None)
+
+    events = []
+    second.events.subscribe(events.extend)
+    messages = []
+    second.apply_pulled_changes(second.pull(messages.append))
+
+    assert messages[-1] == b'Updated 6 files.\n'
+    assert second.git_repository.head() == first.git_repository.head()
+    assert not second.has_unstaged_changes()
+
+    # The articles match a freshly opened wiki, untouched ones are still the same objects
+    assert sorted(second.get_all_urls()) == sorted(Wiki.open(second.physical_path).get_all_urls())
+    assert sorted(second.get_all_urls()) == sorted(first.get_all_urls())
+    assert second.get_article_by_url('Keep') is second_keep
+    assert not second_keep.is_category()
+    assert second.find_article_by_path('category/renamed/_index.md') is second_rename
+    assert second.get_article_by_url('Change').text == '# Change\nNew text\n'
+    assert keep not in [event.article for event in events]
+    assert sorted(os.listdir(second.physical_path)) == sorted(os.listdir(first.physical_path))
+
+
+def test_pull_refuses_to_overwrite_changes(tmpdir, remote_url):
+    first = create_wiki(tmpdir, 'first', remote_url)
+    article = first.create_article('Article', '.md', first.root)
+    first.push(lambda message: None)
+    second = clone_wiki(tmpdir, 'second', remote_url)
+
+    article.text = '# Article\nFirst\n'
+    article.write()
+    article.commit()
+    first.push(lambda message: None)
+
+    second.get_article_by_url('Article').text = '# Article\nSecond\n'
+    head = second.git_repository.head()
+
+    with pytest.raises(SyncError):
+        second.pull(lambda message: None)
+
+    assert second.git_repository.head() == head
+
+
+def test_edits_made_while_pulling_are_kept(tmpdir, remote_url):
+    first = create_wiki(tmpdir, 'first', remote_url)
+    article = first.create_article('Article', '.md', first.root)
+    first.push(lambda message: None)
+    second = clone_wiki(tmpdir, 'second', remote_url)
+
+    article.text = '# Article\nFirst\n'
+    article.write()
+    article.commit()
+    first.push(lambda message: None)
+
+    changes = second.pull(lambda message: None)
+    # Edited after the files were written, but before the articles were updated
+    edited = second.get_article_by_url('Article')
+    edited.text = '# Article\nSecond\n'
+    second.apply_pulled_changes(changes)
+
+    assert edited.text == '# Article\nSecond\n'
+    assert edited.read() == '# Article\nFirst\n'
+
+
+def test_pull_refuses_diverged_history(tmpdir, remote_url):
+    first = create_wiki(tmpdir, 'first', remote_url)
+    first.push(lambda message: None)
+    second = create_wiki(tmpdir, 'second', remote_url)
+
+    with pytest.raises(SyncError):
+        second.pull(lambda message: None)
+
+
+def test_sync_keeps_diverged_remote(tmpdir, remote_url):
+    first = create_wiki(tmpdir, 'first', remote_url)
+    first.push(lambda message: None)
+    second = clone_wiki(tmpdir, 'second', remote_url)
+
+    first.create_article('First', '.md', first.root)
+    first.push(lambda message: None)
+    second.create_article('Second', '.md', second.root)
+    remote = Repo(remote_url[len('file://'):])
+
+    recorder = Recorder()
+    service = SyncService(second, recorder.progress, recorder.finish)
+    service.sync()
+    recorder.wait(2)
+    service.close()
+
+    # The push doesn't run once the pull failed
+    assert [operation for operation, _ in recorder.finished] == [PULL, PUSH]
+    assert isinstance(recorder.finished[0][1], SyncError)
+    assert isinstance(recorder.finished[1][1], SyncCancelled)
+    assert remote.refs[b'refs/heads/master'] == first.git_repository.head()
+
+    # Neither does pushing on its own overwrite the remote's commits
+    with pytest.raises(SyncError):
+        second.push(lambda message: None)
+
+    assert remote.refs[b'refs/heads/master'] == first.git_repository.head()
+    remote.close()
+
+
+def test_cancelled_fetch_keeps_refs(tmpdir, remote_url):
+    first = create_wiki(tmpdir, 'first', remote_url)
+    first.push(lambda message: None)
+    second = create_wiki(tmpdir, 'second', remote_url)
+
+    with pytest.raises(SyncCancelled):
+        second.fetch(lambda message: None, cancelled=lambda: True)
+
+    assert REMOTE_REF not in second.git_repository.refs
+
+
+def test_cancel_drops_waiting_jobs(tmpdir, remote_url):
+    first = create_wiki(tmpdir, 'first', remote_url)
+    first.push(lambda message: None)
+    second = create_wiki(tmpdir, 'second', remote_url)
+
+    started = threading.Event()
+    blocker = threading.Event()
+    recorder = Recorder()
+
+    def progress(job, message):
+        started.set()
+        blocker.wait()
+
+    service = SyncService(second, progress, recorder.finish)
+    jobs = service.sync()
+    # Asking again while waiting doesn't queue anything
+    assert service.push() is jobs[1]
+    assert started.wait(5)
+
+    service.cancel()
+    blocker.set()
+    recorder.wait(2)
+    service.close()
+
+    assert sorted(operation for operation, _ in recorder.finished) == [PULL, PUSH]
+    assert all(isinstance(error, SyncCancelled) for _, error in recorder.finished)
+    assert REMOTE_REF not in second.git_repository.refs
+    assert not service.busy
+
+
+def test_background_fetch(tmpdir, remote_url):
+    first = create_wiki(tmpdir, 'first', remote_url)
+    first.push(lambda message: None)
+    second = create_wiki(tmpdir, 'second', remote_url)
+
+    recorder = Recorder()
+    service = SyncService(second, recorder.progress, recorder.finish, fetch_interval=0.01)
+    recorder.wait(1)
+    service.close()
+
+    assert recorder.finished[0] == (FETCH, None)
+    assert second.git_repository.refs[REMOTE_REF] == first.git_repository.head()
+
+
+def test_pull_from_empty_remote(tmpdir, remote_url):
+    wiki = create_wiki(tmpdir, 'wiki', remote_url)
+
+    wiki.pull(lambda message: None)
+
+    assert REMOTE_REF not in wiki.git_repository.refs
@@ -0,0 +1,41 @@
+import os
+
+from ..backend.wiki import Wiki
+from ..benchmarks.synthetic import WikiSpec, generate_wiki
+
+
+def read_files(path):
+    files = {}
+
+    for folder, folders, names in os.walk(path):
+        folders[:] = [name for name in folders if name != '.git']
+
+        for name in names:
+            with open(os.path.join(folder, name), encoding='utf-8') as stream:
+                files[os.path.relpath(os.path.join(folder, name), path)] = stream.read()
+
+    return files
+
+
+def test_generate_wiki(tmpdir):
+    spec = WikiSpec(articles=20, depth=2, fan_out=4, words=50, link_density=10, commits=3, seed=7)
+    first = generate_wiki(str(tmpdir.join('first')), spec)
+    second = generate_wiki(str(tmpdir.join('second')), spec)
+
+    assert read_files(first) == read_files(second)
+
+    wiki = Wiki.open(first)
+    try:
+        articles = [article for _, article in wiki.iter_named_articles()]
+        assert len(articles) == 20
+        assert max(len(article.wiki_url.split('/')) for article in articles) == 2
+        assert all(len(article.children) <= 4 for article in articles)
+        assert any(article.links for article in articles)
+        assert not wiki.unstaged_changes
+
+        # The synthetic articles and their edits come after the commits of Wiki.create
+        messages = [entry.commit.message for entry in wiki.git_repository.get_walker(max_entries=4)]
+        assert messages == [b"Synthetic edit 3.", b"Synthetic edit 2.", b"Synthetic edit 1.",
+                            b"Add 20 synthetic articles."]
+    finally:
+        wiki.close()
@@ -0,0 +1,34 @@
+from ..backend.titleindex import TitleIndex
+
+
+def make_index(*urls):
+    return TitleIndex((url, url, url.rsplit('/', 1)[-1]) for url in urls)
+
+
+def test_matches_urls_and_titles_ignoring_case():
+    index = TitleIndex([('a', 'Projects/Alpha', 'Alpha'),
+                        ('b', 'Notes/Beta', 'Beta'),
+                        ('c', 'Projects', 'Projects')])
+
+    assert index.search('PROJ') == ['a', 'c']
+    assert index.search('beta') == ['b']
+    assert index.search('gamma') == []
+
+
+def test_every_article_is_found_once():
+    index = make_index('aa/aaa', 'aa', 'b/aab')
+
+    assert index.search('a') == ['aa/aaa', 'aa', 'b/aab']
+
+
+def test_matches_do_not_span_articles():
+    index = make_index('foo', 'bar')
+
+    assert index.search('oba') == []
+    assert index.search('o\0b') == []
+
+
+def test_empty_query_matches_nothing():
+    index = make_index('foo')
+
+    assert index.search('  ') == []
@@ -0,0 +1,143 @@
+import os
+import threading
+
+import pytest
+from dulwich.repo import Repo
+
+from ..backend.events import ChangeType
+from ..backend.watcher import WikiWatcher
+from ..backend.wiki import Wiki
+
+
+@pytest.fixture
+def wiki(tmpdir):
+    return Wiki.create('Test', str(tmpdir), '', '.md', 'Test Author', 'test@author.com', '')
+
+
+def write(wiki, path, text):
+    with open(os.path.join(wiki.physical_path, path), 'w') as stream:
+        stream.write(text)
+
+
+def test_external_edit_reloads_article(wiki):
+    article = wiki.create_article('Article', '.md', wiki.root)
+    events = []
+    wiki.events.subscribe(events.extend)
+
+    write(wiki, article.text_path, '# Article\nEdited elsewhere\n')
+    wiki.apply_external_changes([(article.text_path, article.text_path)])
+
+    assert article.text == '# Article\nEdited elsewhere\n'
+    assert article.has_unstaged_changes()
+    assert [event.change_type for event in events] == [ChangeType.MODIFIED]
+
+    # Committing it with git clears the status again
+    repository = Repo(wiki.physical_path)
+    repository.stage([article.text_path])
+    repository.close()
+    wiki.apply_external_changes([('.git/index', '.git/index')])
+
+    assert not article.has_unstaged_changes()
+
+
+def test_own_writes_are_ignored(wiki):
+    article = wiki.create_article('Article', '.md', wiki.root)
+    article.text = '# Article\nSaved\n'
+    article.write()
+    events = []
+    wiki.events.subscribe(events.extend)
+
+    wiki.apply_external_changes([(article.text_path, article.text_path)])
+
+    assert events == []
+
+
+def test_external_move_keeps_article(wiki):
+    category = wiki.create_article('Category', '.md', wiki.root)
+    article = wiki.create_article('Article', '.md', category)
+    old_path = category.physical_path
+
+    os.rename(os.path.join(wiki.physical_path, old_path),
+              os.path.join(wiki.physical_path, 'renamed'))
+    wiki.apply_external_changes([(old_path, 'renamed')])
+
+    assert wiki.find_article_by_path('renamed/_index.md') is category
+    assert wiki.find_article_by_path('renamed/article.md') is article
+    assert category.physical_path == 'renamed'
+
+
+def test_external_add_and_delete(wiki):
+    article = wiki.create_article('Article', '.md', wiki.root)
+
+    os.remove(os.path.join(wiki.physical_path, article.text_path))
+    write(wiki, 'added.md', '# Added\n')
+    wiki.apply_external_changes([(article.text_path, article.text_path), ('added.md', 'added.md')])
+
+    assert article not in wiki.root.children
+    assert wiki.find_article_by_path('added.md').text == '# Added\n'
+    assert wiki.is_path_unstaged(article.text_path)
+
+
+def test_unsaved_edits_are_kept(wiki):
+    article = wiki.create_article('Article', '.md', wiki.root)
+    article.text = '# Article\nUnsaved\n'
+
+    write(wiki, article.text_path, '# Article\nEdited elsewhere\n')
+    wiki.apply_external_changes([(article.text_path, article.text_path)])
+
+    assert article.text == '# Article\nUnsaved\n'
+    assert article.modified
+
+
+def test_polling_collects_changes(wiki):
+    batches = []
+    received = threading.Event()
+
+    def callback(changes):
+        batches.append(changes)
+        received.set()
+
+    watcher = WikiWatcher(wiki, callback, debounce=0.2, poll_interval=0.01, polling=True)
+    for number in range(10):
+        write(wiki, 'file%d.md' % (number), 'Text')
+
+    assert received.wait(5)
+    watcher.close()
+
+    assert len(batches) == 1
+    assert sorted(batches[0]) == [('file%d.md' % (number), 'file%d.md' % (number))
+                                  for number in range(10)]
+
+
+def test_watchdog_collects_changes(wiki):
+    pytest.importorskip('watchdog')
+    batches = []
+    received = threading.Event()
+
+    def callback(changes):
+        batches.append(changes)
+        received.set()
+
+    watcher = WikiWatcher(wiki, callback, debounce=0.2, polling=False)
+    for number in range(10):
+        write(wiki, 'file%d.md' % (number), 'Text')
+
+    assert received.wait(5)
+    watcher.close()
+
+    assert len(batches) == 1
+    assert sorted(batches[0]) == [('file%d.md' % (number), 'file%d.md' % (number))
+                                  for number in range(10)]
+
+
+def test_moves_are_combined(wiki):
+    watcher = WikiWatcher(wiki, lambda changes: None, debounce=60, polling=True, poll_interval=60)
+    root = wiki.physical_path
+
+    watcher.add(os.path.join(root, 'first.md'), os.path.join(root, 'second.md'))
+    watcher.add(os.path.join(root, 'second.md'), os.path.join(root, 'third.md'))
+    watcher.add(os.path.join(root, '.git', 'objects', 'ab', 'cdef'))
+    watcher.add(os.path.join(root, '.git', 'index'))
+
+    assert watcher._changes == {'first.md': 'third.md', '.git/index': '.git/index'}
+    watcher.close()
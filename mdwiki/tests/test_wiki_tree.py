@@ -0,0 +1,110 @@
+import os
+
+import pytest
+
+# The model is tested without a display
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+QtWidgets = pytest.importorskip('PyQt5.QtWidgets')
+QtTest = pytest.importorskip('PyQt5.QtTest')
+
+from PyQt5 import QtCore  # noqa: E402
+
+from ..backend.wiki import Wiki  # noqa: E402
+from ..mixins.wiki_tree import WikiTreeModel  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def app():
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+@pytest.fixture
+def wiki(tmpdir):
+    wiki = Wiki.create('Test', str(tmpdir), '', '.md', 'Test Author', 'test@author.com', '')
+    category = wiki.create_article('Category', '.md', wiki.root)
+    deeper = wiki.create_article('Deeper', '.md', category)
+    wiki.create_article('Deepest', '.md', deeper)
+    wiki.create_article('Article', '.md', wiki.root)
+
+    yield wiki
+    wiki.close()
+
+
+def test_close_unsubscribes(app, wiki):
+    subscribers = list(wiki.events.subscribers)
+    model = WikiTreeModel(['name', 'saved', 'unstaged'], wiki)
+    assert len(wiki.events.subscribers) == len(subscribers) + 1
+
+    model.close()
+    assert wiki.events.subscribers == subscribers
+    # The wiki belongs to whoever opened it
+    assert wiki.get_article_by_url('Category') is not None
+
+
+def walk(model, parent):
+    """ Fetch and return the names below parent, as nested (name, children) tuples. """
+    if model.canFetchMore(parent):
+        model.fetchMore(parent)
+
+    rows = []
+    for row in range(model.rowCount(parent)):
+        index = model.index(row, 0, parent)
+        assert model.parent(index) == parent
+        rows.append((model.data(index, QtCore.Qt.DisplayRole), walk(model, index)))
+
+    return rows
+
+
+def sorted_tree(rows):
+    return sorted((name, sorted_tree(children)) for name, children in rows)
+
+
+def test_model_is_consistent(app, wiki):
+    model = WikiTreeModel(['name', 'saved', 'unstaged'], wiki)
+    # Checks every signal and answer of the model, failures abort the test run
+    tester = QtTest.QAbstractItemModelTester(model, QtTest.QAbstractItemModelTester.FailureReportingMode.Fatal)
+
+    # The root article doesn't have a name
+    tree = [('', [('Article', []), ('Category', [('Deeper', [('Deepest', [])])])])]
+    assert sorted_tree(walk(model, QtCore.QModelIndex())) == tree
+
+    # Changes of the wiki end up in the model once the event loop runs
+    wiki.create_article('New', '.md', wiki.get_article_by_url('Category'))
+    wiki.get_article_by_url('Article').delete()
+    app.processEvents()
+
+    tree = [('', [('Category', [('Deeper', [('Deepest', [])]), ('New', [])])])]
+    assert sorted_tree(walk(model, QtCore.QModelIndex())) == tree
+
+    del tester
+    model.close()
+
+
+def test_lazy_fetching(app, wiki):
+    # No model tester here, it fetches rows while checking them
+    model = WikiTreeModel(['name', 'saved', 'unstaged'], wiki)
+    root = model.index(0, 0)
+
+    # Nothing below the root exists until it is expanded
+    assert model.hasChildren(root)
+    assert model.canFetchMore(root)
+    assert model.rowCount(root) == 0
+
+    model.fetchMore(root)
+    assert not model.canFetchMore(root)
+    assert sorted(model.data(model.index(row, 0, root), QtCore.Qt.DisplayRole)
+                  for row in range(model.rowCount(root))) == ['Article', 'Category']
+
+    category = model.findData(wiki.get_article_by_url('Category'))
+    assert model.canFetchMore(category)
+    assert model.rowCount(category) == 0
+
+    # Finding an article fetches all of its ancestors
+    deepest = wiki.get_article_by_url('Category/Deeper/Deepest')
+    index = model.findData(deepest)
+    assert index is not None and index.isValid()
+    assert model.data(index, QtCore.Qt.EditRole) is deepest
+    assert model.rowCount(category) == 1
+    assert model.data(model.parent(model.parent(index)), QtCore.Qt.EditRole) is wiki.get_article_by_url('Category')
+
+    model.close()
@@ -1,5 +1,13 @@
-from mdwiki.mdwiki import main
+import multiprocessing
+import time
+
+# Measure how long importing Qt and everything else takes
+STARTED = time.perf_counter()
 
 
 if __name__ == '__main__':
-    main()
+    # The workers of MentionIndex.scan rerun this script in frozen builds
+    multiprocessing.freeze_support()
+
+    from mdwiki.mdwiki import main
+    main(STARTED)